@@ -0,0 +1,71 @@
+"""Microbenchmark of converting a single variable to a unit system for display.
+
+Compares the previous implementation of `change_units`, which deep copied the variable and
+converted the copy in place, with the current one based on precomputed scale and offset factors.
+
+Run from the root of the repository with:
+
+    python -m benchmarks.bench_change_units
+"""
+
+import copy
+import timeit
+
+from metno_locationforecast.data_containers import Variable
+
+from dryrock.reports.helper_functions import UnitSystem, change_units
+
+NUMBER = 100_000
+REPEAT = 5
+
+UNITS = {
+    UnitSystem.METRIC: {
+        "precipitation_amount": "mm",
+        "air_temperature": "celsius",
+        "wind_speed": "km/h",
+    },
+    UnitSystem.IMPERIAL: {
+        "precipitation_amount": "inches",
+        "air_temperature": "fahrenheit",
+        "wind_speed": "mph",
+    },
+}
+
+
+def deepcopy_change_units(variable: Variable, unit_system: UnitSystem) -> Variable:
+    """The deep copying implementation of change_units, kept for comparison."""
+    variable = copy.deepcopy(variable)
+    units = UNITS[unit_system].get(variable.name)
+    if units is not None:
+        variable.convert_to(units)
+    return variable
+
+
+def time_per_value(function, variable: Variable, unit_system: UnitSystem) -> float:
+    """Returns the best time in nanoseconds of a single call to function."""
+    timer = timeit.Timer(lambda: function(variable, unit_system))
+    return min(timer.repeat(repeat=REPEAT, number=NUMBER)) / NUMBER * 1e9
+
+
+def main():
+    variables = [
+        Variable("precipitation_amount", 1.3, "mm"),
+        Variable("air_temperature", 14.2, "celsius"),
+        Variable("wind_speed", 6.8, "m/s"),
+    ]
+
+    print(
+        f"{'variable':<22}{'unit system':<13}{'deepcopy (ns)':>15}{'scale (ns)':>12}{'speedup':>9}"
+    )
+    for unit_system in UnitSystem:
+        for variable in variables:
+            before = time_per_value(deepcopy_change_units, variable, unit_system)
+            after = time_per_value(change_units, variable, unit_system)
+            print(
+                f"{variable.name:<22}{unit_system.name.lower():<13}"
+                + f"{before:>15.0f}{after:>12.0f}{before / after:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
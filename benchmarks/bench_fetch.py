@@ -0,0 +1,127 @@
+"""Benchmark of fetching forecasts over TLS with and without a shared pool of connections.
+
+Starts the stub MET server over TLS with a self-signed certificate and fetches forecasts for a
+number of places, first with `Forecast.update`, which opens a new connection for every request,
+then through a session from `create_session`, which reuses its connections. Reports the time
+taken per request and the CPU time per request. The server runs in the same process, so CPU time
+includes both sides of each TLS handshake.
+
+Needs the openssl command line tool to make the certificate. Run from the root of the repository
+with:
+
+    python -m benchmarks.bench_fetch --requests 200 --concurrency 1 4
+"""
+
+import argparse
+import os
+import pathlib
+import subprocess
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+import requests
+from metno_locationforecast import Forecast, Place
+
+from dryrock.fetch import create_session, update_forecasts
+from tests.met_stub import StubMetServer
+
+REQUESTS = 200
+CONCURRENCY = [1, 4]
+USER_AGENT = "dryrock-benchmarks"
+
+
+def make_certificate(directory: pathlib.Path) -> Tuple[str, str]:
+    """Writes a self-signed certificate for 127.0.0.1 and returns the paths of it and its key."""
+    certificate_file = str(directory.joinpath("certificate.pem"))
+    key_file = str(directory.joinpath("key.pem"))
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+            "-keyout",
+            key_file,
+            "-out",
+            certificate_file,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return certificate_file, key_file
+
+
+def make_forecasts(number: int, base_url: str, save_location: str) -> List[Forecast]:
+    return [
+        Forecast(
+            Place(f"Place {i}", 53.0 + i / 1000, -6.0, 100),
+            user_agent=USER_AGENT,
+            save_location=save_location,
+            base_url=base_url,
+        )
+        for i in range(number)
+    ]
+
+
+def time_fetch(
+    server: StubMetServer,
+    number: int,
+    concurrency: int,
+    save_location: str,
+    session: Optional[requests.Session],
+) -> Tuple[float, float, int]:
+    """Returns the wall clock and CPU time per request in milliseconds and connections opened."""
+    forecasts = make_forecasts(number, server.base_url, save_location)
+    connections = server.connection_count
+    start, start_cpu = time.perf_counter(), time.process_time()
+    update_forecasts(forecasts, concurrency, 1_000_000, session=session)
+    wall, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    return wall / number * 1e3, cpu / number * 1e3, server.connection_count - connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=REQUESTS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory)
+        certificate = make_certificate(path)
+        # Both Forecast.update and sessions check the server certificate against this bundle
+        os.environ["REQUESTS_CA_BUNDLE"] = certificate[0]
+        server = StubMetServer(certificate=certificate).start()
+
+        print(f"{args.requests} requests, times per request in milliseconds")
+        columns = ["connections", "wall ms", "cpu ms"]
+        print(f"{'transport':>12}{'concurrency':>12}" + "".join(f"{c:>13}" for c in columns))
+        try:
+            for concurrency in args.concurrency:
+                for transport in ["per request", "session"]:
+                    save_location = path.joinpath(f"{transport}_{concurrency}")
+                    save_location.mkdir()
+                    session = create_session(concurrency) if transport == "session" else None
+                    wall, cpu, connections = time_fetch(
+                        server, args.requests, concurrency, str(save_location), session
+                    )
+                    if session is not None:
+                        session.close()
+                    print(
+                        f"{transport:>12}{concurrency:>12}{connections:>13}"
+                        f"{wall:>13.2f}{cpu:>13.2f}"
+                    )
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark of loading saved forecasts, as render-only runs do, across threads and processes.
+
+Saves the forecast data in the test fixtures for a growing number of places, to one JSON file per
+place as earlier versions did and to the forecast cache, then times loading them all. JSON files
+are loaded one after another, the cache is loaded with `load_forecasts` serially and across pools
+of threads and of processes.
+
+Run from the root of the repository with:
+
+    python -m benchmarks.bench_load --places 100 1000 5000 --workers 2 4
+"""
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+from typing import Callable, List
+
+from metno_locationforecast import Forecast, Place
+
+from dryrock.forecast_cache import CachedForecast, ForecastCache, load_forecasts
+
+FIXTURES_PATH = pathlib.Path(__file__).parent.parent.joinpath("tests", "test_data")
+PLACE_COUNTS = [100, 1_000, 5_000]
+USER_AGENT = "dryrock-benchmarks"
+
+
+def make_places(number_of_places: int) -> List[Place]:
+    return [Place(f"Crag {i}", 53.0 + i / 10_000, -6.107, 95) for i in range(number_of_places)]
+
+
+def save_forecasts(places: List[Place], cache: ForecastCache, save_location: str):
+    """Saves the fixture data for every place to save_location and to the cache."""
+    fixture = Forecast(Place("Dalkey Quarry", 53.271, -6.107, 95), USER_AGENT)
+    fixture.save_location = FIXTURES_PATH
+    fixture.load()
+
+    for place in places:
+        forecast = CachedForecast(place, cache, user_agent=USER_AGENT, save_location=save_location)
+        forecast.json = fixture.json
+        forecast.json_string = fixture.json_string
+        forecast.save()
+        Forecast.save(forecast)
+
+
+def time_load(load: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    load()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--places", type=int, nargs="+", default=PLACE_COUNTS)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, times in seconds")
+    columns = ["json files", "cache"]
+    for workers in args.workers:
+        columns += [f"{workers} threads", f"{workers} processes"]
+    print(f"{'places':>7}" + "".join(f"{column:>14}" for column in columns))
+
+    for number_of_places in args.places:
+        places = make_places(number_of_places)
+        with tempfile.TemporaryDirectory() as directory:
+            save_location = str(pathlib.Path(directory).joinpath("forecast-data"))
+            cache = ForecastCache(str(pathlib.Path(directory).joinpath("cache.sqlite3")))
+            save_forecasts(places, cache, save_location)
+
+            def make_forecasts() -> List[Forecast]:
+                return [
+                    CachedForecast(place, cache, user_agent=USER_AGENT, save_location=save_location)
+                    for place in places
+                ]
+
+            def load_files():
+                # Forecasts are kept, as in a run, so that all methods pay for a growing heap
+                forecasts = [
+                    Forecast(place, USER_AGENT, save_location=save_location) for place in places
+                ]
+                for forecast in forecasts:
+                    forecast.load()
+
+            times = [
+                time_load(load_files),
+                time_load(lambda: load_forecasts(make_forecasts(), cache)),
+            ]
+            for workers in args.workers:
+                for processes in (False, True):
+                    times.append(
+                        time_load(
+                            lambda: load_forecasts(make_forecasts(), cache, workers, processes)
+                        )
+                    )
+            cache.close()
+
+        print(f"{number_of_places:>7}" + "".join(f"{seconds:>14.2f}" for seconds in times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""End-to-end benchmark of a run over synthetic areas against a local stand-in for the MET API.
+
+For each number of places an areas file is generated, forecasts are fetched from a stub server
+serving the recorded forecast in the test fixtures, and pages are rendered in a temporary
+directory. Fetching and rendering go through `update_forecasts` and `render_html_pages` as a run of
+`python -m dryrock` does, with a shared session, the render manifest, the dryness model and the
+output options from the config. Each of the phases of a run is timed:
+
+- load_areas: reading the areas file
+- fetch_cold: fetching every grid cell with no saved data, all responses are 200
+- fetch: fetching again with saved data, a share of responses are 304 Not Modified
+- hash_inputs, aggregate and render: the phases of `render_html_pages`, render includes writing
+
+Every number of places is benchmarked in a fresh process so that peak memory use is its own. Run
+from the root of the repository with:
+
+    python -m benchmarks.bench_pipeline --places 10 100 1000 10000 --output results.json
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import pathlib
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from metno_locationforecast import Forecast
+
+from dryrock.config import (
+    GRID_RESOLUTION_DEGREES,
+    GRID_RESOLUTION_METRES,
+    HASH_STATIC_ASSETS,
+    MINIFY_HTML,
+    PRECOMPRESS_OUTPUT,
+    RENDER_PROCESSES,
+    STATIC_PATH,
+)
+from dryrock.fetch import create_session, update_forecasts
+from dryrock.forecast_cache import CachedForecast, ForecastCache
+from dryrock.grid import group_into_cells
+from dryrock.metrics import RunMetrics
+from dryrock.places import get_areas
+from dryrock.reports.dryness import DrynessModel
+from dryrock.reports.output import OutputOptions, hash_static_assets
+from dryrock.reports.render_html import render_html_pages
+from dryrock.reports.render_manifest import RenderManifest
+from tests.met_stub import StubMetServer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore
+
+PLACE_COUNTS = [10, 100, 1_000, 10_000]
+PLACES_PER_AREA = 25
+USER_AGENT = "dryrock-benchmarks"
+
+# Places are scattered over Ireland and Great Britain
+LATITUDES = (51.4, 58.6)
+LONGITUDES = (-10.5, 1.7)
+ALTITUDES = (0, 1_000)
+
+
+def make_areas_file(file_path: pathlib.Path, number_of_places: int, seed: int = 0):
+    """Writes an areas file with number_of_places places at random locations."""
+    rng = random.Random(seed)
+    areas: List[Dict[str, Any]] = []
+    for i in range(number_of_places):
+        if i % PLACES_PER_AREA == 0:
+            areas.append(
+                {"area_name": f"Area {len(areas)}", "time_zone": "Europe/Dublin", "places": []}
+            )
+        areas[-1]["places"].append(
+            {
+                "place_name": f"Crag {i}",
+                "latitude": round(rng.uniform(*LATITUDES), 4),
+                "longitude": round(rng.uniform(*LONGITUDES), 4),
+                "altitude": rng.randint(*ALTITUDES),
+            }
+        )
+
+    file_path.write_text(json.dumps({"areas": areas}), encoding="utf8")
+
+
+def get_peak_memory_mb() -> Optional[float]:
+    """Returns the peak resident memory of this process in megabytes, if it can be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def make_forecasts(
+    areas, cache: ForecastCache, save_location: str, base_url: str
+) -> List[List[Forecast]]:
+    return [
+        [
+            CachedForecast(
+                place,
+                cache,
+                user_agent=USER_AGENT,
+                save_location=save_location,
+                base_url=base_url,
+            )
+            for place in area.places
+        ]
+        for area in areas
+    ]
+
+
+def run(
+    number_of_places: int,
+    latency: float,
+    not_modified_ratio: float,
+    max_concurrent_requests: int,
+    max_requests_per_second: float,
+) -> Dict[str, Any]:
+    """Benchmarks a run over number_of_places synthetic places and returns the results.
+
+    Pages are written to ./pages/, the working directory is changed to a temporary one for the run.
+    """
+    metrics = RunMetrics()
+    server = StubMetServer(latency, not_modified_ratio=not_modified_ratio, current=True).start()
+    session = create_session(max_concurrent_requests)
+    static_path = pathlib.Path(STATIC_PATH).resolve()
+    working_directory = os.getcwd()
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            directory_path = pathlib.Path(directory)
+            os.chdir(directory_path)
+            areas_file = directory_path.joinpath("areas.json")
+            save_location = str(directory_path.joinpath("forecast-data"))
+            cache = ForecastCache(str(directory_path.joinpath("forecast_cache.sqlite3")))
+            make_areas_file(areas_file, number_of_places)
+
+            with metrics.phase("load_areas"):
+                areas = get_areas(str(areas_file))
+
+            for phase in ("fetch_cold", "fetch"):
+                # Fresh forecasts each time, on the second pass they load the data saved by the
+                # first and make conditional requests
+                area_forecasts = make_forecasts(areas, cache, save_location, server.base_url)
+                cells = group_into_cells(
+                    area_forecasts, GRID_RESOLUTION_DEGREES, GRID_RESOLUTION_METRES
+                )
+                with metrics.phase(phase):
+                    update_forecasts(
+                        [cell.forecast for cell in cells],
+                        max_concurrent_requests,
+                        max_requests_per_second,
+                        session=session,
+                    )
+                    for cell in cells:
+                        cell.share_data()
+
+            # As set up by dryrock.__main__, with the state files in the temporary directory
+            manifest = RenderManifest(str(directory_path.joinpath("render_manifest.json")))
+            dryness_model = DrynessModel(str(directory_path.joinpath("dryness_state.json")))
+            static_urls = None
+            if HASH_STATIC_ASSETS:
+                shutil.copytree(static_path, directory_path.joinpath("static"))
+                static_urls = hash_static_assets(
+                    directory_path.joinpath("static"), compress=PRECOMPRESS_OUTPUT
+                )
+            render_html_pages(
+                areas,
+                area_forecasts,
+                manifest=manifest,
+                processes=RENDER_PROCESSES,
+                metrics=metrics,
+                dryness_model=dryness_model,
+                output_options=OutputOptions(minify=MINIFY_HTML, compress=PRECOMPRESS_OUTPUT),
+                static_urls=static_urls,
+            )
+
+            cache_bytes = cache.file_path.stat().st_size
+            cache.close()
+            # Leave the directory before it is removed
+            os.chdir(working_directory)
+    finally:
+        os.chdir(working_directory)
+        session.close()
+        server.stop()
+
+    total_wall_seconds = sum(phase["wall_seconds"] for phase in metrics.phases.values())
+    return {
+        "places": number_of_places,
+        "areas": len(areas),
+        "grid_cells": len(cells),
+        "pages": metrics.pages_rendered,
+        "page_bytes": metrics.bytes_written,
+        "cache_bytes": cache_bytes,
+        "responses": {str(status): count for status, count in server.status_counts.items()},
+        "phases": metrics.phases,
+        "total_wall_seconds": round(total_wall_seconds, 4),
+        "places_per_second": round(number_of_places / total_wall_seconds, 1),
+        "peak_memory_mb": get_peak_memory_mb(),
+    }
+
+
+def get_git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--places", type=int, nargs="+", default=PLACE_COUNTS)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency in seconds")
+    parser.add_argument(
+        "--not-modified-ratio", type=float, default=0.5, help="Share of 304 responses when fetching"
+    )
+    parser.add_argument("--max-concurrent-requests", type=int, default=16)
+    parser.add_argument("--max-requests-per-second", type=float, default=1_000)
+    parser.add_argument("--output", type=pathlib.Path, help="File to write the JSON results to")
+    args = parser.parse_args()
+
+    settings = {
+        "latency": args.latency,
+        "not_modified_ratio": args.not_modified_ratio,
+        "max_concurrent_requests": args.max_concurrent_requests,
+        "max_requests_per_second": args.max_requests_per_second,
+        "places_per_area": PLACES_PER_AREA,
+    }
+    results = []
+    for number_of_places in args.places:
+        # A new process for each run so that peak memory is measured per run
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result = executor.submit(
+                run,
+                number_of_places,
+                args.latency,
+                args.not_modified_ratio,
+                args.max_concurrent_requests,
+                args.max_requests_per_second,
+            ).result()
+        results.append(result)
+        phases = ", ".join(
+            f"{name} {phase['wall_seconds']:.2f}s" for name, phase in result["phases"].items()
+        )
+        print(f"{number_of_places} places: {phases}, peak memory {result['peak_memory_mb']} MB")
+
+    report = {
+        "revision": get_git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf8")
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark of rendering forecast pages serially and across a pool of processes.
+
+Builds synthetic areas whose places all use the forecast data in the test fixtures and times
+`render_html_pages` for a growing number of areas. Pages are written to a temporary directory.
+
+Run from the root of the repository with:
+
+    python -m benchmarks.bench_render
+"""
+
+import os
+import pathlib
+import tempfile
+import time
+
+from metno_locationforecast import Forecast, Place
+
+from dryrock.places import Area
+from dryrock.reports.render_html import render_html_pages
+
+FIXTURES_PATH = pathlib.Path(__file__).parent.parent.joinpath("tests", "test_data")
+AREA_COUNTS = [2, 8, 32, 64]
+PLACES_PER_AREA = 8
+
+
+def make_areas(number_of_areas: int):
+    dalkey = Place("Dalkey Quarry", 53.271, -6.107, 95)
+    forecast = Forecast(dalkey, save_location=str(FIXTURES_PATH))
+    forecast.load()
+
+    areas = []
+    area_forecasts = []
+    for i in range(number_of_areas):
+        places = [Place(f"Crag {i}-{j}", 53.271, -6.107, 95) for j in range(PLACES_PER_AREA)]
+        place_forecasts = []
+        for place in places:
+            place_forecast = Forecast(place, save_location=str(FIXTURES_PATH))
+            place_forecast.data = forecast.data
+            place_forecasts.append(place_forecast)
+        areas.append(Area(f"Area {i}", "Europe/Dublin", places))
+        area_forecasts.append(place_forecasts)
+
+    return areas, area_forecasts
+
+
+def time_render(areas, area_forecasts, processes: int) -> float:
+    start = time.perf_counter()
+    render_html_pages(areas, area_forecasts, processes=processes)
+    return time.perf_counter() - start
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    print(f"{PLACES_PER_AREA} places per area, {cpus} CPUs")
+    print(f"{'areas':>6}{'pages':>7}{'1 process (s)':>15}{f'{cpus} processes (s)':>18}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Pages are written to ./pages
+        os.chdir(directory)
+        for number_of_areas in AREA_COUNTS:
+            areas, area_forecasts = make_areas(number_of_areas)
+            serial = time_render(areas, area_forecasts, 1)
+            parallel = time_render(areas, area_forecasts, cpus)
+            pages = 2 * number_of_areas + 4
+            print(f"{number_of_areas:>6}{pages:>7}{serial:>15.2f}{parallel:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
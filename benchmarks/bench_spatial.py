@@ -0,0 +1,95 @@
+"""Benchmark of nearest place and radius queries on the spatial index of places.
+
+Builds the index over a growing number of random places and times queries at random points,
+against a brute force scan of every place for comparison.
+
+Run from the root of the repository with:
+
+    python -m benchmarks.bench_spatial --places 1000 10000 50000
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+from metno_locationforecast import Place
+
+from dryrock.spatial import EARTH_RADIUS_KM, PlaceIndex
+
+PLACE_COUNTS = [1_000, 10_000, 50_000]
+QUERIES = 1_000
+K = 10
+RADIUS = 50  # kilometres
+
+
+def make_places(number_of_places: int) -> List[Place]:
+    return [
+        Place(f"Crag {i}", random.uniform(-60, 70), random.uniform(-180, 180), 0)
+        for i in range(number_of_places)
+    ]
+
+
+def get_distances(places: List[Place]) -> Callable[[float, float], np.ndarray]:
+    """Returns a function giving the haversine distance in kilometres from a point to each place."""
+    latitudes = np.radians([place.coordinates["latitude"] for place in places])
+    longitudes = np.radians([place.coordinates["longitude"] for place in places])
+
+    def distances(latitude: float, longitude: float) -> np.ndarray:
+        latitude, longitude = np.radians(latitude), np.radians(longitude)
+        h = (
+            np.sin((latitudes - latitude) / 2) ** 2
+            + np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
+
+    return distances
+
+
+def time_queries(query: Callable[[float, float], object], points: List[Tuple[float, float]]):
+    """Returns the mean time of a query in microseconds."""
+    start = time.perf_counter()
+    for latitude, longitude in points:
+        query(latitude, longitude)
+    return (time.perf_counter() - start) / len(points) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--places", type=int, nargs="+", default=PLACE_COUNTS)
+    args = parser.parse_args()
+
+    random.seed(0)
+    points = [(random.uniform(-60, 70), random.uniform(-180, 180)) for _ in range(QUERIES)]
+
+    print(f"Build time in seconds, query times in microseconds, k={K}, radius={RADIUS} km")
+    columns = ["build", "nearest", "within", "brute nearest", "brute within"]
+    print(f"{'places':>7}" + "".join(f"{column:>15}" for column in columns))
+    for number_of_places in args.places:
+        places = make_places(number_of_places)
+        start = time.perf_counter()
+        index = PlaceIndex(places)
+        build = time.perf_counter() - start
+
+        distances = get_distances(places)
+        times = [
+            time_queries(lambda latitude, longitude: index.nearest(latitude, longitude, K), points),
+            time_queries(
+                lambda latitude, longitude: index.within(latitude, longitude, RADIUS), points
+            ),
+            time_queries(
+                lambda latitude, longitude: np.argsort(distances(latitude, longitude))[:K], points
+            ),
+            time_queries(
+                lambda latitude, longitude: np.nonzero(distances(latitude, longitude) <= RADIUS),
+                points,
+            ),
+        ]
+        print(
+            f"{number_of_places:>7}{build:>15.3f}" + "".join(f"{micros:>15.1f}" for micros in times)
+        )
+
+
+if __name__ == "__main__":
+    main()
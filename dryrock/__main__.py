@@ -1,5 +1,6 @@
 """Updates weather data for all places and renders templates."""
 
+import datetime as dt
 import logging
 import pathlib
 import sys
@@ -7,21 +8,68 @@ from typing import List
 
 from metno_locationforecast import Forecast
 
-from .config import AREAS_FILE, LOGGING_LEVEL, OUTPUT_PATH
+from .config import (
+    ARCHIVE_FILE,
+    ARCHIVE_HOURS,
+    AREAS_FILE,
+    DAEMON_RETRY_SECONDS,
+    DRYNESS_STATE_FILE,
+    FORECAST_CACHE_FILE,
+    GRID_RESOLUTION_DEGREES,
+    GRID_RESOLUTION_METRES,
+    HASH_STATIC_ASSETS,
+    LOAD_IN_PROCESSES,
+    LOAD_WORKERS,
+    LOGGING_LEVEL,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_REQUESTS_PER_SECOND,
+    MINIFY_HTML,
+    NEARBY_PATH,
+    NEARBY_PLACES,
+    OUTPUT_PATH,
+    PRECOMPRESS_OUTPUT,
+    PROFILE_PATH,
+    PROMETHEUS_FILE,
+    RENDER_MANIFEST_FILE,
+    RENDER_PROCESSES,
+    RUN_REPORT_FILE,
+    STATIC_PATH,
+)
+from .archive import ForecastArchive
 from .copy_reports import copy_index
+from .fetch import create_session, update_forecasts
+from .forecast_cache import CachedForecast, ForecastCache, load_forecasts, remove_legacy_files
+from .grid import get_dedup_ratio, group_into_cells
+from .metrics import RunMetrics
 from .places import get_areas
+from .profiling import MemoryProfiler, PhaseProfiler, Profiler
+from .reports.dryness import DrynessModel
+from .reports.output import OutputOptions, hash_static_assets
 from .reports.render_html import render_html_pages
+from .reports.render_manifest import RenderManifest
+from .reports.template_environment import compile_templates
+from .scheduler import run_daemon
+from .spatial import PlaceIndex, write_region_files
 
 if __name__ == "__main__":
 
-    # Create logger
+    # Create logger, the package logger also gets the handler so that messages from our modules end
+    # up in the same log file
     logger = logging.getLogger(__name__)
-    logger.setLevel(LOGGING_LEVEL)
+    package_logger = logging.getLogger(__package__)
     file_handler = logging.FileHandler("dryrock.log")
     file_handler.setLevel(LOGGING_LEVEL)
     formatter = logging.Formatter("%(asctime)s : %(levelname)s : %(name)s : %(message)s")
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    for log in (logger, package_logger):
+        log.setLevel(LOGGING_LEVEL)
+        log.addHandler(file_handler)
+
+    # Precompile the templates and exit, later runs load the compiled templates
+    if "--compile-templates" in sys.argv:
+        logger.info("Compiling templates")
+        compile_templates()
+        sys.exit(0)
 
     # Check for render only mode (passed as a command line parameter)
     render_only = False
@@ -29,6 +77,15 @@ if __name__ == "__main__":
         render_only = True
         logger.warning("Running in render only mode")
 
+    # Check for daemon mode, keeps running and refreshes forecasts as their data expires
+    daemon = False
+    if "--daemon" in sys.argv:
+        if render_only:
+            logger.error("Daemon mode cannot be used with render only mode")
+            sys.exit(1)
+        daemon = True
+        logger.warning("Running in daemon mode")
+
     # Output path
     output_path = pathlib.Path(OUTPUT_PATH)
     logger.info(f"Outputting files to: {output_path}")
@@ -36,51 +93,142 @@ if __name__ == "__main__":
         logger.debug("Output file path does not exist, creating output file path")
         output_path.mkdir(parents=True)
 
+    # Check for profiling modes, each phase of the run is profiled and the profiles written to file.
+    # The memory profiler goes first so that its snapshots are taken outside of cProfile.
+    profilers: List[Profiler] = []
+    if "--memprofile" in sys.argv:
+        profilers.append(MemoryProfiler(PROFILE_PATH))
+        logger.warning(f"Running in memory profiling mode, writing profiles to {PROFILE_PATH}")
+    if "--profile" in sys.argv:
+        profilers.append(PhaseProfiler(PROFILE_PATH))
+        logger.warning(f"Running in profiling mode, writing profiles to {PROFILE_PATH}")
+    if profilers and daemon:
+        logger.error("Profiling cannot be used with daemon mode")
+        sys.exit(1)
+    for profiler in profilers:
+        profiler.start()
+
+    # Timings and counts for the run, written to a report at the end
+    metrics = RunMetrics(profilers)
+
     # Load areas from areas file
     logger.info("Loading areas")
-    areas = get_areas(AREAS_FILE)
+    with metrics.phase("load_areas"):
+        areas = get_areas(AREAS_FILE)
+        place_index = PlaceIndex([place for area in areas for place in area.places])
+        region_sizes = write_region_files(areas, place_index, NEARBY_PATH, NEARBY_PLACES)
+        metrics.record_files(region_sizes.files_written, region_sizes.files_skipped)
     logger.debug("Loaded areas")
 
     logger.info("Creating forecasts")
-    area_forecasts: List[List[Forecast]] = []
-    for area in areas:
-        place_forecasts: List[Forecast] = []
-        for place in area.places:
-            place_forecasts.append(Forecast(place))
+    with metrics.phase("create_forecasts"):
+        forecast_cache = ForecastCache(FORECAST_CACHE_FILE)
+        area_forecasts: List[List[Forecast]] = []
+        for area in areas:
+            place_forecasts: List[Forecast] = []
+            for place in area.places:
+                place_forecasts.append(CachedForecast(place, forecast_cache))
+
+            area_forecasts.append(place_forecasts)
+
+        # Places in the same grid cell share a forecast so we only make one request for each cell
+        cells = group_into_cells(area_forecasts, GRID_RESOLUTION_DEGREES, GRID_RESOLUTION_METRES)
 
-        area_forecasts.append(place_forecasts)
+        # Data saved to JSON files by earlier versions is never read now, it is in the cache
+        for save_location in {str(cell.forecast.save_location) for cell in cells}:
+            remove_legacy_files(save_location)
     logger.debug("Created areas")
+    logger.info(
+        f"Grouped {sum(len(area.places) for area in areas)} places into {len(cells)} grid cells, "
+        f"dedup ratio {get_dedup_ratio(cells):.2f}"
+    )
+
+    # New forecasts are archived as they are fetched
+    archive = ForecastArchive(ARCHIVE_FILE, ARCHIVE_HOURS) if ARCHIVE_FILE is not None else None
+
+    # All requests share a pool of connections, rather than making a new one for each request
+    session = create_session(MAX_CONCURRENT_REQUESTS)
 
     if not render_only:
         # Check for updated weather data
         logger.info("Updating forecasts")
-        for area_forecast in area_forecasts:
-            for place_forecast in area_forecast:
-                status = place_forecast.update()
-                if status == "Data-Modified":
-                    logger.debug(f"Forecast data for {place_forecast.place.name} updated")
-                if hasattr(place_forecast, "response") and (
-                    status_code := place_forecast.response.status_code
-                ) not in {
-                    200,
-                    304,
-                }:
-                    logger.warning(
-                        f"Received {status_code} response for request to update {place_forecast.place.name} data"  # noqa: E501
-                    )
+        with metrics.phase("fetch"):
+            update_forecasts(
+                [cell.forecast for cell in cells],
+                MAX_CONCURRENT_REQUESTS,
+                MAX_REQUESTS_PER_SECOND,
+                metrics,
+                archive,
+                session,
+            )
         logger.debug("Updated forecasts")
     else:
         # Load weather data from files
         logger.info("Loading forecasts from existing data")
-        for area_forecast in area_forecasts:
-            for place_forecast in area_forecast:
-                place_forecast.load()
+        with metrics.phase("load_forecasts"):
+            load_forecasts(
+                [cell.forecast for cell in cells], forecast_cache, LOAD_WORKERS, LOAD_IN_PROCESSES
+            )
         logger.debug("Loaded forecasts from existing data")
 
-    # Render HTML pages
+    for cell in cells:
+        cell.share_data()
+
+    # Render HTML pages, skipping those whose inputs have not changed since the last run
     logger.info("Rendering pages")
-    render_html_pages(areas, area_forecasts)
-    copy_index()
+    manifest = RenderManifest(RENDER_MANIFEST_FILE)
+    manifest.load()
+    dryness_model = DrynessModel(DRYNESS_STATE_FILE)
+    dryness_model.load()
+    output_options = OutputOptions(minify=MINIFY_HTML, compress=PRECOMPRESS_OUTPUT)
+    static_urls = None
+    if HASH_STATIC_ASSETS:
+        static_urls = hash_static_assets(pathlib.Path(STATIC_PATH), compress=PRECOMPRESS_OUTPUT)
+    render_html_pages(
+        areas,
+        area_forecasts,
+        manifest=manifest,
+        processes=RENDER_PROCESSES,
+        metrics=metrics,
+        dryness_model=dryness_model,
+        output_options=output_options,
+        static_urls=static_urls,
+    )
+    metrics.record_files(*copy_index())
     logger.debug("Rendered pages")
 
+    for profiler in profilers:
+        profiler.stop()
+
+    metrics.write_report(RUN_REPORT_FILE)
+    if PROMETHEUS_FILE is not None:
+        metrics.write_prometheus(PROMETHEUS_FILE)
+    phase_times = ", ".join(
+        f"{name} {phase['wall_seconds']:.2f}s" for name, phase in metrics.phases.items()
+    )
+    logger.info(f"Run took {phase_times}")
+
+    if daemon:
+        logger.info("Refreshing forecasts as they expire")
+        run_daemon(
+            cells,
+            lambda area_indices: render_html_pages(
+                areas,
+                area_forecasts,
+                area_indices,
+                manifest,
+                RENDER_PROCESSES,
+                dryness_model=dryness_model,
+                output_options=output_options,
+                static_urls=static_urls,
+            ),
+            MAX_CONCURRENT_REQUESTS,
+            MAX_REQUESTS_PER_SECOND,
+            dt.timedelta(seconds=DAEMON_RETRY_SECONDS),
+            archive,
+            session,
+        )
+
+    session.close()
+    forecast_cache.close()
     logger.info("Complete")
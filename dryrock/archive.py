@@ -0,0 +1,296 @@
+"""Append-only archive of past forecasts, stored as fixed-width records in a memory-mapped file."""
+
+import datetime as dt
+import json
+import logging
+import os
+import pathlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from metno_locationforecast import Forecast
+
+logger = logging.getLogger(__name__)
+
+# Variables of the compact forecast, stored in this order. Changing them changes the record layout
+# so FORMAT_VERSION must change with them.
+ARCHIVE_VARIABLES = [
+    "air_pressure_at_sea_level",
+    "air_temperature",
+    "cloud_area_fraction",
+    "precipitation_amount",
+    "relative_humidity",
+    "wind_from_direction",
+    "wind_speed",
+]
+FORMAT_VERSION = 2
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("place_id", "<u4"),  # Id of the place in the place table, see ForecastArchive
+        ("hours", "<u4"),  # Length of the interval, 0 for instantaneous values only
+        ("issued_at", "<i8"),  # When the forecast was made, seconds since the epoch
+        ("start_time", "<i8"),  # Start of the interval, seconds since the epoch
+    ]
+    + [(name, "<f4") for name in ARCHIVE_VARIABLES]  # NaN where a value is missing
+)
+
+# Each append writes one block of records, for one forecast in start time order. The index holds
+# where each block is and the range of start times in it.
+INDEX_DTYPE = np.dtype(
+    [
+        ("place_id", "<u4"),
+        ("count", "<u4"),  # Number of records in the block
+        ("offset", "<u8"),  # Position of the first record of the block in the archive
+        ("first_start_time", "<i8"),
+        ("last_start_time", "<i8"),
+    ]
+)
+
+# The header identifies the file and the layout of its records
+MAGIC = b"DRYROCK\x00"
+HEADER = MAGIC + np.array([FORMAT_VERSION, RECORD_DTYPE.itemsize], dtype="<u4").tobytes()
+
+
+def to_records(forecast: Forecast, place_id: int, max_hours: Optional[int] = None) -> np.ndarray:
+    """Returns the intervals of the forecast data as records.
+
+    Args:
+        forecast: Forecast with data.
+        place_id: Id to store the records under.
+        max_hours: If given only intervals starting less than this many hours after the forecast
+            was made are included.
+    """
+    data = forecast.data
+    intervals = data.intervals
+    if max_hours is not None:
+        cutoff = data.updated_at + dt.timedelta(hours=max_hours)
+        intervals = [interval for interval in intervals if interval.start_time < cutoff]
+
+    records = np.zeros(len(intervals), dtype=RECORD_DTYPE)
+    records["place_id"] = place_id
+    records["issued_at"] = int(data.updated_at.timestamp())
+    for i, interval in enumerate(intervals):
+        records["hours"][i] = (interval.end_time - interval.start_time).total_seconds() // 3600
+        records["start_time"][i] = int(interval.start_time.timestamp())
+        for name in ARCHIVE_VARIABLES:
+            variable = interval.variables.get(name)
+            records[name][i] = variable.value if variable is not None else np.nan
+
+    return records
+
+
+def get_blocks(records: np.ndarray, offset: int = 0) -> np.ndarray:
+    """Returns index entries for records, splitting them into blocks as they were appended.
+
+    A new block starts wherever the place changes or the start time does not increase, records of
+    one append always share a place and are in start time order.
+
+    Args:
+        records: Records in the order they were appended.
+        offset: Position of the first of the records in the archive.
+    """
+    if len(records) == 0:
+        return np.zeros(0, dtype=INDEX_DTYPE)
+
+    place_ids = records["place_id"]
+    start_times = records["start_time"]
+    is_first = np.ones(len(records), dtype=bool)
+    is_first[1:] = (place_ids[1:] != place_ids[:-1]) | (start_times[1:] <= start_times[:-1])
+    firsts = np.flatnonzero(is_first)
+    lasts = np.append(firsts[1:], len(records)) - 1
+
+    blocks = np.zeros(len(firsts), dtype=INDEX_DTYPE)
+    blocks["place_id"] = place_ids[firsts]
+    blocks["count"] = lasts - firsts + 1
+    blocks["offset"] = firsts + offset
+    blocks["first_start_time"] = start_times[firsts]
+    blocks["last_start_time"] = start_times[lasts]
+    return blocks
+
+
+class ForecastArchive:
+    """Every forecast made for each place, appended to a single file as fixed-width records.
+
+    Records are only ever appended so old data is never rewritten, however large the archive grows.
+    They are read through a memory map so nothing is loaded up front. Two files sit alongside the
+    archive:
+
+    - `<archive>.places.json`, the place table, maps the file name of each forecast to the id its
+      records are stored under. Ids are given out in order as places are first archived.
+    - `<archive>.index`, holds the position and time range of each block of records appended, so
+      a query only reads the blocks of its place that overlap its time range. The index is rebuilt
+      from the records if it is missing or behind them.
+
+    Appending is safe from multiple threads.
+
+    Attributes:
+        file_path: Location of the archive.
+        max_hours: If set only intervals starting less than this many hours after each forecast was
+            made are archived.
+    """
+
+    def __init__(self, file_path: str, max_hours: Optional[int] = None):
+        """Create a ForecastArchive object, creating the archive if it does not exist.
+
+        Args:
+            file_path: Location of the archive.
+            max_hours: Optional; Number of hours of each forecast to archive.
+
+        Raises:
+            ValueError: If the file is not an archive or has a different record layout.
+        """
+        self.file_path = pathlib.Path(file_path)
+        self.max_hours = max_hours
+        self._places_path = self.file_path.with_name(self.file_path.name + ".places.json")
+        self._index_path = self.file_path.with_name(self.file_path.name + ".index")
+        self._lock = threading.Lock()
+        self._records: Optional[np.ndarray] = None
+        self._place_ids: Dict[str, int] = {}
+        self._index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._place_blocks: Dict[int, List[int]] = {}
+
+        if not self.file_path.exists():
+            if not self.file_path.parent.is_dir():
+                self.file_path.parent.mkdir(parents=True)
+            self.file_path.write_bytes(HEADER)
+            self._index_path.write_bytes(b"")
+            self._save_places()
+            return
+
+        with open(self.file_path, "rb") as file:
+            header = file.read(len(HEADER))
+        if header != HEADER:
+            raise ValueError(f"{self.file_path} is not a forecast archive in the current format")
+
+        # A run stopped part way through an append can leave a partial record at the end
+        size = self.file_path.stat().st_size
+        partial = (size - len(HEADER)) % RECORD_DTYPE.itemsize
+        if partial:
+            logger.warning(f"Removing partially written record from the end of {self.file_path}")
+            os.truncate(self.file_path, size - partial)
+
+        if self._places_path.exists():
+            self._place_ids = json.loads(self._places_path.read_text(encoding="utf8"))
+        self._load_index()
+
+    def __repr__(self) -> str:
+        return f"ForecastArchive({self.file_path}, {len(self)} records)"
+
+    def __len__(self) -> int:
+        return (self.file_path.stat().st_size - len(HEADER)) // RECORD_DTYPE.itemsize
+
+    @property
+    def records(self) -> np.ndarray:
+        """All records in the archive, in the order they were appended, as a read-only array."""
+        length = len(self)
+        if self._records is None or len(self._records) != length:
+            if length == 0:
+                self._records = np.zeros(0, dtype=RECORD_DTYPE)
+            else:
+                self._records = np.memmap(
+                    self.file_path, RECORD_DTYPE, "r", offset=len(HEADER), shape=(length,)
+                )
+        return self._records
+
+    def get_place_id(self, forecast: Forecast) -> Optional[int]:
+        """Returns the id records for the forecast are stored under, None if it has none.
+
+        Places are identified by the file name of their forecast, made from its coordinates and
+        type, so the id stays the same from run to run whatever the place is named.
+        """
+        return self._place_ids.get(forecast.file_name)
+
+    def _save_places(self):
+        # Write then rename so an interrupted run never leaves a partly written table
+        temp_path = self._places_path.with_name(self._places_path.name + ".tmp")
+        temp_path.write_text(json.dumps(self._place_ids, indent=2) + "\n", encoding="utf8")
+        temp_path.replace(self._places_path)
+
+    def _add_blocks(self, blocks: np.ndarray):
+        start = len(self._index)
+        self._index = np.concatenate([self._index, blocks])
+        for i, place_id in enumerate(blocks["place_id"].tolist(), start):
+            self._place_blocks.setdefault(place_id, []).append(i)
+
+    def _load_index(self):
+        """Loads the index, rebuilding any part of it that is missing or does not match records."""
+        length = len(self)
+        size = self._index_path.stat().st_size if self._index_path.exists() else 0
+        saved = np.zeros(0, dtype=INDEX_DTYPE)
+        if size >= INDEX_DTYPE.itemsize:
+            saved = np.fromfile(self._index_path, INDEX_DTYPE, size // INDEX_DTYPE.itemsize)
+        # Blocks past the end of the records are from an append that did not finish
+        blocks = saved[saved["offset"] + saved["count"] <= length]
+        indexed = int(blocks["offset"][-1] + blocks["count"][-1]) if len(blocks) else 0
+
+        if indexed < length:
+            logger.warning(f"Indexing {length - indexed} records of {self.file_path}")
+            blocks = np.concatenate([blocks, get_blocks(self.records[indexed:], indexed)])
+        if len(blocks) != len(saved) or size % INDEX_DTYPE.itemsize:
+            with open(self._index_path, "wb") as file:
+                file.write(blocks.tobytes())
+        self._add_blocks(blocks)
+
+    def append(self, forecast: Forecast) -> int:
+        """Appends the intervals of the forecast data to the archive and returns how many."""
+        with self._lock:
+            place_id = self._place_ids.get(forecast.file_name)
+            if place_id is None:
+                place_id = len(self._place_ids)
+                self._place_ids[forecast.file_name] = place_id
+                # The table is saved first so records are never stored under an unknown id
+                self._save_places()
+
+            records = to_records(forecast, place_id, self.max_hours)
+            if len(records) == 0:
+                return 0
+            offset = len(self)
+            with open(self.file_path, "ab") as file:
+                file.write(records.tobytes())
+            blocks = get_blocks(records, offset)
+            with open(self._index_path, "ab") as index_file:
+                index_file.write(blocks.tobytes())
+            self._add_blocks(blocks)
+        return len(records)
+
+    def query(self, place_id: int, start: dt.datetime, end: dt.datetime) -> np.ndarray:
+        """Returns every record for the place with a start time between start and end.
+
+        Start is inclusive and end exclusive, records are in the order they were appended so the
+        same interval appears once for every forecast that covered it. Only the blocks of records
+        of the place that overlap the time range are read.
+        """
+        start_time, end_time = start.timestamp(), end.timestamp()
+        with self._lock:
+            blocks = self._index[self._place_blocks.get(place_id, [])]
+        blocks = blocks[
+            (blocks["last_start_time"] >= start_time) & (blocks["first_start_time"] < end_time)
+        ]
+        if len(blocks) == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+
+        records = self.records
+        parts = []
+        for offset, count in zip(blocks["offset"].tolist(), blocks["count"].tolist()):
+            block = records[offset:][:count]
+            first, last = np.searchsorted(block["start_time"], [start_time, end_time])
+            parts.append(block[first:last])
+        return np.concatenate(parts)
+
+    def latest(self, place_id: int, start: dt.datetime, end: dt.datetime) -> np.ndarray:
+        """Returns the record from the most recent forecast for each interval, in time order.
+
+        This is the best record of what the weather was for intervals in the past. Where forecasts
+        made at the same time cover the same start time the shortest interval is kept.
+        """
+        records = self.query(place_id, start, end)
+        if len(records) == 0:
+            return records
+        # Sort by start time, latest issue first and then shortest interval first, keeping the
+        # first record for each start time
+        order = np.lexsort((records["hours"], -records["issued_at"], records["start_time"]))
+        records = records[order]
+        _, first = np.unique(records["start_time"], return_index=True)
+        return records[first]
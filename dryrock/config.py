@@ -9,3 +9,96 @@ Defaults
 AREAS_FILE = "./data/input/areas.json"
 OUTPUT_PATH = "./data/output/"
 LOGGING_LEVEL = 10  # 10 - DEBUG, 20 - INFO, 30 - WARNING
+
+# Forecast data is saved to this SQLite database. JSON files saved by earlier versions to the
+# save_location in setup.cfg are deleted.
+FORECAST_CACHE_FILE = "./data/output/forecast_cache.sqlite3"
+
+# Every new forecast is appended to the archive at ARCHIVE_FILE, set it to None to turn archiving
+# off. Only intervals starting within ARCHIVE_HOURS of when each forecast was made are kept, each
+# interval takes 52 bytes, set it to None to keep them all. The archive is not committed, the
+# update-site action carries it between runs in the GitHub Actions cache, which drops it after 7
+# days without a run. For a lasting archive run on your own machine or in daemon mode.
+ARCHIVE_FILE: str | None = "./data/archive/forecasts.bin"
+ARCHIVE_HOURS: int | None = 24
+
+# Number of workers saved forecasts are parsed across in render-only mode, in processes rather than
+# threads if LOAD_IN_PROCESSES is True. See benchmarks/bench_load.py for which pays off.
+LOAD_WORKERS = 1
+LOAD_IN_PROCESSES = False
+
+# Timings and counts for each run are written to the run report as JSON, and in the Prometheus text
+# format to PROMETHEUS_FILE if it is set, e.g. for the node exporter's textfile collector.
+RUN_REPORT_FILE = "./data/output/run_report.json"
+PROMETHEUS_FILE: str | None = None
+
+# Profiles written when running with --profile, a pstats file per phase and collapsed stacks for
+# flame graphs
+PROFILE_PATH = "./profiles/"
+
+# Hashes of the inputs each page was last rendered from, pages are only rendered again when these
+# change. Delete the file to render every page.
+RENDER_MANIFEST_FILE = "./data/output/render_manifest.json"
+
+# Wetness of the rock at each place is carried over from run to run in this file, places start out
+# dry if it is missing.
+DRYNESS_STATE_FILE = "./data/output/dryness_state.json"
+
+# Number of processes pages are rendered across, 1 renders them in the main process. Rendering in
+# parallel only pays off with many areas, each worker has to start and load the templates.
+RENDER_PROCESSES = 1
+
+# How pages and data files are written. MINIFY_HTML collapses runs of whitespace in pages,
+# PRECOMPRESS_OUTPUT writes .gz copies of every file, and .br copies if the brotli package is
+# installed, for servers that serve precompressed files (GitHub Pages does not). HASH_STATIC_ASSETS
+# points pages at copies of the files in STATIC_PATH named with a hash of their content, so browsers
+# can cache them for as long as they like. Copies of earlier versions are deleted on each run.
+MINIFY_HTML = True
+PRECOMPRESS_OUTPUT = False
+HASH_STATIC_ASSETS = True
+STATIC_PATH = "./static/"
+
+# Templates precompiled into Python modules with `python -m dryrock --compile-templates`, they are
+# only used while they match the template sources
+COMPILED_TEMPLATES_PATH = "./data/output/compiled_templates"
+
+# Parts of the day that rain totals are shown for in the forecast tables, as (name, start hour, end
+# hour) in the local time of the area. The end hour is exclusive and can be 24 for midnight, parts
+# can overlap and there can be any number of them.
+DAY_PARTS = [
+    ("Night", 0, 6),
+    ("Morning", 6, 12),
+    ("Afternoon", 12, 18),
+    ("Evening", 18, 24),
+]
+
+# Places across all areas are ranked by how dry they will be over each of RANKING_WINDOWS, one of
+# "today", "tomorrow" or "weekend". Only the RANKING_SIZE driest places are shown and only the
+# hours between RANKING_HOURS, (start hour, end hour) in the local time of the area, count.
+RANKING_WINDOWS = ["tomorrow", "weekend"]
+RANKING_SIZE = 20
+RANKING_HOURS = (8, 20)
+
+# For a "near me" search each area's places are written to a file in NEARBY_PATH along with the
+# NEARBY_PLACES places nearest to each of them across all areas.
+NEARBY_PATH = "./pages/near/"
+NEARBY_PLACES = 5
+
+# Forecast fetching, MET Norway's terms of service allow at most 20 requests per second for an
+# application so we stay well below that.
+MAX_CONCURRENT_REQUESTS = 4
+MAX_REQUESTS_PER_SECOND = 10
+# Seconds to wait to connect to the API and then between bytes of its response, requests that take
+# longer fail rather than holding up a run.
+REQUEST_TIMEOUT_SECONDS = (10, 30)
+
+# Places are grouped into grid cells of this size and one request is made per cell. Latitude and
+# longitude are snapped to multiples of GRID_RESOLUTION_DEGREES (0.01 degrees is roughly 1 km, the
+# forecast model grid is 2.5 km) and altitude to multiples of GRID_RESOLUTION_METRES. Use 0.0001
+# and 1 to request every place individually.
+GRID_RESOLUTION_DEGREES = 0.01
+GRID_RESOLUTION_METRES = 10
+
+# Daemon mode, forecasts are refreshed when their data expires but failed or early refreshes are
+# not retried for at least this many seconds
+DAEMON_RETRY_SECONDS = 300
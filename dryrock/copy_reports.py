@@ -1,11 +1,26 @@
 import pathlib
-import shutil
+from typing import Tuple
 
+from .reports.output import copy_file
 
-def copy_index():
-    """Copies index.html from the output folder into the current directory."""
+
+def copy_index() -> Tuple[int, int]:
+    """Copies index.html, and any precompressed copies of it, from the output folder into the
+    current directory.
+
+    Files are only replaced if their content has changed.
+
+    Returns:
+        The number of files replaced and the number left as they were.
+    """
 
     src_file = pathlib.Path("./pages/index.html")
-    destination = "."
+    destination = pathlib.Path(".")
 
-    shutil.copy(src_file, destination)
+    src_files = [src_file] + [
+        src_file.with_name(src_file.name + suffix)
+        for suffix in [".gz", ".br"]
+        if src_file.with_name(src_file.name + suffix).exists()
+    ]
+    written = sum(copy_file(file, destination.joinpath(file.name)) for file in src_files)
+    return written, len(src_files) - written
@@ -0,0 +1,197 @@
+"""Functions for fetching forecast data concurrently."""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+import requests
+from metno_locationforecast import Forecast
+
+from .archive import ForecastArchive
+from .config import REQUEST_TIMEOUT_SECONDS
+from .metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spaces out calls so that no more than a given number start each second.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_per_second: float):
+        """Create a RateLimiter object.
+
+        Args:
+            max_per_second: Maximum number of calls allowed to start per second.
+        """
+        if max_per_second <= 0:
+            raise ValueError("max_per_second must be greater than zero")
+
+        self.interval = 1 / max_per_second
+        self._lock = threading.Lock()
+        self._next_time = time.monotonic()
+
+    def wait(self):
+        """Blocks until the caller is allowed to go ahead."""
+        with self._lock:
+            now = time.monotonic()
+            start_time = max(now, self._next_time)
+            self._next_time = start_time + self.interval
+
+        if start_time > now:
+            time.sleep(start_time - now)
+
+
+def request_required(forecast: Forecast) -> bool:
+    """Returns True if updating the forecast will make a request to the API.
+
+    Mirrors the checks made at the start of `Forecast.update`, loading saved data if it exists.
+    """
+    if not hasattr(forecast, "data"):
+        try:
+            forecast.load()
+        except FileNotFoundError:
+            return True
+
+    # Private method of Forecast, there is no public way to check whether its data has expired
+    return forecast._data_outdated()
+
+
+def create_session(max_connections: int) -> requests.Session:
+    """Returns a session that keeps up to max_connections connections to each host open for reuse.
+
+    `Forecast.update` opens a new connection, and so does a new TLS handshake, for every request.
+    Requests made through the session reuse the connections of earlier ones. Safe to share between
+    threads making requests, as long as they are no more than max_connections.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def fetch_forecast(
+    forecast: Forecast,
+    session: requests.Session,
+    timeout: Tuple[float, float] = REQUEST_TIMEOUT_SECONDS,
+) -> str:
+    """Updates a forecast as `Forecast.update` does but makes the request through session.
+
+    Callers check `request_required` first, the request is always made. It carries an
+    If-Modified-Since header from the Last-Modified time of any saved data.
+
+    This copies the end of `Forecast.update` and uses its private methods, the Pipfile pins
+    metno-locationforecast to the 2.1 releases it was copied from.
+
+    Args:
+        forecast: Forecast to update.
+        session: Session to make the request through, see `create_session`.
+        timeout: Optional; Seconds to wait to connect and then between bytes of the response.
+
+    Returns:
+        The update status, see `Forecast.update`.
+
+    Raises:
+        requests.RequestException: If the request fails, times out or gets an error response.
+    """
+    forecast.response = session.get(
+        forecast.url, params=forecast.url_parameters, headers=forecast.url_headers, timeout=timeout
+    )
+    if forecast.response.status_code == 304:
+        status = "Data-Not-Modified"
+    else:
+        forecast.response.raise_for_status()
+        status = "Data-Modified"
+
+    forecast._json_from_response()
+    forecast.save()
+    forecast._parse_json()
+    return status
+
+
+def update_forecast(
+    forecast: Forecast,
+    rate_limiter: RateLimiter,
+    metrics: Optional[RunMetrics] = None,
+    archive: Optional[ForecastArchive] = None,
+    session: Optional[requests.Session] = None,
+) -> str:
+    """Updates a single forecast, logging the outcome, and returns the update status.
+
+    If metrics is given any request made is recorded in it. If archive is given new forecast data
+    is appended to it. Requests are made through session if it is given, see `create_session`.
+    """
+
+    if not request_required(forecast):
+        return "Data-Not-Expired"
+
+    rate_limiter.wait()
+    start = time.perf_counter()
+    try:
+        status = forecast.update() if session is None else fetch_forecast(forecast, session)
+    except Exception as error:
+        response = getattr(error, "response", None)
+        status_code = response.status_code if response is not None else None
+        if status_code is not None:
+            logger.warning(
+                f"Received {status_code} response for request to update {forecast.place.name} data"
+            )
+        if metrics is not None:
+            metrics.record_fetch(forecast.place.name, time.perf_counter() - start, status_code, 0)
+        raise
+
+    if metrics is not None:
+        metrics.record_fetch(
+            forecast.place.name,
+            time.perf_counter() - start,
+            forecast.response.status_code,
+            len(forecast.response.content),
+        )
+    if status == "Data-Modified":
+        logger.debug(f"Forecast data for {forecast.place.name} updated")
+        if archive is not None:
+            archive.append(forecast)
+
+    return status
+
+
+def update_forecasts(
+    forecasts: List[Forecast],
+    max_concurrent_requests: int,
+    max_requests_per_second: float,
+    metrics: Optional[RunMetrics] = None,
+    archive: Optional[ForecastArchive] = None,
+    session: Optional[requests.Session] = None,
+    return_exceptions: bool = False,
+) -> List[Union[str, Exception]]:
+    """Updates forecasts concurrently and returns their update statuses in the same order.
+
+    At most `max_concurrent_requests` requests are in flight at any one time and no more than
+    `max_requests_per_second` requests are started each second. If metrics is given the requests
+    made are recorded in it, if archive is given new forecast data is appended to it. Requests are
+    made through session if it is given, it should keep at least `max_concurrent_requests`
+    connections open.
+
+    The first forecast to fail to update raises its exception, unless return_exceptions is set in
+    which case every forecast is updated and the exception is returned in place of its status.
+    """
+    if max_concurrent_requests < 1:
+        raise ValueError("max_concurrent_requests must be at least 1")
+
+    rate_limiter = RateLimiter(max_requests_per_second)
+
+    def update(forecast: Forecast) -> Union[str, Exception]:
+        try:
+            return update_forecast(forecast, rate_limiter, metrics, archive, session)
+        except Exception as error:
+            if not return_exceptions:
+                raise
+            return error
+
+    with ThreadPoolExecutor(max_workers=max_concurrent_requests) as executor:
+        return list(executor.map(update, forecasts))
@@ -0,0 +1,252 @@
+"""A single SQLite database of saved forecast data, in place of one JSON file per forecast."""
+
+import concurrent.futures
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from metno_locationforecast import Forecast, Place
+from metno_locationforecast.data_containers import Data
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of parameters in a query, older versions to 999
+MAX_QUERY_PARAMETERS = 500
+
+# Names of the JSON files forecasts were saved to by earlier versions
+LEGACY_FILE_PATTERN = "lat*lon*altitude*_*.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    key TEXT PRIMARY KEY,
+    last_modified TEXT NOT NULL,
+    expires TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    data BLOB NOT NULL
+)
+"""
+
+
+class CacheEntry(NamedTuple):
+    """Saved data for a forecast.
+
+    Attributes:
+        last_modified: Last-Modified header of the response the data came from.
+        expires: Expires header of the latest response for the data.
+        updated_at: Time the forecast was made, from the data.
+        data: Forecast data as zlib compressed JSON.
+    """
+
+    last_modified: str
+    expires: str
+    updated_at: str
+    data: bytes
+
+
+class ForecastCache:
+    """Saved forecast data for many forecasts in a single SQLite database.
+
+    Each forecast is stored as one row, keyed by the name of the file it would otherwise be saved
+    to, with its data compressed. Every save is its own transaction so an interrupted run never
+    leaves partly written data. Safe to share between threads.
+
+    Attributes:
+        file_path: Location of the database.
+    """
+
+    def __init__(self, file_path: str):
+        """Create a ForecastCache object, creating the database if it does not exist.
+
+        Args:
+            file_path: Location of the database.
+        """
+        self.file_path = pathlib.Path(file_path)
+        if not self.file_path.parent.is_dir():
+            self.file_path.parent.mkdir(parents=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.file_path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(SCHEMA)
+
+    def __repr__(self) -> str:
+        return f"ForecastCache({self.file_path})"
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM forecasts").fetchone()[0]
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_modified, expires, updated_at, data FROM forecasts WHERE key = ?",
+                (key,),
+            ).fetchone()
+        return CacheEntry(*row) if row is not None else None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, CacheEntry]:
+        """Returns the entries for all of the keys that are in the cache, indexed by key."""
+        keys = list(keys)
+        entries: Dict[str, CacheEntry] = {}
+        with self._lock:
+            for start in range(0, len(keys), MAX_QUERY_PARAMETERS):
+                end = start + MAX_QUERY_PARAMETERS
+                chunk = keys[start:end]
+                rows = self._connection.execute(
+                    "SELECT key, last_modified, expires, updated_at, data FROM forecasts "
+                    f"WHERE key IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for key, *entry in rows:
+                    entries[key] = CacheEntry(*entry)
+        return entries
+
+    def put(self, key: str, entry: CacheEntry):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?)", (key, *entry)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class CachedForecast(Forecast):
+    """A forecast that saves its data to a ForecastCache rather than to its own file.
+
+    Only the data and the Last-Modified and Expires headers are kept, other headers and
+    `json_string` are not restored on load.
+
+    Attributes:
+        cache: Cache the forecast data is saved to.
+    """
+
+    def __init__(self, place: Place, cache: ForecastCache, **kwargs):
+        """Create a CachedForecast object.
+
+        Args:
+            place: Place object for the forecast.
+            cache: Cache to save forecast data to.
+            **kwargs: Passed on to `Forecast`.
+        """
+        super().__init__(place, **kwargs)
+        self.cache = cache
+
+    def save(self) -> None:
+        """Save data to the cache."""
+        data = self.json["data"]
+        entry = CacheEntry(
+            self.json["headers"]["Last-Modified"],
+            self.json["headers"]["Expires"],
+            data["properties"]["meta"]["updated_at"],
+            zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf8")),
+        )
+        self.cache.put(self.file_name, entry)
+
+    def load(self) -> None:
+        """Load data from the cache.
+
+        Raises:
+            FileNotFoundError: If there is no saved data, as for a forecast saved to file.
+        """
+        entry = self.cache.get(self.file_name)
+        if entry is None:
+            raise FileNotFoundError(f"No saved data for {self.file_name} in {self.cache}")
+        self.load_entry(entry)
+
+    def load_entry(self, entry: CacheEntry):
+        self.json, self.data = parse_entry(entry)
+
+    def update(self) -> str:
+        """Update forecast data, see `Forecast.update`."""
+        if not hasattr(self, "data"):
+            try:
+                self.load()
+            except FileNotFoundError:
+                pass
+
+        return super().update()
+
+
+def remove_legacy_files(save_location: str) -> int:
+    """Deletes forecast data saved to JSON files by earlier versions from save_location.
+
+    Forecasts are now requested per grid cell, with coordinates that seldom match those of the
+    places the files were saved for, so the files are never read again.
+
+    Returns:
+        The number of files deleted.
+    """
+    path = pathlib.Path(save_location)
+    if not path.is_dir():
+        return 0
+
+    file_paths = list(path.glob(LEGACY_FILE_PATTERN))
+    for file_path in file_paths:
+        file_path.unlink()
+    if file_paths:
+        logger.info(f"Removed {len(file_paths)} forecast data files from {path}")
+    return len(file_paths)
+
+
+def parse_entry(entry: CacheEntry) -> Tuple[Dict[str, Any], Data]:
+    """Returns the JSON and the weather data of a cache entry, as loading a forecast sets them."""
+    # Parsing only uses the json attribute so there is no need to set up a whole forecast
+    forecast = Forecast.__new__(Forecast)
+    forecast.json = {
+        "status_code": 200,
+        "headers": {"Last-Modified": entry.last_modified, "Expires": entry.expires},
+        "data": json.loads(zlib.decompress(entry.data)),
+    }
+    forecast._parse_json()
+    return forecast.json, forecast.data
+
+
+def load_forecasts(
+    forecasts: List[Forecast], cache: ForecastCache, workers: int = 1, processes: bool = False
+):
+    """Loads saved data for all of the forecasts, reading the cache in bulk.
+
+    Entries are decompressed and parsed across `workers` threads, or processes if `processes` is
+    True. Parsing is CPU bound so threads only help to the extent that decompression runs outside
+    of the GIL, processes have to send the parsed data back which takes a good share of the time
+    saved. Forecasts that are not CachedForecasts, or that have no data in the cache, are loaded on
+    their own in the calling thread.
+
+    Raises:
+        FileNotFoundError: If there is no saved data for one of the forecasts.
+        ValueError: If workers is less than 1.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    entries = cache.get_many(forecast.file_name for forecast in forecasts)
+    cached: List[CachedForecast] = []
+    for forecast in forecasts:
+        if isinstance(forecast, CachedForecast) and forecast.file_name in entries:
+            cached.append(forecast)
+        else:
+            forecast.load()
+
+    cached_entries = [entries[forecast.file_name] for forecast in cached]
+    if workers == 1 or len(cached) < 2:
+        results = [parse_entry(entry) for entry in cached_entries]
+    else:
+        executor: concurrent.futures.Executor
+        if processes:
+            executor = concurrent.futures.ProcessPoolExecutor(workers)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(workers)
+        with executor:
+            # Larger chunks cut down on the number of round trips to worker processes
+            chunksize = max(1, len(cached) // (workers * 4)) if processes else 1
+            results = list(executor.map(parse_entry, cached_entries, chunksize=chunksize))
+
+    for forecast, (forecast_json, data) in zip(cached, results):
+        forecast.json = forecast_json
+        forecast.data = data
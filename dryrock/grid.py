@@ -0,0 +1,111 @@
+"""Groups places that fall in the same forecast grid cell so they can share a single request."""
+
+from typing import Dict, List, Set, Tuple
+
+from metno_locationforecast import Forecast, Place
+
+from .forecast_cache import CachedForecast
+
+
+class GridCell:
+    """Holds the forecasts for all places in a grid cell.
+
+    Attributes:
+        forecast: Forecast for the snapped coordinates of the cell, this is the one to update.
+        place_forecasts: Forecasts for each of the places in the cell.
+        area_indices: Indices of the areas the places in the cell belong to.
+    """
+
+    def __init__(self, forecast: Forecast, place_forecasts: List[Forecast], area_indices: Set[int]):
+        """Create a GridCell object.
+
+        Args:
+            forecast: Forecast for the snapped coordinates of the cell.
+            place_forecasts: Forecasts for each of the places in the cell.
+            area_indices: Indices of the areas the places in the cell belong to.
+        """
+        self.forecast = forecast
+        self.place_forecasts = place_forecasts
+        self.area_indices = area_indices
+
+    def __repr__(self) -> str:
+        return f"GridCell({repr(self.forecast.place)}, {len(self.place_forecasts)} places)"
+
+    def share_data(self):
+        """Copies the data of the cell forecast to the forecast of every place in the cell."""
+        for place_forecast in self.place_forecasts:
+            for attribute in ("data", "response", "json", "json_string"):
+                if hasattr(self.forecast, attribute):
+                    setattr(place_forecast, attribute, getattr(self.forecast, attribute))
+
+
+def snap(value: float, resolution: float) -> float:
+    """Returns the value rounded to the nearest multiple of resolution."""
+    # Rounding again removes floating point noise, the API only accepts 4 decimal places.
+    return round(round(value / resolution) * resolution, 4)
+
+
+def get_cell_key(
+    place: Place, resolution_degrees: float, resolution_metres: int
+) -> Tuple[float, float, int | None]:
+    """Returns the snapped (latitude, longitude, altitude) of the grid cell containing place."""
+    latitude = place.coordinates["latitude"]
+    longitude = place.coordinates["longitude"]
+    altitude = place.coordinates["altitude"]
+    if latitude is None or longitude is None:
+        raise ValueError(f"{place} is missing coordinates")
+
+    return (
+        snap(latitude, resolution_degrees),
+        snap(longitude, resolution_degrees),
+        int(snap(altitude, resolution_metres)) if altitude is not None else None,
+    )
+
+
+def group_into_cells(
+    area_forecasts: List[List[Forecast]], resolution_degrees: float, resolution_metres: int
+) -> List[GridCell]:
+    """Groups place forecasts by grid cell, returning one cell for each unique set of coordinates.
+
+    Coordinates are snapped to `resolution_degrees` and altitudes to `resolution_metres`. Cells are
+    returned in the order their first place appears. Cell forecasts save their data to the same
+    cache as the place forecasts if those are cached.
+    """
+    if resolution_degrees <= 0 or resolution_metres <= 0:
+        raise ValueError("Grid resolutions must be greater than zero")
+
+    members: Dict[Tuple[float, float, int | None], List[Forecast]] = {}
+    area_indices: Dict[Tuple[float, float, int | None], Set[int]] = {}
+    for area_index, place_forecasts in enumerate(area_forecasts):
+        for place_forecast in place_forecasts:
+            key = get_cell_key(place_forecast.place, resolution_degrees, resolution_metres)
+            members.setdefault(key, []).append(place_forecast)
+            area_indices.setdefault(key, set()).add(area_index)
+
+    cells: List[GridCell] = []
+    for key, place_forecasts in members.items():
+        latitude, longitude, altitude = key
+        name = " / ".join(place_forecast.place.name for place_forecast in place_forecasts)
+        first = place_forecasts[0]
+        cell_place = Place(name, latitude, longitude, altitude)
+        options = {
+            "user_agent": first.user_agent,
+            "forecast_type": first.forecast_type,
+            "save_location": str(first.save_location),
+            "base_url": first.base_url,
+        }
+        cell_forecast = (
+            CachedForecast(cell_place, first.cache, **options)
+            if isinstance(first, CachedForecast)
+            else Forecast(cell_place, **options)
+        )
+        cells.append(GridCell(cell_forecast, place_forecasts, area_indices[key]))
+
+    return cells
+
+
+def get_dedup_ratio(cells: List[GridCell]) -> float:
+    """Returns the number of places per grid cell, i.e. how many requests each request replaces."""
+    if not cells:
+        return 1.0
+    return sum(len(cell.place_forecasts) for cell in cells) / len(cells)
@@ -0,0 +1,222 @@
+"""Timings and counts for a run, written out as a JSON report and optionally for Prometheus."""
+
+import contextlib
+import datetime as dt
+import json
+import logging
+import pathlib
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+from .profiling import Profiler
+
+logger = logging.getLogger(__name__)
+
+
+class RunMetrics:
+    """Collects metrics over a run. Recording fetches is safe from multiple threads.
+
+    Attributes:
+        started_at: When the run started.
+        phases: Wall clock and CPU time in seconds of each phase, indexed by phase name. CPU time
+            is for the whole process, including any threads running during the phase.
+        fetch_seconds: Time taken to request, parse and save each forecast that made a request,
+            indexed by place name.
+        response_counts: Number of responses indexed by status code, failed requests are counted
+            as "error".
+        bytes_downloaded: Total size of the response bodies received.
+        pages_rendered: Number of pages rendered.
+        pages_skipped: Number of pages skipped because their inputs had not changed.
+        bytes_written: Total size of the pages and data files written.
+        bytes_rendered: Total size of the pages and data files as rendered, before minifying.
+        bytes_gzip: Total size of the gzip copies written, 0 if they are not written.
+        bytes_brotli: Total size of the brotli copies written, 0 if they are not written.
+        files_written: Number of output files written.
+        files_skipped: Number of output files not written because their content had not changed.
+        profilers: Profilers run over each phase.
+    """
+
+    def __init__(self, profilers: Sequence[Profiler] = ()):
+        """Create a RunMetrics object.
+
+        Args:
+            profilers: Profilers to run over each phase, phases must then not overlap.
+        """
+        self.started_at = dt.datetime.now(dt.timezone.utc)
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.fetch_seconds: Dict[str, float] = {}
+        self.response_counts: Dict[str, int] = {}
+        self.bytes_downloaded = 0
+        self.pages_rendered = 0
+        self.pages_skipped = 0
+        self.bytes_written = 0
+        self.bytes_rendered = 0
+        self.bytes_gzip = 0
+        self.bytes_brotli = 0
+        self.files_written = 0
+        self.files_skipped = 0
+        self.profilers = profilers
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"RunMetrics({self.started_at}, {list(self.phases)})"
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times the code run inside the context as the phase with the given name."""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with contextlib.ExitStack() as stack:
+                for profiler in self.profilers:
+                    stack.enter_context(profiler.profile(name))
+                yield
+        finally:
+            self.phases[name] = {
+                "wall_seconds": round(time.perf_counter() - wall_start, 4),
+                "cpu_seconds": round(time.process_time() - cpu_start, 4),
+            }
+
+    def record_fetch(
+        self, place_name: str, seconds: float, status_code: Optional[int], bytes_downloaded: int
+    ):
+        """Records a request for forecast data, status_code is None if no response was received."""
+        status = "error" if status_code is None else str(status_code)
+        with self._lock:
+            self.fetch_seconds[place_name] = round(seconds, 4)
+            self.response_counts[status] = self.response_counts.get(status, 0) + 1
+            self.bytes_downloaded += bytes_downloaded
+
+    def record_pages(
+        self,
+        rendered: int,
+        skipped: int,
+        bytes_written: int,
+        bytes_rendered: int = 0,
+        bytes_gzip: int = 0,
+        bytes_brotli: int = 0,
+    ):
+        with self._lock:
+            self.pages_rendered += rendered
+            self.pages_skipped += skipped
+            self.bytes_written += bytes_written
+            self.bytes_rendered += bytes_rendered
+            self.bytes_gzip += bytes_gzip
+            self.bytes_brotli += bytes_brotli
+
+    def record_files(self, written: int, skipped: int):
+        with self._lock:
+            self.files_written += written
+            self.files_skipped += skipped
+
+    def slowest_fetches(self, number: int = 5) -> List[Dict[str, Any]]:
+        slowest = sorted(self.fetch_seconds.items(), key=lambda item: item[1], reverse=True)
+        return [{"place": place, "seconds": seconds} for place, seconds in slowest[:number]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "phases": self.phases,
+            "fetch": {
+                "requests": sum(self.response_counts.values()),
+                "responses": self.response_counts,
+                "bytes_downloaded": self.bytes_downloaded,
+                "slowest": self.slowest_fetches(),
+                "seconds_by_place": self.fetch_seconds,
+            },
+            "pages": {
+                "rendered": self.pages_rendered,
+                "skipped": self.pages_skipped,
+                "bytes_rendered": self.bytes_rendered,
+                "bytes_written": self.bytes_written,
+                "bytes_gzip": self.bytes_gzip,
+                "bytes_brotli": self.bytes_brotli,
+                "files_written": self.files_written,
+                "files_skipped": self.files_skipped,
+            },
+        }
+
+    def write_report(self, file_path: str):
+        """Writes the metrics to file as JSON."""
+        path = pathlib.Path(file_path)
+        path.write_text(json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf8")
+        logger.debug(f"Wrote run report to {path}")
+
+    def to_prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def add_metric(name: str, help_text: str, samples: Mapping[str, float], label: str = ""):
+            lines.append(f"# HELP dryrock_{name} {help_text}")
+            lines.append(f"# TYPE dryrock_{name} gauge")
+            for label_value, value in samples.items():
+                labels = f'{{{label}="{escape_label_value(label_value)}"}}' if label else ""
+                lines.append(f"dryrock_{name}{labels} {value}")
+
+        add_metric(
+            "run_started_timestamp_seconds",
+            "Time the run started.",
+            {"": self.started_at.timestamp()},
+        )
+        add_metric(
+            "phase_wall_seconds",
+            "Wall clock time of each phase of the run.",
+            {name: phase["wall_seconds"] for name, phase in self.phases.items()},
+            "phase",
+        )
+        add_metric(
+            "phase_cpu_seconds",
+            "CPU time of each phase of the run.",
+            {name: phase["cpu_seconds"] for name, phase in self.phases.items()},
+            "phase",
+        )
+        add_metric(
+            "fetch_seconds",
+            "Time taken to request, parse and save forecast data for each place.",
+            self.fetch_seconds,
+            "place",
+        )
+        add_metric(
+            "fetch_responses", "Number of responses by status.", self.response_counts, "status"
+        )
+        add_metric(
+            "fetch_downloaded_bytes", "Size of response bodies.", {"": self.bytes_downloaded}
+        )
+        add_metric("pages_rendered", "Number of pages rendered.", {"": self.pages_rendered})
+        add_metric(
+            "pages_skipped", "Number of unchanged pages not rendered.", {"": self.pages_skipped}
+        )
+        add_metric("pages_written_bytes", "Size of pages written.", {"": self.bytes_written})
+        add_metric(
+            "pages_output_bytes",
+            "Size of pages and data files at each stage of writing them.",
+            {
+                "rendered": self.bytes_rendered,
+                "written": self.bytes_written,
+                "gzip": self.bytes_gzip,
+                "brotli": self.bytes_brotli,
+            },
+            "stage",
+        )
+        add_metric(
+            "output_files",
+            "Number of output files written and left as they were because they had not changed.",
+            {"written": self.files_written, "skipped": self.files_skipped},
+            "result",
+        )
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, file_path: str):
+        """Writes the metrics to file for the Prometheus node exporter's textfile collector."""
+        path = pathlib.Path(file_path)
+        # Write then rename so the collector never reads a partially written file
+        temp_path = path.with_name(path.name + ".tmp")
+        temp_path.write_text(self.to_prometheus(), encoding="utf8")
+        temp_path.replace(path)
+        logger.debug(f"Wrote Prometheus metrics to {path}")
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,236 @@
+"""Profiling of the phases of a run, for `python -m dryrock --profile` and `--memprofile`."""
+
+import abc
+import cProfile
+import collections
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import sys
+import threading
+import tracemalloc
+from typing import Any, Counter, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+COLLAPSED_STACKS_FILE = "stacks.collapsed"
+MEMORY_REPORT_FILE = "memory.json"
+
+
+class Profiler(abc.ABC):
+    """Base class for profilers of the phases of a run.
+
+    Call `start` before the first phase and `stop` after the last, `profile` wraps each phase.
+    """
+
+    @abc.abstractmethod
+    def start(self):
+        pass
+
+    @abc.abstractmethod
+    def stop(self):
+        pass
+
+    @abc.abstractmethod
+    def profile(self, name: str) -> contextlib.AbstractContextManager:
+        pass
+
+
+class StackSampler:
+    """Samples the call stacks of all threads at a regular interval while running.
+
+    Samples are counted by phase and stack in the collapsed format read by flamegraph tools, one
+    line per distinct stack with frames separated by semicolons followed by the number of samples.
+    cProfile only sees the thread that enabled it, sampling also covers work done in thread pools.
+
+    Attributes:
+        interval: Seconds between samples.
+        counts: Number of samples of each collapsed stack, prefixed with the phase name.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """Create a StackSampler object.
+
+        Args:
+            interval: Seconds between samples.
+        """
+        self.interval = interval
+        self.counts: Counter[str] = collections.Counter()
+        self.phase: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            phase = self.phase
+            if phase is None:
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.counts[f"{phase};{collapse_stack(frame)}"] += 1
+
+    def write(self, file_path: pathlib.Path):
+        lines = [f"{stack} {count}" for stack, count in sorted(self.counts.items())]
+        file_path.write_text("\n".join(lines) + "\n", encoding="utf8")
+
+
+def collapse_stack(frame) -> str:
+    """Returns the stack ending at frame, outermost call first, with frames separated by ';'."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ":"))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class PhaseProfiler(Profiler):
+    """Profiles each phase of a run with cProfile and samples stacks throughout.
+
+    Writes a pstats file for each phase, named after it, and a collapsed stacks file covering all
+    phases to the output folder. Phases must not overlap.
+
+    Attributes:
+        output_path: Folder the profiles are written to.
+        sampler: Samples the stacks of all threads.
+    """
+
+    def __init__(self, output_path: str, sample_interval: float = 0.005):
+        """Create a PhaseProfiler object.
+
+        Args:
+            output_path: Folder the profiles are written to.
+            sample_interval: Seconds between stack samples.
+        """
+        self.output_path = pathlib.Path(output_path)
+        self.sampler = StackSampler(sample_interval)
+
+    def __repr__(self) -> str:
+        return f"PhaseProfiler({self.output_path})"
+
+    def start(self):
+        if not self.output_path.is_dir():
+            self.output_path.mkdir(parents=True)
+        self.sampler.start()
+
+    def stop(self):
+        """Stops sampling and writes the collapsed stacks file."""
+        self.sampler.stop()
+        stacks_path = self.output_path.joinpath(COLLAPSED_STACKS_FILE)
+        self.sampler.write(stacks_path)
+        logger.info(f"Wrote profiles to {self.output_path}")
+
+    @contextlib.contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Profiles the code run inside the context as the phase with the given name."""
+        profile = cProfile.Profile()
+        self.sampler.phase = name
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.sampler.phase = None
+            profile.dump_stats(self.output_path.joinpath(f"{name}.pstats"))
+
+
+class MemoryProfiler(Profiler):
+    """Traces memory allocations, taking a snapshot at the end of each phase.
+
+    Records the memory allocated at the end of each phase, the peak during it and the allocation
+    sites holding the most memory and that grew the most over the phase. These are logged and
+    written to a JSON report in the output folder, with the snapshots themselves for comparing in
+    detail. Allocations made in other processes are not traced.
+
+    Attributes:
+        output_path: Folder the report and snapshots are written to.
+        top: Number of allocation sites to report for each phase.
+        phases: Memory use of each phase indexed by phase name.
+    """
+
+    def __init__(self, output_path: str, top: int = 10):
+        """Create a MemoryProfiler object.
+
+        Args:
+            output_path: Folder the report and snapshots are written to.
+            top: Number of allocation sites to report for each phase.
+        """
+        self.output_path = pathlib.Path(output_path)
+        self.top = top
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self._previous_snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def __repr__(self) -> str:
+        return f"MemoryProfiler({self.output_path})"
+
+    def start(self):
+        if not self.output_path.is_dir():
+            self.output_path.mkdir(parents=True)
+        tracemalloc.start()
+        self._previous_snapshot = self._take_snapshot()
+
+    def stop(self):
+        """Stops tracing and writes the report."""
+        tracemalloc.stop()
+        report = {
+            "peak_bytes": max((phase["peak_bytes"] for phase in self.phases.values()), default=0),
+            "phases": self.phases,
+        }
+        report_path = self.output_path.joinpath(MEMORY_REPORT_FILE)
+        report_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf8")
+        logger.info(f"Wrote memory profile to {report_path}, peak {report['peak_bytes']} bytes")
+
+    @contextlib.contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Traces the memory use of the code run inside the context as the phase with given name."""
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = self._take_snapshot()
+            snapshot.dump(str(self.output_path.joinpath(f"{name}.tracemalloc")))
+
+            largest = snapshot.statistics("lineno")[: self.top]
+            growth = []
+            if self._previous_snapshot is not None:
+                growth = snapshot.compare_to(self._previous_snapshot, "lineno")[: self.top]
+            self._previous_snapshot = snapshot
+
+            self.phases[name] = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "largest": [
+                    {"site": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                    for stat in largest
+                ],
+                "growth": [
+                    {"site": str(stat.traceback), "bytes": stat.size_diff, "count": stat.count_diff}
+                    for stat in growth
+                ],
+            }
+            logger.info(
+                f"Memory after {name}: {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB, "
+                f"largest site {largest[0].traceback if largest else None}"
+            )
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        # Leave out memory used by tracemalloc itself and by importing modules
+        return tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ]
+        )
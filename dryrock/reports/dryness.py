@@ -0,0 +1,208 @@
+"""Rock dryness, estimated from a rolling model of how much water is on the rock.
+
+Rain wets the rock up to the most it can hold, after that it runs off. While it is not raining the
+rock dries at a rate that rises as the air gets drier and the wind stronger and falls under cloud.
+Dryness is shown as a score from 0 (soaking) to 100 (dry).
+"""
+
+import datetime as dt
+import json
+import logging
+import pathlib
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .forecast_store import ForecastStore
+
+logger = logging.getLogger(__name__)
+
+# Model parameters
+WETNESS_MAX = 2.0  # millimetres of water the rock holds, any more runs off
+DRYING_RATE = 0.5  # millimetres per hour in perfectly dry, still air
+WIND_DRYING = 0.15  # increase in drying rate per metre/second of wind, as a fraction
+CLOUD_SHADING = 0.5  # decrease in drying rate under full cloud cover, as a fraction
+
+
+class WetnessState(NamedTuple):
+    """Wetness of the rock at a place, in millimetres, as of a time in seconds since the epoch."""
+
+    wetness: float
+    as_of: int
+
+
+def get_drying_rates(
+    humidity: np.ndarray, wind_speed: np.ndarray, cloud_cover: np.ndarray
+) -> np.ndarray:
+    """Returns the millimetres of water that dry off the rock per hour, for arrays of any shape.
+
+    Humidity and cloud cover are in %, wind speed in m/s. Where a value is missing there is no
+    drying.
+    """
+    rates = (
+        DRYING_RATE
+        * (1 - humidity / 100)
+        * (1 + WIND_DRYING * wind_speed)
+        * (1 - CLOUD_SHADING * cloud_cover / 100)
+    )
+    return np.nan_to_num(np.clip(rates, 0, None))
+
+
+def get_wetness(
+    initial: np.ndarray,
+    rain: np.ndarray,
+    drying_rates: np.ndarray,
+    hours: np.ndarray,
+    start_indices: np.ndarray,
+) -> np.ndarray:
+    """Returns the wetness of each place after each interval, for places with the same intervals.
+
+    Steps through the intervals once, updating every place at each step.
+
+    Args:
+        initial: Wetness of each place before its first interval, shape (places,).
+        rain: Rain in millimetres in each interval, shape (places, intervals). Missing values count
+            as no rain.
+        drying_rates: Drying rate in millimetres per hour in each interval, same shape as rain.
+        hours: Length of each interval in hours, shape (intervals,).
+        start_indices: Index of the first interval of each place, shape (places,). Earlier
+            intervals have already been accounted for in initial.
+
+    Returns:
+        Wetness in millimetres, shape (places, intervals), NaN before the first interval of a place.
+    """
+    rain = np.nan_to_num(rain)
+    # No drying while it rains
+    drying = np.where(rain > 0, 0, drying_rates * hours)
+
+    wetness = initial.astype(float)
+    result = np.full(rain.shape, np.nan)
+    first = int(start_indices.min()) if len(start_indices) else 0
+    for i in range(first, rain.shape[1]):
+        active = start_indices <= i
+        stepped = np.clip(np.minimum(wetness + rain[:, i], WETNESS_MAX) - drying[:, i], 0, None)
+        wetness = np.where(active, stepped, wetness)
+        result[:, i] = np.where(active, wetness, np.nan)
+
+    return result
+
+
+def get_dryness_scores(wetness: np.ndarray) -> np.ndarray:
+    """Returns dryness scores from 0 to 100 for wetness in millimetres, NaN stays NaN."""
+    return np.round(100 * (1 - wetness / WETNESS_MAX))
+
+
+class DrynessModel:
+    """Rolling wetness of the rock at each place, carried over from one update to the next.
+
+    The state of a place is its wetness at the end of the last interval that had started at the
+    time of an update. Each update continues from there, so only intervals that are new since the
+    last update are applied: those that have started are added to the state, later ones are
+    projected from it without changing it. Projecting the same forecast from an advanced state gives
+    the same wetness as before, so pages only need rendering again when their forecast changes.
+
+    Attributes:
+        file_path: Path of the JSON file the states are saved to, states are not kept if None.
+        states: Wetness state of each place indexed by key.
+    """
+
+    def __init__(self, file_path: Optional[str] = None):
+        """Create a DrynessModel object.
+
+        Args:
+            file_path: Optional; Path of the JSON file the states are saved to.
+        """
+        self.file_path = pathlib.Path(file_path) if file_path is not None else None
+        self.states: Dict[str, WetnessState] = {}
+
+    def __repr__(self) -> str:
+        return f"DrynessModel({self.file_path}, {len(self.states)} places)"
+
+    def load(self) -> None:
+        """Loads the states from file, starting with none if there is no valid file."""
+        if self.file_path is None or not self.file_path.is_file():
+            return
+
+        try:
+            states = json.loads(self.file_path.read_text(encoding="utf8"))
+            self.states = {key: WetnessState(*state) for key, state in states.items()}
+        except (json.JSONDecodeError, AttributeError, TypeError):
+            logger.warning(f"Ignoring invalid wetness states {self.file_path}")
+
+    def save(self) -> None:
+        if self.file_path is None:
+            return
+        if not self.file_path.parent.is_dir():
+            self.file_path.parent.mkdir(parents=True)
+        states = {key: list(state) for key, state in self.states.items()}
+        self.file_path.write_text(json.dumps(states, indent=2, sort_keys=True) + "\n")
+
+    def update(
+        self, keys: List[str], stores: List[ForecastStore], now: dt.datetime
+    ) -> List[np.ndarray]:
+        """Advances the states of the places to now and returns their dryness scores.
+
+        Places with the same intervals, normally all of those from one forecast model run, are
+        updated together. Places without a state start out dry at their first interval. States from
+        before the first interval, for example after runs were paused, are dried over the gap at
+        the rate of the first interval as there is no weather for it.
+
+        Args:
+            keys: Key of each place, places with the same coordinates should share a key.
+            stores: Forecast data of each place.
+            now: Time of the update.
+
+        Returns:
+            Dryness score after each interval of each place's store, NaN for intervals before its
+            state.
+        """
+        if len(keys) != len(stores):
+            raise ValueError("Number of keys must match the number of stores")
+
+        # States are read before any are advanced so places sharing a key get the same scores
+        states = dict(self.states)
+        scores: List[np.ndarray] = [np.empty(0)] * len(stores)
+
+        groups: Dict[bytes, List[int]] = {}
+        for i, store in enumerate(stores):
+            groups.setdefault(store.start_times.tobytes(), []).append(i)
+
+        now_seconds = now.timestamp()
+        for indices in groups.values():
+            first = stores[indices[0]]
+            start_times, end_times = first.start_times, first.end_times
+            initial = np.zeros(len(indices))
+            start_indices = np.zeros(len(indices), dtype=np.int64)
+            gap_hours = np.zeros(len(indices))
+            for j, i in enumerate(indices):
+                state = states.get(keys[i])
+                if state is not None:
+                    initial[j] = state.wetness
+                    start_indices[j] = np.searchsorted(start_times, state.as_of, side="left")
+                    gap_hours[j] = max(start_times[0] - state.as_of, 0) / 3600
+
+            def stack(name: str) -> np.ndarray:
+                return np.stack([stores[i].values[name] for i in indices])
+
+            drying_rates = get_drying_rates(
+                stack("relative_humidity"), stack("wind_speed"), stack("cloud_area_fraction")
+            )
+            initial = np.maximum(initial - drying_rates[:, 0] * gap_hours, 0)
+            wetness = get_wetness(
+                initial,
+                stack("precipitation_amount"),
+                drying_rates,
+                (end_times - start_times) / 3600,
+                start_indices,
+            )
+
+            # Intervals that have started are added to the states
+            started = int(np.searchsorted(start_times, now_seconds, side="right"))
+            for j, i in enumerate(indices):
+                scores[i] = get_dryness_scores(wetness[j])
+                if started > start_indices[j]:
+                    self.states[keys[i]] = WetnessState(
+                        wetness[j, started - 1].item(), int(end_times[started - 1])
+                    )
+
+        return scores
@@ -0,0 +1,145 @@
+"""Columnar storage of forecast data for fast aggregation."""
+
+import datetime as dt
+from typing import Dict, Tuple, Union
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from metno_locationforecast.data_containers import Data, Variable
+
+
+class ForecastStore:
+    """Holds the intervals of a forecast as contiguous arrays, one per field.
+
+    Index i of every array refers to the i-th interval of the forecast data. Aggregates are
+    vectorized equivalents of those in `helper_functions`, they take a slice of intervals, as
+    returned by `index_between` or `index_for`, rather than a list of `Interval` objects.
+
+    Rain totals for arbitrary time windows come from `rain_between`, which uses prefix sums so
+    each query is a pair of binary searches whatever the size of the window.
+
+    Attributes:
+        start_times: Interval start times in seconds since the epoch.
+        end_times: Interval end times in seconds since the epoch.
+        values: Values for each variable indexed by variable name, NaN where an interval is missing
+            the variable.
+        units: Units of each variable indexed by variable name.
+        cumulative_rain: Total precipitation of all intervals before index i, one longer than the
+            other arrays.
+        cumulative_missing_rain: Number of intervals before index i without precipitation.
+    """
+
+    def __init__(self, data: Data):
+        """Create a ForecastStore object.
+
+        Args:
+            data: Forecast data with its intervals in chronological order.
+        """
+        intervals = data.intervals
+        self.start_times = np.array(
+            [interval.start_time.timestamp() for interval in intervals], dtype=np.int64
+        )
+        self.end_times = np.array(
+            [interval.end_time.timestamp() for interval in intervals], dtype=np.int64
+        )
+        self.units: Dict[str, str] = dict(data.units)
+
+        self.values: Dict[str, np.ndarray] = {}
+        for name in self.units:
+            values = np.full(len(intervals), np.nan)
+            for i, interval in enumerate(intervals):
+                variable = interval.variables.get(name)
+                if variable is not None:
+                    values[i] = variable.value
+            self.values[name] = values
+
+        rain = self.values.get("precipitation_amount", np.full(len(intervals), np.nan))
+        missing_rain = np.isnan(rain)
+        self.cumulative_rain = np.concatenate(([0.0], np.cumsum(np.where(missing_rain, 0, rain))))
+        self.cumulative_missing_rain = np.concatenate(([0], np.cumsum(missing_rain)))
+
+    def __len__(self) -> int:
+        return len(self.start_times)
+
+    def __repr__(self) -> str:
+        return f"ForecastStore({len(self)} intervals, {list(self.units)})"
+
+    def index_between(self, start: dt.datetime, end: dt.datetime) -> slice:
+        """Returns the slice of intervals starting between start (inclusive) and end (exclusive).
+
+        Equivalent to `Data.intervals_between`, use datetimes with timezone info for localised
+        results.
+        """
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=dt.timezone.utc)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=dt.timezone.utc)
+
+        start_index, end_index = np.searchsorted(
+            self.start_times, [start.timestamp(), end.timestamp()], side="left"
+        )
+        return slice(int(start_index), int(end_index))
+
+    def index_for(
+        self, day: dt.date, tzinfo: Union[dt.timezone, ZoneInfo] = dt.timezone.utc
+    ) -> slice:
+        """Returns the slice of intervals for specified day, equivalent to `Data.intervals_for`."""
+        start = dt.datetime(day.year, day.month, day.day, tzinfo=tzinfo)
+        return self.index_between(start, start + dt.timedelta(days=1))
+
+    def rain_between(self, start: dt.datetime, end: dt.datetime) -> Variable | None:
+        """Returns total rain for intervals starting between start (inclusive) and end (exclusive).
+
+        Returns None if there are no intervals in the window or if any of them are missing a
+        precipitation value.
+        """
+        index = self.index_between(start, end)
+        if index.stop <= index.start:
+            return None
+        if self.cumulative_missing_rain[index.stop] != self.cumulative_missing_rain[index.start]:
+            return None
+
+        total = self.cumulative_rain[index.stop] - self.cumulative_rain[index.start]
+        # Differences of prefix sums carry rounding errors from every earlier interval, values are
+        # given to one decimal place so rounding to ten removes them without losing anything.
+        return Variable(
+            "precipitation_amount", round(total.item(), 10), self.units["precipitation_amount"]
+        )
+
+    def variable(self, name: str, i: int) -> Variable:
+        """Returns the variable for the i-th interval."""
+        return Variable(name, self.values[name][i].item(), self.units[name])
+
+    def _values_for(self, name: str, index: slice) -> np.ndarray:
+        values = self.values[name][index]
+        if len(values) == 0:
+            raise ValueError("Intervals cannot be empty.")
+        return values
+
+    def sum_rain(self, index: slice) -> Variable:
+        values = self._values_for("precipitation_amount", index)
+        # A cumulative sum adds values in order, giving exactly the same result as adding up the
+        # variables one by one.
+        total = np.cumsum(values)[-1]
+        return Variable("precipitation_amount", total.item(), self.units["precipitation_amount"])
+
+    def max_temp_of(self, index: slice) -> Variable:
+        values = self._values_for("air_temperature", index)
+        return self.variable("air_temperature", index.start + int(np.argmax(values)))
+
+    def min_temp_of(self, index: slice) -> Variable:
+        values = self._values_for("air_temperature", index)
+        return self.variable("air_temperature", index.start + int(np.argmin(values)))
+
+    def max_wind_speed_of(self, index: slice) -> Tuple[Variable, Variable]:
+        values = self._values_for("wind_speed", index)
+        i = index.start + int(np.argmax(values))
+        return self.variable("wind_speed", i), self.variable("wind_from_direction", i)
+
+    def max_humid_of(self, index: slice) -> Variable:
+        values = self._values_for("relative_humidity", index)
+        return self.variable("relative_humidity", index.start + int(np.argmax(values)))
+
+    def min_humid_of(self, index: slice) -> Variable:
+        values = self._values_for("relative_humidity", index)
+        return self.variable("relative_humidity", index.start + int(np.argmin(values)))
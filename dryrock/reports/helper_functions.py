@@ -1,22 +1,108 @@
-import copy
 import datetime as dt
 from enum import Enum
-from typing import List, Tuple
+from typing import Any, Dict, List, NamedTuple, Tuple
 
+import numpy as np
 from metno_locationforecast.data_containers import Interval, Variable
 
+# Colour variant thresholds
+PRECIPITATION_OKAY_PER_HOUR = 0.5  # millimetres
+PRECIPITATION_BAD_PER_HOUR = 2.0  # millimetres
+TEMP_GOOD_MIN = 10  # celsius
+TEMP_GOOD_MAX = 20  # celsius
+TEMP_OKAY_MIN = 5  # celsius
+TEMP_OKAY_MAX = 25  # celsius
+WIND_SPEED_OKAY = 5.56  # metres/second (20 km/h)
+WIND_SPEED_BAD = 13.89  # metres/second (50 km/h)
+HUMID_OKAY = 70  # %
+HUMID_BAD = 85  # %
+DRYNESS_GOOD = 90  # score out of 100
+DRYNESS_OKAY = 50  # score out of 100
+
 
 class UnitSystem(Enum):
     METRIC = 0
     IMPERIAL = 1
 
 
+class DisplayValue(NamedTuple):
+    """An immutable variable value in the units it is displayed in."""
+
+    name: str
+    value: float
+    units: str
+
+
+class UnitConversion(NamedTuple):
+    """Converts a value as `value * scale + offset`, rounded to two decimal places."""
+
+    from_units: str
+    to_units: str
+    scale: float
+    offset: float
+
+
+# Conversions by variable name and unit system, variables not listed are displayed as they are
+UNIT_CONVERSIONS: Dict[Tuple[str, UnitSystem], UnitConversion] = {
+    ("precipitation_amount", UnitSystem.METRIC): UnitConversion("mm", "mm", 1, 0),
+    ("precipitation_amount", UnitSystem.IMPERIAL): UnitConversion("mm", "inches", 1 / 25.4, 0),
+    ("air_temperature", UnitSystem.METRIC): UnitConversion("celsius", "celsius", 1, 0),
+    ("air_temperature", UnitSystem.IMPERIAL): UnitConversion("celsius", "fahrenheit", 9 / 5, 32),
+    ("wind_speed", UnitSystem.METRIC): UnitConversion("m/s", "km/h", 3.6, 0),
+    ("wind_speed", UnitSystem.IMPERIAL): UnitConversion("m/s", "mph", 2.236936, 0),
+}
+
+
 class ColourVariant(Enum):
     GOOD = "success"
     OKAY = "warning"
     BAD = "danger"
 
 
+class DayPart:
+    """A part of the day to total rain over, in local time.
+
+    Attributes:
+        name: Name of the part of the day.
+        start_hour: Hour the part starts at.
+        end_hour: Hour the part ends at (exclusive), 24 for midnight.
+    """
+
+    def __init__(self, name: str, start_hour: int, end_hour: int):
+        """Create a DayPart object.
+
+        Args:
+            name: Name of the part of the day.
+            start_hour: Hour the part starts at.
+            end_hour: Hour the part ends at (exclusive), 24 for midnight.
+        """
+        if not 0 <= start_hour < end_hour <= 24:
+            raise ValueError(f"Invalid hours for day part {name}: {start_hour} to {end_hour}")
+
+        self.name = name
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+
+    def __repr__(self) -> str:
+        return f"DayPart({self.name}, {self.start_hour}, {self.end_hour})"
+
+    @property
+    def label(self) -> str:
+        return f"{self.start_hour:02}-{self.end_hour:02}"
+
+    @property
+    def time_delta(self) -> dt.timedelta:
+        return dt.timedelta(hours=self.end_hour - self.start_hour)
+
+    def window_for(self, day: dt.date, tzinfo: dt.tzinfo) -> Tuple[dt.datetime, dt.datetime]:
+        """Returns the start and end datetimes of this part of the given day."""
+        midnight = dt.datetime(day.year, day.month, day.day, tzinfo=tzinfo)
+        return (
+            midnight + dt.timedelta(hours=self.start_hour),
+            midnight + dt.timedelta(hours=self.end_hour),
+        )
+
+
 def cardinal_name_of(direction_variable: Variable) -> str:
     assert direction_variable.name == "wind_from_direction"
     assert direction_variable.units == "degrees"
@@ -110,29 +196,36 @@ def min_humid_of(intervals: List[Interval]) -> Variable:
     return min_humid
 
 
-def change_units(variable: Variable, unit_system: UnitSystem) -> Variable:
-    """Returns a new instance of the variable in the given unit system"""
+def change_units(variable: Variable, unit_system: UnitSystem) -> DisplayValue:
+    """Returns the value of the variable in the given unit system.
 
-    variable = copy.deepcopy(variable)
-    if variable.name == "precipitation_amount":
-        match unit_system:
-            case UnitSystem.METRIC:
-                variable.convert_to("mm")
-            case UnitSystem.IMPERIAL:
-                variable.convert_to("inches")
-    if variable.name == "air_temperature":
-        match unit_system:
-            case UnitSystem.METRIC:
-                variable.convert_to("celsius")
-            case UnitSystem.IMPERIAL:
-                variable.convert_to("fahrenheit")
-    if variable.name == "wind_speed":
-        match unit_system:
-            case UnitSystem.METRIC:
-                variable.convert_to("km/h")
-            case UnitSystem.IMPERIAL:
-                variable.convert_to("mph")
-    return variable
+    Gives the same values as `Variable.convert_to` without copying the variable.
+    """
+    conversion = UNIT_CONVERSIONS.get((variable.name, unit_system))
+    if conversion is None or variable.units == conversion.to_units:
+        return DisplayValue(variable.name, variable.value, variable.units)
+    if variable.units != conversion.from_units:
+        raise ValueError(
+            f"Cannot convert {variable.name} from {variable.units} to {conversion.to_units}"
+        )
+
+    value = round(variable.value * conversion.scale + conversion.offset, 2)
+    return DisplayValue(variable.name, value, conversion.to_units)
+
+
+def convert_units_of(value: Any, unit_system: UnitSystem) -> Any:
+    """Returns a copy of value with every variable in it converted to a display value.
+
+    Dictionaries and lists are copied and their items converted, anything that is not a variable is
+    shared with the original.
+    """
+    if isinstance(value, Variable):
+        return change_units(value, unit_system)
+    if isinstance(value, dict):
+        return {key: convert_units_of(item, unit_system) for key, item in value.items()}
+    if isinstance(value, list):
+        return [convert_units_of(item, unit_system) for item in value]
+    return value
 
 
 def sanitize_name(name: str) -> str:
@@ -176,9 +269,6 @@ def get_time_delta_hours(time_delta: dt.timedelta) -> float:
 
 
 def _get_precipitation_colour_variant(variable: Variable, time_delta: dt.timedelta) -> str:
-    PRECIPITATION_OKAY_PER_HOUR = 0.5  # millimetres
-    PRECIPITATION_BAD_PER_HOUR = 2.0  # millimetres
-
     if variable.name != "precipitation_amount":
         raise ValueError(
             f"Can only be called with 'precipitation_amount' variable, given variable: {variable.name}"  # noqa E501
@@ -202,11 +292,6 @@ def _get_precipitation_colour_variant(variable: Variable, time_delta: dt.timedel
 
 
 def _get_temp_colour_variant(variable: Variable) -> str:
-    TEMP_GOOD_MIN = 10  # celsius
-    TEMP_GOOD_MAX = 20  # celsius
-    TEMP_OKAY_MIN = 5  # celsius
-    TEMP_OKAY_MAX = 25  # celsius
-
     if variable.name != "air_temperature":
         raise ValueError(
             f"Can only be called with 'air_temperature' variable, given variable: {variable.name}"  # noqa E501
@@ -224,9 +309,6 @@ def _get_temp_colour_variant(variable: Variable) -> str:
 
 
 def _get_wind_speed_colour_variant(variable: Variable) -> str:
-    WIND_SPEED_OKAY = 5.56  # metres/second (20 km/h)
-    WIND_SPEED_BAD = 13.89  # metres/second (50 km/h)
-
     if variable.name != "wind_speed":
         raise ValueError(
             f"Can only be called with 'wind_speed' variable, given variable: {variable.name}"  # noqa E501
@@ -246,9 +328,6 @@ def _get_wind_speed_colour_variant(variable: Variable) -> str:
 
 
 def _get_humid_colour_variant(variable: Variable) -> str:
-    HUMID_OKAY = 70  # %
-    HUMID_BAD = 85  # %
-
     if variable.name != "relative_humidity":
         raise ValueError(
             f"Can only be called with 'relative_humidity' variable, given variable: {variable.name}"  # noqa E501
@@ -267,6 +346,25 @@ def _get_humid_colour_variant(variable: Variable) -> str:
     return ColourVariant.GOOD.value
 
 
+def _get_dryness_colour_variant(variable: Variable) -> str:
+    if variable.name != "rock_dryness":
+        raise ValueError(
+            f"Can only be called with 'rock_dryness' variable, given variable: {variable.name}"  # noqa E501
+        )
+    if variable.units != "%":
+        raise ValueError(
+            f"Can only be called with units set to %, given units: {variable.units}"  # noqa E501
+        )
+
+    if variable.value >= DRYNESS_GOOD:
+        return ColourVariant.GOOD.value
+
+    if variable.value >= DRYNESS_OKAY:
+        return ColourVariant.OKAY.value
+
+    return ColourVariant.BAD.value
+
+
 def get_colour_variant(variable: Variable, time_delta: dt.timedelta | None = None) -> str:
     if variable.name == "precipitation_amount":
         if time_delta is None:
@@ -282,4 +380,50 @@ def get_colour_variant(variable: Variable, time_delta: dt.timedelta | None = Non
     if variable.name == "relative_humidity":
         return _get_humid_colour_variant(variable)
 
+    if variable.name == "rock_dryness":
+        return _get_dryness_colour_variant(variable)
+
     raise ValueError(f"Cannot get colour variant for variable type: {variable.name}")
+
+
+def get_colour_variants(
+    variable_name: str, values: np.ndarray, time_deltas_hours: np.ndarray | None = None
+) -> List[str]:
+    """Vectorized equivalent of get_colour_variant.
+
+    Values must be in the units expected by get_colour_variant; mm, celsius, m/s and %.
+    Precipitation also needs the length in hours of the period each value covers.
+    """
+    good, okay, bad = ColourVariant.GOOD.value, ColourVariant.OKAY.value, ColourVariant.BAD.value
+
+    if variable_name == "precipitation_amount":
+        if time_deltas_hours is None:
+            raise ValueError("time_deltas_hours cannot be none for precipitation type variable")
+        hours = np.abs(time_deltas_hours)
+        bad_values = PRECIPITATION_BAD_PER_HOUR * hours
+        okay_values = PRECIPITATION_OKAY_PER_HOUR * hours
+        variants = np.where(
+            (bad_values != 0) & (values >= bad_values),
+            bad,
+            np.where((okay_values != 0) & (values >= okay_values), okay, good),
+        )
+    elif variable_name == "air_temperature":
+        variants = np.where(
+            (TEMP_GOOD_MIN <= values) & (values <= TEMP_GOOD_MAX),
+            good,
+            np.where((TEMP_OKAY_MIN <= values) & (values <= TEMP_OKAY_MAX), okay, bad),
+        )
+    elif variable_name == "wind_speed":
+        variants = np.where(
+            values >= WIND_SPEED_BAD, bad, np.where(values >= WIND_SPEED_OKAY, okay, good)
+        )
+    elif variable_name == "relative_humidity":
+        variants = np.where(values >= HUMID_BAD, bad, np.where(values >= HUMID_OKAY, okay, good))
+    elif variable_name == "rock_dryness":
+        variants = np.where(
+            values >= DRYNESS_GOOD, good, np.where(values >= DRYNESS_OKAY, okay, bad)
+        )
+    else:
+        raise ValueError(f"Cannot get colour variant for variable type: {variable_name}")
+
+    return variants.tolist()
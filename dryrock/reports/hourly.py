@@ -0,0 +1,102 @@
+"""Hourly forecasts of each place as JSON fragments, fetched by the forecast page when needed.
+
+Forecast pages only include the daily summary of each place, the hourly detail of a day is shown
+in a modal that fetches the place's fragment the first time one of its days is opened. Values are
+formatted as they are displayed so the page only has to put them in the table.
+"""
+
+import json
+import pathlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from .helper_functions import DisplayValue, UnitSystem, sanitize_name
+from .output import OutputOptions, OutputSizes, total_sizes, write_output
+
+# Columns of the hourly table, each row of a fragment has a cell for each of them
+COLUMNS = ["Time", "Rain", "Temp.", "Wind", "Humid.", "Cloud cover", "Dry rock"]
+
+# A formatted value and its colour variant, None if it has no colour
+Cell = Tuple[str, Optional[str]]
+
+
+def get_fragment_name(place_name: str, unit_system: UnitSystem) -> str:
+    """Returns the file name of the fragment of a place in a unit system."""
+    return f"{sanitize_name(place_name)}_{unit_system.name.lower()}.json"
+
+
+def format_rain(rain: DisplayValue) -> str:
+    if rain.units == "inches":
+        return f"{round(rain.value, 2)} in"
+    return f"{round(rain.value, 1)} {rain.units}"
+
+
+def format_temp(temp: DisplayValue) -> str:
+    units = {"celsius": "°C", "fahrenheit": "°F"}.get(temp.units, temp.units)
+    return f"{round(temp.value, 1)} {units}"
+
+
+def get_interval_row(interval: Dict[str, Any]) -> List[Cell]:
+    """Returns the cells of an interval, from its context in the forecast page context."""
+    dryness = interval["dryness"]
+    return [
+        (
+            f"{interval['start_time'].strftime('%H')} - {interval['end_time'].strftime('%H')}",
+            None,
+        ),
+        (format_rain(interval["rain"]), interval["rain_colour_variant"]),
+        (format_temp(interval["temp"]), interval["temp_colour_variant"]),
+        (
+            f"{interval['wind_speed'].value} {interval['wind_speed'].units} "
+            f"{interval['wind_from_direction']}",
+            interval["wind_speed_colour_variant"],
+        ),
+        (
+            f"{round(interval['humid'].value)} {interval['humid'].units}",
+            interval["humid_colour_variant"],
+        ),
+        (f"{round(interval['cloud_cover'].value)} {interval['cloud_cover'].units}", None),
+        (
+            (f"{int(dryness.value)} {dryness.units}", interval["dryness_colour_variant"])
+            if dryness
+            else ("", None)
+        ),
+    ]
+
+
+def get_fragment(place_forecasts: Dict[Any, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Returns the fragment of a place from its forecasts by day, converted to a unit system."""
+    return {
+        "columns": COLUMNS,
+        "days": {
+            day.isoformat(): [get_interval_row(interval) for interval in forecast["intervals"]]
+            for day, forecast in place_forecasts.items()
+            if forecast is not None
+        },
+    }
+
+
+def write_fragments(
+    context: Dict[str, Any],
+    unit_system: UnitSystem,
+    directory: pathlib.Path,
+    options: OutputOptions = OutputOptions(),
+) -> OutputSizes:
+    """Writes the fragment of every place in a forecast page context to directory.
+
+    Args:
+        context: Forecast page context, converted to unit_system.
+        unit_system: Unit system of the context.
+        directory: Directory to write the fragments to, created if it does not exist.
+        options: Optional; Whether to compress the fragments, they are never minified.
+
+    Returns:
+        The total sizes of the fragments written.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    sizes = []
+    for place in context["places"]:
+        fragment = get_fragment(context["forecasts"][place.name])
+        content = json.dumps(fragment, ensure_ascii=False, separators=(",", ":"))
+        file_path = directory.joinpath(get_fragment_name(place.name, unit_system))
+        sizes.append(write_output(file_path, [content], options, is_html=False))
+    return total_sizes(sizes)
@@ -0,0 +1,336 @@
+"""Writes rendered pages and data files, minified and with precompressed copies if wanted."""
+
+import gzip
+import hashlib
+import logging
+import pathlib
+import re
+import shutil
+from typing import BinaryIO, Dict, Iterable, NamedTuple, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Optional, .br copies are only written if it is installed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Elements whose content is left as it is when minifying, whitespace in them matters
+RAW_TEXT_ELEMENTS = ["script", "style", "pre", "textarea"]
+RAW_TEXT_START = re.compile(r"<(" + "|".join(RAW_TEXT_ELEMENTS) + r")\b", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+# Copies of static assets are named like style.0123456789.css
+ASSET_HASH_LENGTH = 10
+HASHED_ASSET_NAME = re.compile(r"\.[0-9a-f]{%d}\.[^.]+$" % ASSET_HASH_LENGTH)
+COMPRESSED_SUFFIXES = [".gz", ".br"]
+
+
+class OutputOptions(NamedTuple):
+    """How pages and data files are written."""
+
+    minify: bool = False  # collapse whitespace in HTML
+    compress: bool = False  # write .gz and .br copies alongside each file
+
+
+class OutputSizes(NamedTuple):
+    """Sizes in bytes of the output, 0 for copies that were not written, and the number of files
+    written and left as they were because their content had not changed."""
+
+    rendered: int = 0  # before minifying
+    written: int = 0  # as written, or as it already was if unchanged
+    gzip: int = 0
+    brotli: int = 0
+    files_written: int = 0
+    files_skipped: int = 0
+
+
+def total_sizes(sizes: Iterable[OutputSizes]) -> OutputSizes:
+    """Returns the sum of each of the sizes."""
+    totals = [0] * len(OutputSizes._fields)
+    for size in sizes:
+        totals = [total + value for total, value in zip(totals, size)]
+    return OutputSizes(*totals)
+
+
+def collapse_whitespace(text: str) -> str:
+    """Replaces each run of whitespace with a newline if it had one and a space otherwise.
+
+    Keeping line breaks keeps the pages readable and diffs of them small.
+    """
+    return WHITESPACE.sub(lambda match: "\n" if "\n" in match.group() else " ", text)
+
+
+class HtmlMinifier:
+    """Minifies HTML as it is streamed, collapsing runs of whitespace outside of raw text elements.
+
+    Whitespace is never removed entirely, so the page looks the same however the browser treats
+    whitespace between elements. Input is held back from the last `>` onwards until more arrives,
+    as a run of whitespace or a closing tag may carry on into the next chunk.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._raw_element: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"HtmlMinifier({len(self._pending)} characters pending)"
+
+    def feed(self, chunk: str) -> str:
+        """Adds a chunk of HTML and returns the minified HTML that is ready."""
+        self._pending += chunk
+        end = self._pending.rfind(">") + 1
+        if end == 0:
+            return ""
+        ready, self._pending = self._pending[:end], self._pending[end:]
+        return self._minify(ready)
+
+    def close(self) -> str:
+        """Returns the rest of the minified HTML."""
+        rest, self._pending = self._pending, ""
+        return self._minify(rest)
+
+    def _minify(self, text: str) -> str:
+        output = []
+        position = 0
+        while position < len(text):
+            if self._raw_element is not None:
+                end = text.lower().find(f"</{self._raw_element}", position)
+                if end == -1:
+                    output.append(text[position:])
+                    break
+                output.append(text[position:end])
+                self._raw_element = None
+                position = end
+                continue
+
+            match = RAW_TEXT_START.search(text, position)
+            if match is None:
+                output.append(collapse_whitespace(text[position:]))
+                break
+            # The start tag itself is minified, its content is not
+            tag_end = text.find(">", match.end())
+            tag_end = len(text) if tag_end == -1 else tag_end + 1
+            output.append(collapse_whitespace(text[position:tag_end]))
+            self._raw_element = match.group(1).lower()
+            position = tag_end
+
+        return "".join(output)
+
+
+def minify_html(html: str) -> str:
+    """Returns the HTML with runs of whitespace collapsed, see `HtmlMinifier`."""
+    minifier = HtmlMinifier()
+    return minifier.feed(html) + minifier.close()
+
+
+def get_temp_path(file_path: pathlib.Path) -> pathlib.Path:
+    """Returns the path a file is written to before it is renamed into place."""
+    return file_path.with_name(file_path.name + ".tmp")
+
+
+def get_file_hash(file_path: pathlib.Path) -> Optional[str]:
+    """Returns the SHA-256 hash of a file's content, None if there is no such file."""
+    if not file_path.is_file():
+        return None
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AtomicFile:
+    """A file that is written to a temporary file and only replaces file_path if its content has
+    changed.
+
+    Renaming is atomic so readers, such as a web server or the site's git commit, see either the old
+    file or all of the new one, never part of it. If writing fails the old file is left as it was.
+    An unchanged file keeps its modification time and git has nothing to compare.
+
+    Use as a context manager, writing bytes to it as to a binary file.
+
+    Attributes:
+        file_path: Path of the file.
+        changed: Whether the file was replaced, None until it is closed.
+    """
+
+    def __init__(self, file_path: pathlib.Path):
+        self.file_path = file_path
+        self.changed: Optional[bool] = None
+        self._temp_path = get_temp_path(file_path)
+        self._file: Optional[BinaryIO] = None
+        self._hash = hashlib.sha256()
+
+    def __repr__(self) -> str:
+        return f"AtomicFile({self.file_path})"
+
+    def __enter__(self) -> "AtomicFile":
+        self._file = open(self._temp_path, "wb")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        assert self._file is not None, "AtomicFile was not opened"
+        self._file.close()
+        if exc_type is not None:
+            self._temp_path.unlink(missing_ok=True)
+            return
+
+        self.changed = get_file_hash(self.file_path) != self._hash.hexdigest()
+        if self.changed:
+            self._temp_path.replace(self.file_path)
+        else:
+            self._temp_path.unlink()
+
+    def write(self, data: bytes) -> int:
+        assert self._file is not None, "AtomicFile was not opened"
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def flush(self):
+        assert self._file is not None, "AtomicFile was not opened"
+        self._file.flush()
+
+
+def copy_file(source_path: pathlib.Path, file_path: pathlib.Path) -> bool:
+    """Copies a file through an `AtomicFile`, returns True if file_path was changed."""
+    with open(source_path, "rb") as source, AtomicFile(file_path) as destination:
+        shutil.copyfileobj(source, destination)
+    return bool(destination.changed)
+
+
+def compressed_copies_exist(file_path: pathlib.Path) -> bool:
+    """Returns whether all of the copies `compress_file` writes of a file exist."""
+    gzip_path = file_path.with_name(file_path.name + ".gz")
+    brotli_path = file_path.with_name(file_path.name + ".br")
+    return gzip_path.exists() and (brotli is None or brotli_path.exists())
+
+
+def compress_file(file_path: pathlib.Path) -> Tuple[int, int]:
+    """Writes gzip and, if brotli is installed, brotli copies of a file next to it.
+
+    The gzip copy has no timestamp so the same content always compresses to the same bytes.
+
+    Returns:
+        The sizes in bytes of the gzip and brotli copies, 0 for the brotli copy if brotli is not
+        installed.
+    """
+    gzip_path = file_path.with_name(file_path.name + ".gz")
+    with open(file_path, "rb") as source, AtomicFile(gzip_path) as destination:
+        with gzip.GzipFile(
+            filename="", mode="wb", fileobj=destination, compresslevel=9, mtime=0
+        ) as compressed:
+            shutil.copyfileobj(source, compressed)
+    gzip_size = gzip_path.stat().st_size
+
+    brotli_size = 0
+    if brotli is not None:
+        brotli_path = file_path.with_name(file_path.name + ".br")
+        with AtomicFile(brotli_path) as file:
+            brotli_size = file.write(brotli.compress(file_path.read_bytes()))
+
+    return gzip_size, brotli_size
+
+
+def write_output(
+    file_path: pathlib.Path,
+    chunks: Iterable[str],
+    options: OutputOptions = OutputOptions(),
+    is_html: bool = True,
+) -> OutputSizes:
+    """Writes chunks of text to file as they arrive, so the whole file is never held in memory.
+
+    The file is only replaced if its content has changed, see `AtomicFile`. Compressed copies are
+    only written along with the file or if they are missing.
+
+    Args:
+        file_path: Path to write to.
+        chunks: Text to write, such as a template stream.
+        options: Optional; Whether to minify and compress the output.
+        is_html: Optional; If the text is HTML, other text is never minified.
+
+    Returns:
+        The sizes of the text before minifying and of the files, and whether the file was written
+        or skipped.
+    """
+    minifier = HtmlMinifier() if options.minify and is_html else None
+    rendered = 0
+    with AtomicFile(file_path) as file:
+        for chunk in chunks:
+            data = chunk.encode("utf8")
+            rendered += len(data)
+            if minifier is not None:
+                data = minifier.feed(chunk).encode("utf8")
+            file.write(data)
+        if minifier is not None:
+            file.write(minifier.close().encode("utf8"))
+
+    written = file_path.stat().st_size
+    gzip_size, brotli_size = 0, 0
+    if options.compress:
+        gzip_path = file_path.with_name(file_path.name + ".gz")
+        brotli_path = file_path.with_name(file_path.name + ".br")
+        if file.changed or not compressed_copies_exist(file_path):
+            gzip_size, brotli_size = compress_file(file_path)
+        else:
+            gzip_size = gzip_path.stat().st_size
+            brotli_size = brotli_path.stat().st_size if brotli is not None else 0
+    return OutputSizes(
+        rendered, written, gzip_size, brotli_size, int(bool(file.changed)), int(not file.changed)
+    )
+
+
+def hash_static_assets(
+    static_path: pathlib.Path, url_prefix: str = "/static/", compress: bool = False
+) -> Dict[str, str]:
+    """Writes a copy of each static asset named with a hash of its content.
+
+    Pages that refer to the copies can be cached for as long as the browser likes, a change to an
+    asset changes the name of its copy. Copies of earlier versions, and of assets that have been
+    removed, are deleted along with their compressed copies.
+
+    Args:
+        static_path: Directory of the static assets.
+        url_prefix: Optional; URL the directory is served from.
+        compress: Optional; Whether to write compressed copies of the hashed copies, see
+            `compress_file`.
+
+    Returns:
+        The URL of the copy of each asset indexed by the URL of the asset.
+    """
+    urls: Dict[str, str] = {}
+    hashed_paths = set()
+    stale_paths = []
+    for file_path in sorted(static_path.rglob("*")):
+        if not file_path.is_file() or file_path.suffix == ".tmp":
+            continue
+        name = file_path.name
+        if file_path.suffix in COMPRESSED_SUFFIXES:
+            name = file_path.stem
+        if HASHED_ASSET_NAME.search(name):
+            stale_paths.append((file_path.with_name(name), file_path))
+            continue
+        if name != file_path.name:
+            continue
+
+        content = file_path.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()[:ASSET_HASH_LENGTH]
+        hashed_path = file_path.with_name(f"{file_path.stem}.{digest}{file_path.suffix}")
+        hashed_paths.add(hashed_path)
+        written = not hashed_path.exists()
+        if written:
+            with AtomicFile(hashed_path) as file:
+                file.write(content)
+            logger.debug(f"Wrote {hashed_path}")
+        if compress and (written or not compressed_copies_exist(hashed_path)):
+            compress_file(hashed_path)
+
+        url = url_prefix + file_path.relative_to(static_path).as_posix()
+        urls[url] = url_prefix + hashed_path.relative_to(static_path).as_posix()
+
+    for hashed_path, file_path in stale_paths:
+        if hashed_path not in hashed_paths:
+            file_path.unlink()
+            logger.debug(f"Removed {file_path}")
+
+    return urls
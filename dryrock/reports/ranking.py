@@ -0,0 +1,257 @@
+"""Ranking of places across all areas by how dry they will be over a window of days."""
+
+import datetime as dt
+import heapq
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from metno_locationforecast import Forecast
+from metno_locationforecast.data_containers import Variable
+
+from ..places import Area
+from .forecast_store import ForecastStore
+from .helper_functions import DayPart, cardinal_name_of, get_colour_variant, sanitize_name
+
+# Labels of the windows places can be ranked over, see get_window_days
+WINDOW_LABELS = {
+    "today": "Today",
+    "tomorrow": "Tomorrow",
+    "weekend": "This weekend",
+}
+
+
+class PlaceScore(NamedTuple):
+    """Aggregates of a place's forecast over a window, places are ranked by `key`."""
+
+    time_delta: dt.timedelta
+    rain: Variable
+    max_wind_speed: Variable
+    max_wind_speed_direction: Variable
+    min_humid: Variable
+
+    def key(self) -> Tuple[float, float, float]:
+        """Returns the sort key of the score, the lowest is the driest.
+
+        Places are ranked by total rain, ties are broken by the wind and then the humidity. Rain is
+        given to a tenth of a millimetre so totals that only differ in rounding count as ties.
+        """
+        return (round(self.rain.value, 1), self.max_wind_speed.value, self.min_humid.value)
+
+
+class RankedPlace(NamedTuple):
+    """A place in a ranking, given by its index in the areas and its area's places."""
+
+    area_index: int
+    place_index: int
+    score: PlaceScore
+
+
+def get_window_days(window: str, today: dt.date) -> List[dt.date]:
+    """Returns the days in a window starting from today.
+
+    Windows are "today", "tomorrow" and "weekend", the weekend being the coming Saturday and
+    Sunday or what is left of the current one.
+
+    Raises:
+        ValueError: If the window is unknown.
+    """
+    if window == "today":
+        return [today]
+    if window == "tomorrow":
+        return [today + dt.timedelta(days=1)]
+    if window == "weekend":
+        saturday = today + dt.timedelta(days=(5 - today.weekday()) % 7)
+        if today.weekday() == 6:
+            return [today]
+        return [saturday, saturday + dt.timedelta(days=1)]
+    raise ValueError(f"Unknown ranking window {window}, expected one of {list(WINDOW_LABELS)}")
+
+
+def get_place_score(
+    store: ForecastStore, spans: List[Tuple[dt.datetime, dt.datetime]]
+) -> Optional[PlaceScore]:
+    """Returns the aggregates of the forecast over the spans of time.
+
+    Spans are aggregated over the intervals starting in them. Returns None if there are no spans,
+    if the intervals of the forecast, together with the one running into a span, do not run
+    unbroken from the start to the end of every span or if any rain values in them are missing.
+    """
+    score: Optional[PlaceScore] = None
+    for start, end in spans:
+        rain = store.rain_between(start, end)
+        if rain is None:
+            return None
+        index = store.index_between(start, end)
+        first = index.start
+        if store.start_times[first] > start.timestamp():
+            first -= 1
+        if first < 0:
+            return None
+        covering = slice(first, index.stop)
+        start_times, end_times = store.start_times[covering], store.end_times[covering]
+        if end_times[-1] < end.timestamp() or (end_times[:-1] != start_times[1:]).any():
+            return None
+        max_wind_speed, max_wind_speed_direction = store.max_wind_speed_of(index)
+        min_humid = store.min_humid_of(index)
+
+        if score is not None:
+            rain = score.rain + rain
+            if score.max_wind_speed.value >= max_wind_speed.value:
+                max_wind_speed = score.max_wind_speed
+                max_wind_speed_direction = score.max_wind_speed_direction
+            if score.min_humid.value <= min_humid.value:
+                min_humid = score.min_humid
+        time_delta = end - start + (score.time_delta if score is not None else dt.timedelta())
+        score = PlaceScore(time_delta, rain, max_wind_speed, max_wind_speed_direction, min_humid)
+    return score
+
+
+def rank_places(
+    areas: List[Area],
+    area_forecasts: List[List[Forecast]],
+    window: str,
+    size: int,
+    hours: DayPart,
+    area_stores: Optional[List[List[ForecastStore]]] = None,
+    now: Optional[dt.datetime] = None,
+) -> List[RankedPlace]:
+    """Returns the driest places across all areas over a window, driest first.
+
+    Places are scored one at a time and only the best `size` are kept, on a heap, so the cost
+    grows with the number of places but the memory does not. Places that share forecast data
+    and time zone, as the places of a grid cell do, are only scored once. Places are only scored
+    from the start of the current hour, parts of the window that have passed are left out.
+
+    Args:
+        areas: Areas to rank the places of.
+        area_forecasts: Forecasts with data for each place of each area.
+        window: Window of days to rank the places over, see `get_window_days`.
+        size: Number of places to return.
+        hours: Hours of each day in the window to rank the places over, in local time.
+        area_stores: Optional; Forecast data already aggregated for each place of each area, see
+            `get_area_stores`. Data is aggregated as the places are ranked if it is not given.
+        now: Optional; Time to rank from, defaults to the current time.
+
+    Returns:
+        Up to size places, fewer if there are not as many with data for the whole window.
+    """
+    if len(areas) != len(area_forecasts):
+        raise ValueError("Number of areas must match the number of area forecasts")
+    if area_stores is not None and len(area_stores) != len(areas):
+        raise ValueError("Number of areas must match the number of area stores")
+    if now is None:
+        now = dt.datetime.now(dt.timezone.utc)
+
+    # Places sharing data share the same Data object, the forecasts keep it alive while ranking
+    stores: Dict[int, ForecastStore] = {}
+    scores: Dict[Tuple[int, str], Optional[PlaceScore]] = {}
+    # Forecasts start at the current hour so earlier parts of the window are never covered
+    from_time = now.replace(minute=0, second=0, microsecond=0)
+
+    def scored_places() -> Iterator[Tuple[Tuple[float, float, float], int, int, PlaceScore]]:
+        for i, (area, place_forecasts) in enumerate(zip(areas, area_forecasts)):
+            today = now.astimezone(area.time_zone).date()
+            days = get_window_days(window, today)
+            spans = []
+            for day in days:
+                start, end = hours.window_for(day, area.time_zone)
+                if end > from_time:
+                    spans.append((max(start, from_time), end))
+            for j, forecast in enumerate(place_forecasts):
+                data_id = id(forecast.data)
+                score_key = (data_id, str(area.time_zone))
+                if score_key not in scores:
+                    if area_stores is not None:
+                        store = area_stores[i][j]
+                    else:
+                        if data_id not in stores:
+                            stores[data_id] = ForecastStore(forecast.data)
+                        store = stores[data_id]
+                    scores[score_key] = get_place_score(store, spans)
+                score = scores[score_key]
+                if score is not None:
+                    # Indices break ties so scores are never compared
+                    yield score.key(), i, j, score
+
+    return [RankedPlace(i, j, score) for _, i, j, score in heapq.nsmallest(size, scored_places())]
+
+
+def get_area_stores(
+    area_forecasts: List[List[Forecast]],
+    area_stores: Optional[List[List[ForecastStore]]] = None,
+) -> List[List[ForecastStore]]:
+    """Returns the aggregated forecast data of every place of every area, for `rank_places`.
+
+    Stores already aggregated for the places of an area in area_stores are reused, an empty list
+    for an area means it has none. Places that share data share a store.
+    """
+    stores: Dict[int, ForecastStore] = {}
+    complete_stores: List[List[ForecastStore]] = []
+    for i, place_forecasts in enumerate(area_forecasts):
+        if area_stores is not None and len(area_stores[i]) == len(place_forecasts):
+            complete_stores.append(area_stores[i])
+            continue
+        place_stores = []
+        for forecast in place_forecasts:
+            if id(forecast.data) not in stores:
+                stores[id(forecast.data)] = ForecastStore(forecast.data)
+            place_stores.append(stores[id(forecast.data)])
+        complete_stores.append(place_stores)
+    return complete_stores
+
+
+def get_ranking_context(
+    areas: List[Area],
+    window: str,
+    ranked_places: List[RankedPlace],
+) -> Dict[str, Any]:
+    """Returns the context of a ranking, with variables in the units of the forecast data."""
+    places = []
+    for ranked_place in ranked_places:
+        area = areas[ranked_place.area_index]
+        place = area.places[ranked_place.place_index]
+        score = ranked_place.score
+        places.append(
+            {
+                "name": place.name,
+                "area_name": area.name,
+                "href_metric": f"/pages/{sanitize_name(area.name)}_metric.html",
+                "href_imperial": f"/pages/{sanitize_name(area.name)}_imperial.html",
+                "rain": score.rain,
+                "rain_colour_variant": get_colour_variant(score.rain, score.time_delta),
+                "max_wind_speed": score.max_wind_speed,
+                "max_wind_speed_direction": cardinal_name_of(score.max_wind_speed_direction),
+                "max_wind_speed_colour_variant": get_colour_variant(score.max_wind_speed),
+                "min_humid": score.min_humid,
+                "min_humid_colour_variant": get_colour_variant(score.min_humid),
+            }
+        )
+    return {"window": window, "label": WINDOW_LABELS[window], "places": places}
+
+
+def get_ranking_data(ranking_contexts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Returns rankings as plain data for the rankings file, in the units of the forecast data."""
+
+    def value_of(variable: Variable) -> Dict[str, Any]:
+        return {"value": variable.value, "units": variable.units}
+
+    return {
+        "rankings": [
+            {
+                "window": context["window"],
+                "label": context["label"],
+                "places": [
+                    {
+                        "name": place["name"],
+                        "area_name": place["area_name"],
+                        "href": place["href_metric"],
+                        "rain": value_of(place["rain"]),
+                        "max_wind_speed": value_of(place["max_wind_speed"]),
+                        "max_wind_speed_direction": place["max_wind_speed_direction"],
+                        "min_humid": value_of(place["min_humid"]),
+                    }
+                    for place in context["places"]
+                ],
+            }
+            for context in ranking_contexts
+        ]
+    }
@@ -1,26 +1,56 @@
+import collections
+import concurrent.futures
+import contextlib
 import copy
 import datetime as dt
+import itertools
+import json
+import logging
 import pathlib
-from typing import Any, Dict, List, Optional, Tuple
+from typing import (
+    Any,
+    Collection,
+    ContextManager,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from zoneinfo import ZoneInfo
 
 import jinja2 as jinja
+import numpy as np
 from metno_locationforecast import Forecast
 from metno_locationforecast.data_containers import Variable
 
+from ..config import DAY_PARTS, RANKING_HOURS, RANKING_SIZE, RANKING_WINDOWS
+from ..metrics import RunMetrics
 from ..places import Area
+from .dryness import DrynessModel
+from .forecast_store import ForecastStore
+from .hourly import write_fragments
 from .helper_functions import (
+    DayPart,
     UnitSystem,
     cardinal_name_of,
-    change_units,
+    convert_units_of,
     get_colour_variant,
-    get_time_delta,
-    max_temp_of,
-    max_wind_speed_of,
-    min_humid_of,
-    min_temp_of,
+    get_colour_variants,
     sanitize_name,
-    sum_rain,
 )
+from .output import OutputOptions, OutputSizes, total_sizes, write_output
+from .ranking import get_area_stores, get_ranking_context, get_ranking_data, rank_places
+from .render_manifest import RenderManifest, get_forecast_hash, get_render_sources_hash, hash_of
+from .template_environment import get_template_environment
+
+logger = logging.getLogger(__name__)
+
+# Environment and output options of a render worker process, set once when the worker starts
+_worker_env: Optional[jinja.Environment] = None
+_worker_options = OutputOptions()
 
 
 def get_navbar_context(areas: List[Area]) -> Dict[str, Any]:
@@ -34,6 +64,14 @@ def get_navbar_context(areas: List[Area]) -> Dict[str, Any]:
                 "is_active": False,
             }
         )
+    nav_links.append(
+        {
+            "name": "Driest crags",
+            "href_metric": "/pages/driest_crags_metric.html",
+            "href_imperial": "/pages/driest_crags_imperial.html",
+            "is_active": False,
+        }
+    )
     nav_links.append(
         {
             "name": "News",
@@ -54,154 +92,152 @@ def get_navbar_context(areas: List[Area]) -> Dict[str, Any]:
     return context
 
 
-def get_total_rain_for_interval(
+def get_day_parts_context(
+    store: ForecastStore,
     day: dt.date,
-    start_time: dt.time,
-    end_time: dt.time,
-    forecast: Forecast,
-) -> Variable | None:
-    datetime_interval = (
-        dt.datetime.combine(day, start_time, tzinfo=start_time.tzinfo),
-        dt.datetime.combine(day, end_time, tzinfo=end_time.tzinfo),
+    time_zone: ZoneInfo,
+    day_parts: List[DayPart],
+) -> List[Dict[str, Any]]:
+    """Returns the rain totals for each part of the day, in the same order as day_parts."""
+
+    day_parts_context: List[Dict[str, Any]] = []
+    for day_part in day_parts:
+        rain = store.rain_between(*day_part.window_for(day, time_zone))
+        day_parts_context.append(
+            {
+                "rain": rain,
+                "rain_colour_variant": (
+                    get_colour_variant(rain, day_part.time_delta) if rain else None
+                ),
+            }
+        )
+
+    return day_parts_context
+
+
+def get_dryness_variable(score: float) -> Optional[Variable]:
+    """Returns a dryness score as a variable, None if there is no score."""
+    return Variable("rock_dryness", score, "%") if not np.isnan(score) else None
+
+
+def get_intervals_context(
+    store: ForecastStore,
+    index: slice,
+    time_zone: ZoneInfo,
+    dryness_scores: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """Returns a context for each of the intervals in index for the detailed day forecast.
+
+    Dryness scores are aligned with the intervals of the store, intervals without one have no
+    dryness.
+    """
+
+    start_times = store.start_times[index]
+    end_times = store.end_times[index]
+    values = {name: store.values[name][index] for name in store.values}
+    rain_colour_variants = get_colour_variants(
+        "precipitation_amount", values["precipitation_amount"], (end_times - start_times) / 3600
+    )
+    temp_colour_variants = get_colour_variants("air_temperature", values["air_temperature"])
+    wind_speed_colour_variants = get_colour_variants("wind_speed", values["wind_speed"])
+    humid_colour_variants = get_colour_variants("relative_humidity", values["relative_humidity"])
+    dryness_values = (
+        dryness_scores[index] if dryness_scores is not None else np.full(len(start_times), np.nan)
     )
-    relevant_intervals = forecast.data.intervals_between(datetime_interval[0], datetime_interval[1])
-    total_rain = sum_rain(relevant_intervals) if len(relevant_intervals) > 0 else None
+    dryness_colour_variants = get_colour_variants("rock_dryness", dryness_values)
+
+    intervals: List[Dict[str, Any]] = []
+    for i, (start_time, end_time) in enumerate(zip(start_times.tolist(), end_times.tolist())):
+        j = index.start + i
+        interval: Dict[str, Any] = {
+            "start_time": dt.datetime.fromtimestamp(start_time, time_zone),
+            "end_time": dt.datetime.fromtimestamp(end_time, time_zone),
+            "rain": store.variable("precipitation_amount", j),
+            "rain_colour_variant": rain_colour_variants[i],
+            "temp": store.variable("air_temperature", j),
+            "temp_colour_variant": temp_colour_variants[i],
+            "wind_speed": store.variable("wind_speed", j),
+            "wind_speed_colour_variant": wind_speed_colour_variants[i],
+            "wind_from_direction": cardinal_name_of(store.variable("wind_from_direction", j)),
+            "humid": store.variable("relative_humidity", j),
+            "humid_colour_variant": humid_colour_variants[i],
+            "cloud_cover": store.variable("cloud_area_fraction", j),
+            "dryness": get_dryness_variable(dryness_values[i].item()),
+            "dryness_colour_variant": dryness_colour_variants[i],
+        }
+        intervals.append(interval)
 
-    return total_rain
+    return intervals
 
 
 def get_area_forecast_context(
     area: Area,
     place_forecasts: List[Forecast],
+    place_stores: List[ForecastStore],
     days: List[dt.date],
-    night_times: List[dt.time],
-    morning_times: List[dt.time],
-    afternoon_times: List[dt.time],
-    evening_times: List[dt.time],
-    unit_system: UnitSystem,
+    day_parts: List[DayPart],
+    place_dryness: Optional[List[np.ndarray]] = None,
 ) -> Dict[str, Any]:
+    """Returns the forecast context for an area, with variables in the units of the forecast data.
+
+    The context does not depend on the unit system, use `get_unit_system_context` to convert it.
+    If place_dryness is given, the dryness scores of each place's intervals, the best score of each
+    day is included.
+    """
     if len(area.places) != len(place_forecasts):
         raise ValueError("Number of places must match the number of place forecasts")
+    if len(place_forecasts) != len(place_stores):
+        raise ValueError("Number of place forecasts must match the number of place stores")
+    if place_dryness is not None and len(place_dryness) != len(place_stores):
+        raise ValueError("Number of place dryness scores must match the number of place stores")
 
     context_forecasts = {}
     forecast_updated_at = {}
-    for forecast in place_forecasts:
+    for i, (forecast, store) in enumerate(zip(place_forecasts, place_stores)):
+        dryness_scores = place_dryness[i] if place_dryness is not None else None
         forecasts_for_place: Dict[dt.date, Optional[object]] = {}
         for day in days:
-            days_intervals = forecast.data.intervals_for(day, tzinfo=area.time_zone)
-
-            if len(days_intervals) > 0:
-                days_rain = sum_rain(days_intervals)
-                days_max_temp = max_temp_of(days_intervals)
-                days_min_temp = min_temp_of(days_intervals)
-                days_max_wind_speed, days_max_wind_speed_direction = max_wind_speed_of(
-                    days_intervals
-                )
-                days_min_humid = min_humid_of(days_intervals)
-
-                intervals: List[Dict[str, Any]] = []
-                for day_interval in days_intervals:
-                    interval: Dict[str, Any] = {
-                        "start_time": day_interval.start_time.astimezone(area.time_zone),
-                        "end_time": day_interval.end_time.astimezone(area.time_zone),
-                        "rain": change_units(
-                            day_interval.variables["precipitation_amount"], unit_system
-                        ),
-                        "rain_colour_variant": get_colour_variant(
-                            day_interval.variables["precipitation_amount"],
-                            day_interval.end_time - day_interval.start_time,
-                        ),
-                        "temp": change_units(
-                            day_interval.variables["air_temperature"], unit_system
-                        ),
-                        "temp_colour_variant": get_colour_variant(
-                            day_interval.variables["air_temperature"]
-                        ),
-                        "wind_speed": change_units(
-                            day_interval.variables["wind_speed"], unit_system
-                        ),
-                        "wind_speed_colour_variant": get_colour_variant(
-                            day_interval.variables["wind_speed"]
-                        ),
-                        "wind_from_direction": cardinal_name_of(
-                            day_interval.variables["wind_from_direction"]
-                        ),
-                        "humid": day_interval.variables["relative_humidity"],
-                        "humid_colour_variant": get_colour_variant(
-                            day_interval.variables["relative_humidity"]
-                        ),
-                        "cloud_cover": day_interval.variables["cloud_area_fraction"],
-                    }
-                    intervals.append(interval)
-
-                night_rain = get_total_rain_for_interval(
-                    day, night_times[0], night_times[1], forecast
+            day_index = store.index_for(day, tzinfo=area.time_zone)
+
+            if day_index.stop > day_index.start:
+                days_rain = store.sum_rain(day_index)
+                days_max_temp = store.max_temp_of(day_index)
+                days_min_temp = store.min_temp_of(day_index)
+                days_max_wind_speed, days_max_wind_speed_direction = store.max_wind_speed_of(
+                    day_index
                 )
-                morning_rain = get_total_rain_for_interval(
-                    day, morning_times[0], morning_times[1], forecast
-                )
-                afternoon_rain = get_total_rain_for_interval(
-                    day, afternoon_times[0], afternoon_times[1], forecast
+                days_min_humid = store.min_humid_of(day_index)
+
+                intervals = get_intervals_context(store, day_index, area.time_zone, dryness_scores)
+                days_dryness = (
+                    dryness_scores[day_index] if dryness_scores is not None else np.empty(0)
                 )
-                evening_rain = get_total_rain_for_interval(
-                    day, evening_times[0], evening_times[1], forecast
+                days_max_dryness = (
+                    get_dryness_variable(np.nanmax(days_dryness).item())
+                    if not np.all(np.isnan(days_dryness))
+                    else None
                 )
 
+                day_parts_context = get_day_parts_context(store, day, area.time_zone, day_parts)
+
                 forecast_for_day: Dict[str, Any] = {
-                    "total_rain": change_units(days_rain, unit_system),
+                    "total_rain": days_rain,
                     "total_rain_colour_variant": get_colour_variant(
                         days_rain, dt.timedelta(days=1)
                     ),
-                    "max_temp": change_units(days_max_temp, unit_system),
+                    "max_temp": days_max_temp,
                     "max_temp_colour_variant": get_colour_variant(days_max_temp),
-                    "min_temp": change_units(days_min_temp, unit_system),
-                    "max_wind_speed": change_units(days_max_wind_speed, unit_system),
+                    "min_temp": days_min_temp,
+                    "max_wind_speed": days_max_wind_speed,
                     "max_wind_speed_colour_variant": get_colour_variant(days_max_wind_speed),
                     "max_wind_speed_direction": cardinal_name_of(days_max_wind_speed_direction),
                     "min_humid": days_min_humid,
                     "min_humid_colour_variant": get_colour_variant(days_min_humid),
-                    "night_rain": (change_units(night_rain, unit_system) if night_rain else None),
-                    "night_rain_colour_variant": (
-                        get_colour_variant(
-                            night_rain,
-                            get_time_delta(night_times[0], night_times[1]),
-                        )
-                        if night_rain
-                        else None
-                    ),
-                    "morning_rain": (
-                        change_units(morning_rain, unit_system) if morning_rain else None
-                    ),
-                    "morning_rain_colour_variant": (
-                        get_colour_variant(
-                            morning_rain,
-                            get_time_delta(morning_times[0], morning_times[1]),
-                        )
-                        if morning_rain
-                        else None
-                    ),
-                    "afternoon_rain": (
-                        change_units(afternoon_rain, unit_system) if afternoon_rain else None
-                    ),
-                    "afternoon_rain_colour_variant": (
-                        get_colour_variant(
-                            afternoon_rain,
-                            get_time_delta(afternoon_times[0], afternoon_times[1]),
-                        )
-                        if afternoon_rain
-                        else None
-                    ),
-                    "evening_rain": (
-                        change_units(evening_rain, unit_system) if evening_rain else None
-                    ),
-                    "evening_rain_colour_variant": (
-                        get_colour_variant(
-                            evening_rain,
-                            get_time_delta(evening_times[0], evening_times[1]),
-                        )
-                        if evening_rain
-                        else None
+                    "max_dryness": days_max_dryness,
+                    "max_dryness_colour_variant": (
+                        get_colour_variant(days_max_dryness) if days_max_dryness else None
                     ),
+                    "day_parts": day_parts_context,
                     "intervals": intervals,
                 }
 
@@ -218,57 +254,109 @@ def get_area_forecast_context(
     context: Dict[str, Any] = {
         "area_name": area.name,
         "days": days,
+        "day_parts": day_parts,
         "places": area.places,
         "forecasts": context_forecasts,
         "updated_at": forecast_updated_at,
+        # Hourly forecasts are fetched from fragments by the page, see hourly.py
+        "hourly_hrefs": {
+            place.name: f"/pages/hourly/{sanitize_name(area.name)}/{sanitize_name(place.name)}"
+            for place in area.places
+        },
     }
     return context
 
 
 def get_forecast_page_contexts(
-    areas: List[Area], area_forecasts: List[List[Forecast]], unit_system: UnitSystem
+    areas: List[Area],
+    area_forecasts: List[List[Forecast]],
+    area_stores: List[List[ForecastStore]],
+    area_indices: Optional[Collection[int]] = None,
+    area_dryness: Optional[List[List[np.ndarray]]] = None,
 ) -> List[Dict[str, Any]]:
-    """Returns a list of contexts one each per area for passing into the forecast page template."""
+    """Returns a list of contexts one each per area for the forecast page template.
+
+    Contexts are independent of the unit system, pass them through `get_unit_system_context`
+    before rendering. If area_indices is given contexts are only returned for the areas at those
+    indices. If area_dryness is given the dryness scores of each place are included.
+    """
 
-    if len(areas) != len(area_forecasts):
-        raise ValueError("Number of areas must match the number of area forecasts")
+    if len(areas) != len(area_forecasts) or len(areas) != len(area_stores):
+        raise ValueError("Number of areas must match the number of area forecasts and stores")
 
     nav_bar_context = get_navbar_context(areas)
+    day_parts = [DayPart(name, start_hour, end_hour) for name, start_hour, end_hour in DAY_PARTS]
 
     forecast_page_contexts: List[Dict[str, Any]] = []
     for i, area in enumerate(areas):
-        now = dt.datetime.now(area.time_zone)
-        today = now.date()
-        night_times = [dt.time(0, tzinfo=area.time_zone), dt.time(5, 59, tzinfo=area.time_zone)]
-        morning_times = [dt.time(6, tzinfo=area.time_zone), dt.time(11, 59, tzinfo=area.time_zone)]
-        afternoon_times = [
-            dt.time(12, tzinfo=area.time_zone),
-            dt.time(17, 59, tzinfo=area.time_zone),
-        ]
-        evening_times = [dt.time(18, tzinfo=area.time_zone), dt.time(23, 59, tzinfo=area.time_zone)]
-        days = [today + dt.timedelta(days=i) for i in range(7)]
-
-        place_forecasts = area_forecasts[i]
-        context = get_area_forecast_context(
-            area,
-            place_forecasts,
-            days,
-            night_times,
-            morning_times,
-            afternoon_times,
-            evening_times,
-            unit_system,
+        if area_indices is not None and i not in area_indices:
+            continue
+
+        forecast_page_contexts.append(
+            get_forecast_page_context(
+                area,
+                i,
+                area_forecasts[i],
+                area_stores[i],
+                nav_bar_context,
+                area_dryness[i] if area_dryness is not None else None,
+                day_parts,
+            )
         )
-        context["unit_system"] = unit_system.name
-        context["index_nav_link"] = nav_bar_context["index_nav_link"]
-        context["nav_links"] = copy.deepcopy(nav_bar_context["nav_links"])
-        context["nav_links"][i]["is_active"] = True
-        context["units_nav_link"] = context["nav_links"][i]
-        forecast_page_contexts.append(context)
 
     return forecast_page_contexts
 
 
+def get_forecast_page_context(
+    area: Area,
+    area_index: int,
+    place_forecasts: List[Forecast],
+    place_stores: List[ForecastStore],
+    nav_bar_context: Dict[str, Any],
+    place_dryness: Optional[List[np.ndarray]] = None,
+    day_parts: Optional[List[DayPart]] = None,
+) -> Dict[str, Any]:
+    """Returns the context of one area's forecast page, see `get_forecast_page_contexts`.
+
+    Args:
+        area: Area of the page.
+        area_index: Index of the area in the navigation bar.
+        place_forecasts: Forecast of each place in the area.
+        place_stores: Aggregated forecast data of each place in the area.
+        nav_bar_context: Context of the navigation bar, see `get_navbar_context`.
+        place_dryness: Optional; Dryness scores of each place in the area.
+        day_parts: Optional; Parts of the day to summarise, defaults to those in the config.
+    """
+    if day_parts is None:
+        day_parts = [
+            DayPart(name, start_hour, end_hour) for name, start_hour, end_hour in DAY_PARTS
+        ]
+
+    now = dt.datetime.now(area.time_zone)
+    today = now.date()
+    days = [today + dt.timedelta(days=i) for i in range(7)]
+
+    context = get_area_forecast_context(
+        area, place_forecasts, place_stores, days, day_parts, place_dryness
+    )
+    context["index_nav_link"] = nav_bar_context["index_nav_link"]
+    context["nav_links"] = copy.deepcopy(nav_bar_context["nav_links"])
+    context["nav_links"][area_index]["is_active"] = True
+    context["units_nav_link"] = context["nav_links"][area_index]
+    return context
+
+
+def get_unit_system_context(context: Dict[str, Any], unit_system: UnitSystem) -> Dict[str, Any]:
+    """Returns a copy of a forecast page context for display in the given unit system.
+
+    Only the forecasts are converted, the rest of the context is shared with the original.
+    """
+    unit_system_context = dict(context)
+    unit_system_context["forecasts"] = convert_units_of(context["forecasts"], unit_system)
+    unit_system_context["unit_system"] = unit_system.name
+    return unit_system_context
+
+
 def get_index_page_context(areas: List[Area]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     context_metric = get_navbar_context(areas)
     context_metric["units_nav_link"] = context_metric["index_nav_link"]
@@ -281,76 +369,459 @@ def get_index_page_context(areas: List[Area]) -> Tuple[Dict[str, Any], Dict[str,
 
 
 def get_news_page_context(areas: List[Area]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    context_metric = get_navbar_context(areas)
+    context_metric["nav_links"][len(areas) + 1]["is_active"] = True
+    context_metric["units_nav_link"] = context_metric["nav_links"][len(areas) + 1]
+    context_metric["unit_system"] = UnitSystem.METRIC.name
+
+    context_imperial = copy.deepcopy(context_metric)
+    context_imperial["unit_system"] = UnitSystem.IMPERIAL.name
+
+    return context_metric, context_imperial
+
+
+def get_ranking_contexts(
+    areas: List[Area],
+    area_forecasts: List[List[Forecast]],
+    area_stores: Optional[List[List[ForecastStore]]] = None,
+) -> List[Dict[str, Any]]:
+    """Returns the context of the ranking of places over each window in the config.
+
+    Stores already aggregated for the places of an area in area_stores are reused, areas without
+    stores are aggregated once for every window.
+    """
+    stores = get_area_stores(area_forecasts, area_stores)
+    hours = DayPart("Ranking", *RANKING_HOURS)
+    now = dt.datetime.now(dt.timezone.utc)
+    return [
+        get_ranking_context(
+            areas,
+            window,
+            rank_places(areas, area_forecasts, window, RANKING_SIZE, hours, stores, now),
+        )
+        for window in RANKING_WINDOWS
+    ]
+
+
+def get_ranking_page_context(
+    areas: List[Area], ranking_contexts: List[Dict[str, Any]]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     context_metric = get_navbar_context(areas)
     context_metric["nav_links"][len(areas)]["is_active"] = True
     context_metric["units_nav_link"] = context_metric["nav_links"][len(areas)]
-    context_metric["unit_system"] = UnitSystem.METRIC.name
+    context_metric["hours"] = DayPart("Ranking", *RANKING_HOURS)
 
     context_imperial = copy.deepcopy(context_metric)
+    context_metric["rankings"] = convert_units_of(ranking_contexts, UnitSystem.METRIC)
+    context_metric["unit_system"] = UnitSystem.METRIC.name
+    context_imperial["rankings"] = convert_units_of(ranking_contexts, UnitSystem.IMPERIAL)
     context_imperial["unit_system"] = UnitSystem.IMPERIAL.name
 
     return context_metric, context_imperial
 
 
-def render_html_pages(areas: List[Area], area_forecasts: List[List[Forecast]]):
-    """Renders all HTML pages, saving them to the pages folder"""
+def get_forecast_page_hashes(
+    areas: List[Area],
+    area_forecasts: List[List[Forecast]],
+    sources_hash: str,
+    area_indices: Optional[Collection[int]] = None,
+) -> Dict[int, str]:
+    """Returns a hash of the inputs of each area's forecast page indexed by area index.
+
+    Covers the forecast data and coordinates of its places, the areas in the navbar, the day parts,
+    the current date in the area and the templates and code the page is rendered with, but not the
+    unit system. If area_indices is given only the pages of the areas at those indices are hashed.
+    """
+    area_names = [area.name for area in areas]
+    forecast_hashes: Dict[int, str] = {}
+
+    page_hashes: Dict[int, str] = {}
+    for i, (area, place_forecasts) in enumerate(zip(areas, area_forecasts)):
+        if area_indices is not None and i not in area_indices:
+            continue
+
+        place_hashes = []
+        for forecast in place_forecasts:
+            # Places in the same grid cell share their data, only hash it once
+            if id(forecast.json) not in forecast_hashes:
+                forecast_hashes[id(forecast.json)] = get_forecast_hash(forecast)
+            place_hashes.append(
+                (
+                    forecast.place.name,
+                    forecast.place.coordinates,
+                    forecast_hashes[id(forecast.json)],
+                )
+            )
+
+        page_hashes[i] = hash_of(
+            sources_hash,
+            area_names,
+            DAY_PARTS,
+            area.name,
+            area.time_zone,
+            dt.datetime.now(area.time_zone).date(),
+            place_hashes,
+        )
+
+    return page_hashes
+
+
+class PageJob:
+    """A page to render, small enough to send to a render worker process.
+
+    Attributes:
+        file_path: Path to write the page to.
+        template_name: Name of the template to render.
+        context: Context to render the template with.
+        unit_system: Unit system to convert the context to before rendering, if it is a forecast
+            page context that has not been converted yet.
+        fragments_path: Directory to write the hourly forecast fragments of the places in a
+            forecast page context to, if any.
+    """
+
+    def __init__(
+        self,
+        file_path: pathlib.Path,
+        template_name: str,
+        context: Dict[str, Any],
+        unit_system: Optional[UnitSystem] = None,
+        fragments_path: Optional[pathlib.Path] = None,
+    ):
+        """Create a PageJob object.
+
+        Args:
+            file_path: Path to write the page to.
+            template_name: Name of the template to render.
+            context: Context to render the template with.
+            unit_system: Unit system to convert the context to before rendering.
+            fragments_path: Optional; Directory to write hourly forecast fragments to, requires
+                unit_system.
+        """
+        if fragments_path is not None and unit_system is None:
+            raise ValueError("Hourly forecast fragments require a unit system")
+
+        self.file_path = file_path
+        self.template_name = template_name
+        self.context = context
+        self.unit_system = unit_system
+        self.fragments_path = fragments_path
+
+    def __repr__(self) -> str:
+        return f"PageJob({self.file_path}, {self.template_name})"
+
+    def render(
+        self, env: jinja.Environment, options: OutputOptions = OutputOptions()
+    ) -> OutputSizes:
+        """Renders the page, streaming it to file rather than holding all of it in memory.
+
+        Returns:
+            The sizes of what was written, including any fragments.
+        """
+        context = self.context
+        if self.unit_system is not None:
+            context = get_unit_system_context(context, self.unit_system)
+        sizes = write_output(
+            self.file_path, env.get_template(self.template_name).generate(context), options
+        )
+        if self.fragments_path is not None and self.unit_system is not None:
+            sizes = total_sizes(
+                [sizes, write_fragments(context, self.unit_system, self.fragments_path, options)]
+            )
+        return sizes
+
+
+def _init_render_worker(static_urls: Optional[Dict[str, str]], options: OutputOptions):
+    global _worker_env, _worker_options
+    _worker_env = get_template_environment(static_urls=static_urls)
+    _worker_options = options
+
+
+def _render_in_worker(job: PageJob) -> OutputSizes:
+    assert _worker_env is not None, "Render worker was not initialised"
+    return job.render(_worker_env, _worker_options)
+
+
+def render_pages(
+    jobs: Iterable[PageJob],
+    processes: int = 1,
+    options: OutputOptions = OutputOptions(),
+    static_urls: Optional[Dict[str, str]] = None,
+) -> OutputSizes:
+    """Renders pages, across a pool of processes if processes is more than one.
+
+    Each worker loads the templates once and writes the pages it renders itself, only the jobs are
+    sent between processes. Jobs are taken from jobs as they are rendered, at most two for each
+    process are waiting at a time, so jobs can be made as they are needed rather than all at once.
+
+    Args:
+        jobs: Pages to render.
+        processes: Optional; Number of processes to render across.
+        options: Optional; Whether to minify and compress the pages.
+        static_urls: Optional; URLs of hashed copies of static assets, see
+            `get_template_environment`.
+
+    Returns:
+        The total sizes of what was written.
+    """
+    if processes < 1:
+        raise ValueError("Number of render processes must be at least 1")
+
+    if processes == 1:
+        env = get_template_environment(static_urls=static_urls)
+        return total_sizes(job.render(env, options) for job in jobs)
+
+    sizes: List[OutputSizes] = []
+    pending: Deque[concurrent.futures.Future] = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_render_worker,
+        initargs=(static_urls, options),
+    ) as executor:
+        for job in jobs:
+            if len(pending) >= 2 * processes:
+                sizes.append(pending.popleft().result())
+            pending.append(executor.submit(_render_in_worker, job))
+        sizes.extend(future.result() for future in pending)
+    return total_sizes(sizes)
+
+
+def render_html_pages(
+    areas: List[Area],
+    area_forecasts: List[List[Forecast]],
+    area_indices: Optional[Collection[int]] = None,
+    manifest: Optional[RenderManifest] = None,
+    processes: int = 1,
+    metrics: Optional[RunMetrics] = None,
+    dryness_model: Optional[DrynessModel] = None,
+    output_options: OutputOptions = OutputOptions(),
+    static_urls: Optional[Dict[str, str]] = None,
+):
+    """Renders all HTML pages, saving them to the pages folder
+
+    If area_indices is given only the forecast pages for the areas at those indices are rendered.
+    If a manifest is given pages whose inputs have not changed since they were last rendered are
+    skipped, the manifest is then updated and saved. Pages are rendered across a pool of processes
+    if processes is more than one. If metrics is given each phase of rendering is timed and the
+    pages rendered are recorded in it. Rock dryness is carried on from the states in dryness_model
+    if it is given, which is then saved, otherwise places start out dry. Pages and data files are
+    minified and compressed as set by output_options, pages refer to the hashed copies of static
+    assets in static_urls if it is given.
+    """
+
+    def phase(name: str) -> ContextManager[None]:
+        return metrics.phase(name) if metrics is not None else contextlib.nullcontext()
 
     webpages_path = pathlib.Path("./pages/")
     if not webpages_path.is_dir():
         webpages_path.mkdir(parents=True)
 
-    env = jinja.Environment(
-        loader=jinja.FileSystemLoader("./dryrock/reports/templates"),
-        autoescape=jinja.select_autoescape(),  # Enable auto escaping.
-        trim_blocks=True,  # Stops blocks from rendering a blank line.
-        lstrip_blocks=True,  # Strips whitespace from in front of a block.
-    )
-
-    forecast_page_template = env.get_template("forecast_page.html.j2")
-    index_template = env.get_template("index.html.j2")
-    news_template = env.get_template("news.html.j2")
+    unit_systems = [UnitSystem.METRIC, UnitSystem.IMPERIAL]
+    forecast_page_paths = [
+        {
+            UnitSystem.METRIC: webpages_path.joinpath(f"{sanitize_name(area.name)}_metric.html"),
+            UnitSystem.IMPERIAL: webpages_path.joinpath(
+                f"{sanitize_name(area.name)}_imperial.html"
+            ),
+        }
+        for area in areas
+    ]
+    index_page_paths = {
+        UnitSystem.METRIC: webpages_path.joinpath("index.html"),
+        UnitSystem.IMPERIAL: webpages_path.joinpath("index_imperial.html"),
+    }
+    news_page_paths = {
+        UnitSystem.METRIC: webpages_path.joinpath("news_metric.html"),
+        UnitSystem.IMPERIAL: webpages_path.joinpath("news_imperial.html"),
+    }
+    ranking_page_paths = {
+        UnitSystem.METRIC: webpages_path.joinpath("driest_crags_metric.html"),
+        UnitSystem.IMPERIAL: webpages_path.joinpath("driest_crags_imperial.html"),
+    }
+    ranking_data_path = webpages_path.joinpath("driest_crags.json")
+
+    # Hash the inputs of every page, pages with unchanged inputs are skipped
+    page_hashes: Dict[pathlib.Path, str] = {}
+    if manifest is not None:
+        with phase("hash_inputs"):
+            sources_hash = hash_of(
+                get_render_sources_hash(pathlib.Path(__file__).parent),
+                list(output_options),
+                sorted((static_urls or {}).items()),
+            )
+            area_names = [area.name for area in areas]
+            forecast_page_hashes = get_forecast_page_hashes(
+                areas, area_forecasts, sources_hash, area_indices
+            )
+            for unit_system in unit_systems:
+                for i, page_hash in forecast_page_hashes.items():
+                    page_hashes[forecast_page_paths[i][unit_system]] = hash_of(
+                        page_hash, unit_system.name
+                    )
+                for page_paths in (index_page_paths, news_page_paths):
+                    page_path = page_paths[unit_system]
+                    page_hashes[page_path] = hash_of(
+                        sources_hash, area_names, page_path.name, unit_system.name
+                    )
+                # The ranking also changes with the forecast of any place, see below
+                page_path = ranking_page_paths[unit_system]
+                page_hashes[page_path] = hash_of(
+                    sources_hash,
+                    area_names,
+                    page_path.name,
+                    unit_system.name,
+                    RANKING_WINDOWS,
+                    RANKING_SIZE,
+                    RANKING_HOURS,
+                    [dt.datetime.now(area.time_zone).date() for area in areas],
+                )
 
-    forecast_page_contexts_metric = get_forecast_page_contexts(
-        areas, area_forecasts, UnitSystem.METRIC
-    )
-    forecast_page_contexts_imperial = get_forecast_page_contexts(
-        areas, area_forecasts, UnitSystem.IMPERIAL
+    def is_stale(page_path: pathlib.Path) -> bool:
+        return manifest is None or not manifest.is_current(page_path, page_hashes[page_path])
+
+    rendered_indices = [
+        i
+        for i in range(len(areas))
+        if (area_indices is None or i in area_indices)
+        and any(is_stale(forecast_page_paths[i][unit_system]) for unit_system in unit_systems)
+    ]
+    rendered_index_set = set(rendered_indices)
+    # Forecasts only change along with the pages of their areas
+    is_ranking_stale = len(rendered_indices) > 0 or any(
+        is_stale(ranking_page_paths[unit_system]) for unit_system in unit_systems
     )
 
-    index_context_metric, index_context_imperial = get_index_page_context(areas)
-    news_context_metric, news_context_imperial = get_news_page_context(areas)
-
-    # Note the encoding method, this returns a bytes string so these need to be written to files in
-    # bytes mode
-    forecast_page_outputs_metric: List[bytes] = []
-    for context in forecast_page_contexts_metric:
-        forecast_page_outputs_metric.append(forecast_page_template.render(context).encode("utf8"))
-    forecast_page_outputs_imperial: List[bytes] = []
-    for context in forecast_page_contexts_imperial:
-        forecast_page_outputs_imperial.append(forecast_page_template.render(context).encode("utf8"))
-    index_output_metric = index_template.render(index_context_metric).encode("utf8")
-    index_output_imperial = index_template.render(index_context_imperial).encode("utf8")
-    news_output_metric = news_template.render(news_context_metric).encode("utf8")
-    news_output_imperial = news_template.render(news_context_imperial).encode("utf8")
+    with phase("aggregate"):
+        # Forecasts are aggregated once, each unit system is then a conversion of the same contexts
+        area_stores = [
+            (
+                [ForecastStore(forecast.data) for forecast in place_forecasts]
+                if i in rendered_index_set
+                else []
+            )
+            for i, place_forecasts in enumerate(area_forecasts)
+        ]
 
-    for i, area in enumerate(areas):
-        file_path_metric = webpages_path.joinpath(f"{sanitize_name(area.name)}_metric.html")
-        with open(file_path_metric, "wb") as file:
-            file.write(forecast_page_outputs_metric[i])
-        file_path_imperial = webpages_path.joinpath(f"{sanitize_name(area.name)}_imperial.html")
-        with open(file_path_imperial, "wb") as file:
-            file.write(forecast_page_outputs_imperial[i])
-
-    index_file_path_metric = webpages_path.joinpath("index.html")
-    with open(index_file_path_metric, "wb") as file:
-        file.write(index_output_metric)
-    index_file_path_imperial = webpages_path.joinpath("index_imperial.html")
-    with open(index_file_path_imperial, "wb") as file:
-        file.write(index_output_imperial)
-
-    news_file_path_metric = webpages_path.joinpath("news_metric.html")
-    with open(news_file_path_metric, "wb") as file:
-        file.write(news_output_metric)
-    news_file_path_imperial = webpages_path.joinpath("news_imperial.html")
-    with open(news_file_path_imperial, "wb") as file:
-        file.write(news_output_imperial)
+        # Dryness of every rendered place is updated at once
+        if dryness_model is None:
+            dryness_model = DrynessModel()
+        rendered_forecasts = [area_forecasts[i] for i in rendered_indices]
+        dryness_scores = dryness_model.update(
+            [
+                forecast.file_name
+                for place_forecasts in rendered_forecasts
+                for forecast in place_forecasts
+            ],
+            [store for i in rendered_indices for store in area_stores[i]],
+            dt.datetime.now(dt.timezone.utc),
+        )
+        area_dryness: List[List[np.ndarray]] = [[] for _ in areas]
+        start = 0
+        for i in rendered_indices:
+            end = start + len(area_stores[i])
+            area_dryness[i] = dryness_scores[start:end]
+            start = end
+        dryness_model.save()
+
+        if is_ranking_stale:
+            ranking_contexts = get_ranking_contexts(areas, area_forecasts, area_stores)
+            data_sizes = write_output(
+                ranking_data_path,
+                [json.dumps(get_ranking_data(ranking_contexts), indent=2) + "\n"],
+                output_options,
+                is_html=False,
+            )
+            ranking_context_metric, ranking_context_imperial = get_ranking_page_context(
+                areas, ranking_contexts
+            )
+
+    # Pages are streamed to file as they are rendered, writing is part of this phase
+    with phase("render"):
+        stale_forecast_pages = [
+            (
+                i,
+                [
+                    unit_system
+                    for unit_system in unit_systems
+                    if is_stale(forecast_page_paths[i][unit_system])
+                ],
+            )
+            for i in rendered_indices
+        ]
+        nav_bar_context = get_navbar_context(areas)
+
+        def forecast_page_jobs() -> Iterator[PageJob]:
+            # Contexts are built in this process as the pages of each area are rendered, so only
+            # a few are held at once. Both unit systems are converted from the same context.
+            for i, stale_unit_systems in stale_forecast_pages:
+                context = get_forecast_page_context(
+                    areas[i], i, area_forecasts[i], area_stores[i], nav_bar_context, area_dryness[i]
+                )
+                for unit_system in stale_unit_systems:
+                    yield PageJob(
+                        forecast_page_paths[i][unit_system],
+                        "forecast_page.html.j2",
+                        context,
+                        unit_system,
+                        webpages_path.joinpath("hourly", sanitize_name(areas[i].name)),
+                    )
+
+        other_jobs: List[PageJob] = []
+        index_context_metric, index_context_imperial = get_index_page_context(areas)
+        news_context_metric, news_context_imperial = get_news_page_context(areas)
+        for page_path, template_name, context in (
+            (index_page_paths[UnitSystem.METRIC], "index.html.j2", index_context_metric),
+            (index_page_paths[UnitSystem.IMPERIAL], "index.html.j2", index_context_imperial),
+            (news_page_paths[UnitSystem.METRIC], "news.html.j2", news_context_metric),
+            (news_page_paths[UnitSystem.IMPERIAL], "news.html.j2", news_context_imperial),
+        ):
+            if is_stale(page_path):
+                other_jobs.append(PageJob(page_path, template_name, context))
+        if is_ranking_stale:
+            other_jobs.append(
+                PageJob(
+                    ranking_page_paths[UnitSystem.METRIC], "ranking.html.j2", ranking_context_metric
+                )
+            )
+            other_jobs.append(
+                PageJob(
+                    ranking_page_paths[UnitSystem.IMPERIAL],
+                    "ranking.html.j2",
+                    ranking_context_imperial,
+                )
+            )
+
+        sizes = render_pages(
+            itertools.chain(forecast_page_jobs(), other_jobs),
+            processes,
+            output_options,
+            static_urls,
+        )
+        if is_ranking_stale:
+            sizes = total_sizes([sizes, data_sizes])
+
+    rendered_paths = [
+        forecast_page_paths[i][unit_system]
+        for i, stale_unit_systems in stale_forecast_pages
+        for unit_system in stale_unit_systems
+    ] + [job.file_path for job in other_jobs]
+
+    skipped = len(page_hashes) - len(rendered_paths) if manifest is not None else 0
+    if metrics is not None:
+        metrics.record_pages(
+            len(rendered_paths),
+            skipped,
+            sizes.written,
+            bytes_rendered=sizes.rendered,
+            bytes_gzip=sizes.gzip,
+            bytes_brotli=sizes.brotli,
+        )
+        metrics.record_files(sizes.files_written, sizes.files_skipped)
+
+    if manifest is not None:
+        for page_path in rendered_paths:
+            manifest.record(page_path, page_hashes[page_path])
+        manifest.save()
+    logger.info(
+        f"Rendered {len(rendered_paths)} pages ({sizes.rendered} bytes, {sizes.written} written), "
+        f"{skipped} unchanged, wrote {sizes.files_written} files, {sizes.files_skipped} identical"
+    )
@@ -0,0 +1,94 @@
+"""Tracks the inputs each page was rendered from so unchanged pages can be skipped."""
+
+import hashlib
+import json
+import logging
+import pathlib
+from typing import Any, Dict
+
+from metno_locationforecast import Forecast
+
+logger = logging.getLogger(__name__)
+
+# Files that change what a page looks like, the templates and the code that builds their contexts
+RENDER_SOURCE_SUFFIXES = (".py", ".j2")
+
+
+class RenderManifest:
+    """Holds a hash of the inputs of every page as it was last rendered.
+
+    A page only needs rendering again when the hash of its current inputs differs from the one in
+    the manifest, or when the page itself is missing.
+
+    Attributes:
+        file_path: Path of the JSON file the manifest is saved to.
+        hashes: Input hashes indexed by page file name.
+    """
+
+    def __init__(self, file_path: str):
+        """Create a RenderManifest object.
+
+        Args:
+            file_path: Path of the JSON file the manifest is saved to.
+        """
+        self.file_path = pathlib.Path(file_path)
+        self.hashes: Dict[str, str] = {}
+
+    def __repr__(self) -> str:
+        return f"RenderManifest({self.file_path}, {len(self.hashes)} pages)"
+
+    def load(self) -> None:
+        """Loads the manifest from file, starting empty if there is no valid file."""
+        if not self.file_path.is_file():
+            return
+
+        try:
+            hashes = json.loads(self.file_path.read_text(encoding="utf8"))
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring invalid render manifest {self.file_path}")
+            return
+        if not isinstance(hashes, dict):
+            logger.warning(f"Ignoring invalid render manifest {self.file_path}")
+            return
+        self.hashes = hashes
+
+    def save(self) -> None:
+        if not self.file_path.parent.is_dir():
+            self.file_path.parent.mkdir(parents=True)
+        self.file_path.write_text(json.dumps(self.hashes, indent=2, sort_keys=True) + "\n")
+
+    def is_current(self, page_path: pathlib.Path, inputs_hash: str) -> bool:
+        """Returns True if the page exists and was rendered from inputs with the given hash."""
+        return self.hashes.get(page_path.name) == inputs_hash and page_path.is_file()
+
+    def record(self, page_path: pathlib.Path, inputs_hash: str) -> None:
+        self.hashes[page_path.name] = inputs_hash
+
+
+def hash_of(*inputs: Any) -> str:
+    """Returns a hex digest of the given inputs, which must be serialisable to JSON.
+
+    Dates, time zones and other values JSON does not support are hashed by their string form.
+    """
+    serialised = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialised.encode("utf8")).hexdigest()
+
+
+def get_forecast_hash(forecast: Forecast) -> str:
+    """Returns a hash of the forecast data.
+
+    Only the data returned by the API is hashed, the status code and headers change with every
+    request even when the forecast itself is not modified.
+    """
+    return hash_of(forecast.json["data"])
+
+
+def get_render_sources_hash(directory: pathlib.Path) -> str:
+    """Returns a hash of the contents of all templates and modules in directory."""
+    digest = hashlib.sha256()
+    for file_path in sorted(directory.rglob("*")):
+        if file_path.suffix not in RENDER_SOURCE_SUFFIXES or "__pycache__" in file_path.parts:
+            continue
+        digest.update(file_path.relative_to(directory).as_posix().encode("utf8"))
+        digest.update(file_path.read_bytes())
+    return digest.hexdigest()
@@ -0,0 +1,79 @@
+"""Loads the Jinja templates, from a precompiled bundle when there is an up to date one."""
+
+import logging
+import pathlib
+import shutil
+from typing import Dict, Optional
+
+import jinja2 as jinja
+
+from ..config import COMPILED_TEMPLATES_PATH
+from .render_manifest import get_render_sources_hash, hash_of
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_PATH = pathlib.Path(__file__).parent.joinpath("templates")
+
+# Written to the bundle alongside the compiled templates
+SOURCES_HASH_FILE = "sources_hash.txt"
+
+
+def get_templates_hash() -> str:
+    """Returns a hash of the template sources and the version of Jinja that compiles them."""
+    return hash_of(get_render_sources_hash(TEMPLATES_PATH), jinja.__version__)
+
+
+def is_bundle_current(compiled_path: pathlib.Path) -> bool:
+    """Returns True if the bundle at compiled_path was compiled from the current templates."""
+    hash_file_path = compiled_path.joinpath(SOURCES_HASH_FILE)
+    if not hash_file_path.is_file():
+        return False
+    return hash_file_path.read_text(encoding="utf8").strip() == get_templates_hash()
+
+
+def get_template_environment(
+    compiled_path: pathlib.Path = pathlib.Path(COMPILED_TEMPLATES_PATH),
+    static_urls: Optional[Dict[str, str]] = None,
+) -> jinja.Environment:
+    """Returns an environment that loads the templates.
+
+    Templates are loaded from the precompiled bundle at compiled_path if it was compiled from the
+    current template sources, otherwise they are compiled from source. Templates refer to static
+    assets through `static_url`, which gives the URL in static_urls for an asset if there is one,
+    such as a copy named with a hash of its content, and its own URL otherwise.
+    """
+    if is_bundle_current(compiled_path):
+        loader: jinja.BaseLoader = jinja.ModuleLoader(str(compiled_path))
+    else:
+        if compiled_path.is_dir():
+            logger.debug(f"Compiled templates in {compiled_path} are out of date, not using them")
+        loader = jinja.FileSystemLoader(TEMPLATES_PATH)
+
+    env = jinja.Environment(
+        loader=loader,
+        autoescape=jinja.select_autoescape(),  # Enable auto escaping.
+        trim_blocks=True,  # Stops blocks from rendering a blank line.
+        lstrip_blocks=True,  # Strips whitespace from in front of a block.
+    )
+    urls = static_urls if static_urls is not None else {}
+    env.globals["static_url"] = lambda url: urls.get(url, url)
+    return env
+
+
+def compile_templates(compiled_path: pathlib.Path = pathlib.Path(COMPILED_TEMPLATES_PATH)):
+    """Compiles the templates into a bundle of Python modules at compiled_path.
+
+    Does nothing if the bundle is already up to date.
+    """
+    if is_bundle_current(compiled_path):
+        logger.info(f"Compiled templates in {compiled_path} are up to date")
+        return
+
+    # Clear out modules of templates that have since been renamed or removed
+    if compiled_path.is_dir():
+        shutil.rmtree(compiled_path)
+
+    env = get_template_environment(compiled_path)
+    env.compile_templates(str(compiled_path), zip=None, ignore_errors=False)
+    compiled_path.joinpath(SOURCES_HASH_FILE).write_text(get_templates_hash() + "\n")
+    logger.info(f"Compiled templates to {compiled_path}")
@@ -0,0 +1,209 @@
+"""Scheduling of forecast refreshes around the expiry times of their data."""
+
+import datetime as dt
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, List, Optional, Set, Tuple
+
+import requests
+from metno_locationforecast import Forecast
+
+from .archive import ForecastArchive
+from .fetch import update_forecasts
+from .grid import GridCell
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerMetrics:
+    """Running statistics for a refresh scheduler.
+
+    Attributes:
+        refreshes: Number of forecast refreshes made.
+        queue_depth: Number of forecasts in the queue after the last refresh.
+        last_lag: Seconds between the last refreshed forecast becoming due and being refreshed.
+        max_lag: Largest lag seen, in seconds.
+        total_lag: Sum of all lags, in seconds.
+    """
+
+    def __init__(self):
+        self.refreshes = 0
+        self.queue_depth = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"SchedulerMetrics(refreshes={self.refreshes}, queue_depth={self.queue_depth}, "
+            f"mean_lag={self.mean_lag:.1f}, max_lag={self.max_lag:.1f})"
+        )
+
+    @property
+    def mean_lag(self) -> float:
+        return self.total_lag / self.refreshes if self.refreshes else 0.0
+
+    def record_refresh(self, lag: dt.timedelta):
+        lag_seconds = max(lag.total_seconds(), 0.0)
+        self.refreshes += 1
+        self.last_lag = lag_seconds
+        self.max_lag = max(self.max_lag, lag_seconds)
+        self.total_lag += lag_seconds
+
+
+class RefreshScheduler:
+    """Priority queue of grid cells ordered by the time their forecasts are next due a refresh.
+
+    Attributes:
+        metrics: Queue depth and refresh lag statistics.
+    """
+
+    def __init__(self):
+        # Entries are (refresh at, tie breaker, cell), the tie breaker stops cells from ever being
+        # compared.
+        self._queue: List[Tuple[dt.datetime, int, GridCell]] = []
+        self._counter = itertools.count()
+        self.metrics = SchedulerMetrics()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def schedule(self, cell: GridCell, refresh_at: dt.datetime):
+        heapq.heappush(self._queue, (refresh_at, next(self._counter), cell))
+        self.metrics.queue_depth = len(self._queue)
+
+    def next_refresh_at(self) -> dt.datetime | None:
+        """Returns the time the next cell is due, None if the queue is empty."""
+        return self._queue[0][0] if self._queue else None
+
+    def pop_due(self, now: dt.datetime) -> List[GridCell]:
+        """Removes and returns every cell due at or before now."""
+        due: List[GridCell] = []
+        while self._queue and self._queue[0][0] <= now:
+            refresh_at, _, cell = heapq.heappop(self._queue)
+            self.metrics.record_refresh(now - refresh_at)
+            due.append(cell)
+
+        self.metrics.queue_depth = len(self._queue)
+        return due
+
+
+def next_refresh_time(
+    forecast: Forecast, now: dt.datetime, retry_delay: dt.timedelta, failed: bool = False
+) -> dt.datetime:
+    """Returns when a forecast should next be refreshed.
+
+    This is when its data expires. If the refresh failed, or the data has no expiry time in the
+    future, it is `retry_delay` from now instead so that failures do not cause a busy loop.
+    """
+    if failed or not hasattr(forecast, "data") or forecast.data.expires <= now:
+        return now + retry_delay
+    return forecast.data.expires
+
+
+def refresh_due(
+    scheduler: RefreshScheduler,
+    now: dt.datetime,
+    max_concurrent_requests: int,
+    max_requests_per_second: float,
+    retry_delay: dt.timedelta,
+    archive: Optional[ForecastArchive] = None,
+    session: Optional[requests.Session] = None,
+) -> Set[int]:
+    """Refreshes the forecasts of cells that are due and schedules their next refresh.
+
+    New forecast data is appended to archive if it is given. Requests are made through session if
+    it is given.
+
+    Returns:
+        The indices of the areas with modified forecast data.
+    """
+    due = scheduler.pop_due(now)
+    if not due:
+        return set()
+
+    statuses = update_forecasts(
+        [cell.forecast for cell in due],
+        max_concurrent_requests,
+        max_requests_per_second,
+        archive=archive,
+        session=session,
+        return_exceptions=True,
+    )
+
+    modified_area_indices: Set[int] = set()
+    failures = 0
+    refreshed_at = dt.datetime.now(dt.timezone.utc)
+    for cell, status in zip(due, statuses):
+        failed = False
+        if isinstance(status, Exception):
+            failed = True
+            failures += 1
+            logger.error(
+                f"Failed to refresh {cell.forecast.place.name}, it will be retried", exc_info=status
+            )
+        elif status == "Data-Modified":
+            modified_area_indices.update(cell.area_indices)
+        cell.share_data()
+        scheduler.schedule(
+            cell, next_refresh_time(cell.forecast, refreshed_at, retry_delay, failed)
+        )
+
+    logger.info(
+        f"Refreshed {len(due)} forecasts, {failures} failed, "
+        f"{len(modified_area_indices)} areas modified, queue depth {len(scheduler)}, "
+        f"lag {scheduler.metrics.last_lag:.1f}s "
+        f"(mean {scheduler.metrics.mean_lag:.1f}s, max {scheduler.metrics.max_lag:.1f}s)"
+    )
+    return modified_area_indices
+
+
+def run_daemon(
+    cells: List[GridCell],
+    render_areas: Callable[[Set[int]], None],
+    max_concurrent_requests: int,
+    max_requests_per_second: float,
+    retry_delay: dt.timedelta,
+    archive: Optional[ForecastArchive] = None,
+    session: Optional[requests.Session] = None,
+):
+    """Keeps forecasts up to date, refreshing each one only once its data expires.
+
+    Forecasts should already have been updated once. After each refresh `render_areas` is called
+    with the indices of the areas whose data changed, a failed render is logged and the areas are
+    rendered again after their next refresh. New forecast data is appended to archive if
+    it is given. Requests are made through session if it is given, keeping connections open
+    between refreshes. Runs until interrupted.
+    """
+    scheduler = RefreshScheduler()
+    now = dt.datetime.now(dt.timezone.utc)
+    for cell in cells:
+        scheduler.schedule(cell, next_refresh_time(cell.forecast, now, retry_delay))
+
+    while True:
+        next_refresh_at = scheduler.next_refresh_at()
+        if next_refresh_at is None:
+            logger.warning("No forecasts to refresh, stopping")
+            return
+
+        wait = (next_refresh_at - dt.datetime.now(dt.timezone.utc)).total_seconds()
+        if wait > 0:
+            logger.debug(f"Next refresh at {next_refresh_at}, sleeping for {wait:.0f}s")
+            time.sleep(wait)
+
+        modified_area_indices = refresh_due(
+            scheduler,
+            dt.datetime.now(dt.timezone.utc),
+            max_concurrent_requests,
+            max_requests_per_second,
+            retry_delay,
+            archive,
+            session,
+        )
+        if modified_area_indices:
+            try:
+                render_areas(modified_area_indices)
+            except Exception:
+                logger.exception(f"Failed to render {len(modified_area_indices)} areas")
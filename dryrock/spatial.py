@@ -0,0 +1,310 @@
+"""Spatial index of places for finding those nearest to a point or within a distance of it."""
+
+import heapq
+import json
+import logging
+import math
+import pathlib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from metno_locationforecast import Place
+
+from .places import Area
+from .reports.helper_functions import sanitize_name
+from .reports.output import OutputSizes, total_sizes, write_output
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088  # mean radius
+LEAF_SIZE = 16  # most places in a leaf of the tree, they are checked all at once
+
+
+class Neighbour(NamedTuple):
+    """A place found by a query, given by its index in the indexed places."""
+
+    place_index: int
+    distance: float  # kilometres along the surface of the earth
+
+
+def to_unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Returns points on the unit sphere for coordinates in degrees, shape (points, 3)."""
+    latitudes = np.radians(latitudes)
+    longitudes = np.radians(longitudes)
+    return np.stack(
+        (
+            np.cos(latitudes) * np.cos(longitudes),
+            np.cos(latitudes) * np.sin(longitudes),
+            np.sin(latitudes),
+        ),
+        axis=-1,
+    )
+
+
+def chord_of(distance: float) -> float:
+    """Returns the straight line distance on the unit sphere of a distance in kilometres."""
+    return 2 * math.sin(min(distance / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def distance_of(chord: float) -> float:
+    """Returns the distance in kilometres of a straight line distance on the unit sphere."""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+class PlaceIndex:
+    """A k-d tree of places for nearest neighbour and radius queries.
+
+    Places are stored as points on the unit sphere, where straight line distances rise with
+    distances along the surface, so the tree needs no special cases at the poles or the
+    antimeridian. Each node of the tree holds the bounding box of its points, queries skip every
+    node whose box is further away than the places found so far and check the points of the
+    leaves they reach all at once.
+
+    Attributes:
+        places: The places indexed, queries return indices into this list.
+    """
+
+    def __init__(self, places: List[Place], leaf_size: int = LEAF_SIZE):
+        """Create a PlaceIndex object, building the tree.
+
+        Args:
+            places: Places to index.
+            leaf_size: Optional; Most places in a leaf of the tree.
+
+        Raises:
+            ValueError: If a place is missing coordinates.
+        """
+        if leaf_size < 1:
+            raise ValueError("Leaf size must be at least 1")
+        for place in places:
+            if place.coordinates["latitude"] is None or place.coordinates["longitude"] is None:
+                raise ValueError(f"{place} is missing coordinates")
+
+        self.places = places
+        self.leaf_size = leaf_size
+        points = to_unit_vectors(
+            np.array([place.coordinates["latitude"] for place in places], dtype=float),
+            np.array([place.coordinates["longitude"] for place in places], dtype=float),
+        ).reshape(-1, 3)
+
+        # Nodes are stored in lists indexed by node id, the root is node 0. Each node covers a
+        # range of the points in tree order, children split the range of their parent in two.
+        self._order = np.arange(len(places))
+        self._ranges: List[Tuple[int, int]] = []
+        self._boxes: List[Tuple[float, ...]] = []
+        self._children: List[Optional[Tuple[int, int]]] = []
+        if len(places) > 0:
+            self._build(points, 0, len(places))
+        self._points = points[self._order]
+
+    def __repr__(self) -> str:
+        return f"PlaceIndex({len(self)} places, {len(self._ranges)} nodes)"
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def _build(self, points: np.ndarray, start: int, end: int) -> int:
+        node = len(self._ranges)
+        node_points = points[self._order[start:end]]
+        lower, upper = node_points.min(axis=0), node_points.max(axis=0)
+        self._ranges.append((start, end))
+        self._boxes.append(tuple(lower.tolist() + upper.tolist()))
+        self._children.append(None)
+        if end - start <= self.leaf_size:
+            return node
+
+        # Split at the median of the widest dimension of the box
+        dimension = int(np.argmax(upper - lower))
+        middle = (end - start) // 2
+        partition = np.argpartition(node_points[:, dimension], middle)
+        self._order[start:end] = self._order[start:end][partition]
+        left = self._build(points, start, start + middle)
+        right = self._build(points, start + middle, end)
+        self._children[node] = (left, right)
+        return node
+
+    def _box_distance(self, node: int, x: float, y: float, z: float) -> float:
+        """Returns the squared straight line distance from a point to the box of a node."""
+        lower_x, lower_y, lower_z, upper_x, upper_y, upper_z = self._boxes[node]
+        distance = 0.0
+        for value, lower, upper in (
+            (x, lower_x, upper_x),
+            (y, lower_y, upper_y),
+            (z, lower_z, upper_z),
+        ):
+            if value < lower:
+                distance += (lower - value) ** 2
+            elif value > upper:
+                distance += (value - upper) ** 2
+        return distance
+
+    def _leaf_distances(self, node: int, point: np.ndarray) -> Tuple[range, List[float]]:
+        """Returns the tree positions and squared distances from a point of a leaf's points."""
+        start, end = self._ranges[node]
+        distances = ((self._points[start:end] - point) ** 2).sum(axis=1)
+        return range(start, end), distances.tolist()
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Neighbour]:
+        """Returns the k places nearest to a point, nearest first.
+
+        Raises:
+            ValueError: If k is less than 1.
+        """
+        if k < 1:
+            raise ValueError("Number of places must be at least 1")
+        if len(self) == 0:
+            return []
+
+        point = to_unit_vectors(np.array(latitude), np.array(longitude))
+        x, y, z = point.tolist()
+        # Nodes are visited nearest box first, found holds the nearest points so far with negated
+        # distances so that the furthest of them is at the top of the heap
+        nodes = [(0.0, 0)]
+        found: List[Tuple[float, int]] = []
+        while nodes:
+            box_distance, node = heapq.heappop(nodes)
+            if len(found) == k and box_distance >= -found[0][0]:
+                break
+            children = self._children[node]
+            if children is not None:
+                for child in children:
+                    heapq.heappush(nodes, (self._box_distance(child, x, y, z), child))
+                continue
+            for position, distance in zip(*self._leaf_distances(node, point)):
+                if len(found) < k:
+                    heapq.heappush(found, (-distance, position))
+                elif distance < -found[0][0]:
+                    heapq.heapreplace(found, (-distance, position))
+
+        nearest = sorted((-distance, position) for distance, position in found)
+        return [
+            Neighbour(int(self._order[position]), distance_of(math.sqrt(distance)))
+            for distance, position in nearest
+        ]
+
+    def within(self, latitude: float, longitude: float, radius: float) -> List[Neighbour]:
+        """Returns every place within radius kilometres of a point, nearest first."""
+        if len(self) == 0:
+            return []
+
+        point = to_unit_vectors(np.array(latitude), np.array(longitude))
+        x, y, z = point.tolist()
+        limit = chord_of(radius) ** 2
+        nodes = [0]
+        found: List[Tuple[float, int]] = []
+        while nodes:
+            node = nodes.pop()
+            if self._box_distance(node, x, y, z) > limit:
+                continue
+            children = self._children[node]
+            if children is not None:
+                nodes.extend(children)
+                continue
+            for position, distance in zip(*self._leaf_distances(node, point)):
+                if distance <= limit:
+                    found.append((distance, position))
+
+        return [
+            Neighbour(int(self._order[position]), distance_of(math.sqrt(distance)))
+            for distance, position in sorted(found)
+        ]
+
+
+def get_region_data(
+    areas: List[Area], area_index: int, place_index: PlaceIndex, nearby_places: int
+) -> Dict[str, Any]:
+    """Returns the data for the nearby places file of an area.
+
+    Lists the coordinates of every place in the area and the places nearest to each of them
+    across all areas, so a client only needs the file of the area the user is in.
+
+    Args:
+        areas: All areas, the places of place_index in order.
+        area_index: Index of the area to return the data of.
+        place_index: Index of the places of all areas.
+        nearby_places: Number of nearby places listed for each place.
+    """
+    place_areas = [i for i, area in enumerate(areas) for _ in area.places]
+    first_place = sum(len(area.places) for area in areas[:area_index])
+    area = areas[area_index]
+
+    places: List[Dict[str, Any]] = []
+    latitudes: List[float] = []
+    longitudes: List[float] = []
+    for j, place in enumerate(area.places):
+        latitude = float(place.coordinates["latitude"] or 0)
+        longitude = float(place.coordinates["longitude"] or 0)
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+        # The place itself is among the nearest, at no distance
+        neighbours = [
+            neighbour
+            for neighbour in place_index.nearest(latitude, longitude, nearby_places + 1)
+            if neighbour.place_index != first_place + j
+        ]
+        nearby = [
+            {
+                "name": place_index.places[neighbour.place_index].name,
+                "area_name": areas[place_areas[neighbour.place_index]].name,
+                "distance": round(neighbour.distance, 1),
+            }
+            for neighbour in neighbours[:nearby_places]
+        ]
+        places.append(
+            {
+                "name": place.name,
+                "latitude": latitude,
+                "longitude": longitude,
+                "altitude": place.coordinates["altitude"],
+                "nearby": nearby,
+            }
+        )
+
+    return {
+        "area_name": area.name,
+        "href_metric": f"/pages/{sanitize_name(area.name)}_metric.html",
+        "href_imperial": f"/pages/{sanitize_name(area.name)}_imperial.html",
+        "bounds": (
+            [min(latitudes), min(longitudes), max(latitudes), max(longitudes)] if places else None
+        ),
+        "places": places,
+    }
+
+
+def write_region_files(
+    areas: List[Area], place_index: PlaceIndex, output_path: str, nearby_places: int
+) -> OutputSizes:
+    """Writes the nearby places file of every area and a list of them to output_path.
+
+    The list, regions.json, holds the bounds of each area and the name of its file so a client can
+    pick the file of the area nearest the user. Files whose content has not changed are left as
+    they were.
+
+    Returns:
+        The sizes of the files and the number written and skipped.
+    """
+    path = pathlib.Path(output_path)
+    if not path.is_dir():
+        path.mkdir(parents=True)
+
+    regions = []
+    sizes: List[OutputSizes] = []
+    for i, area in enumerate(areas):
+        data = get_region_data(areas, i, place_index, nearby_places)
+        file_name = f"{sanitize_name(area.name)}.json"
+        sizes.append(
+            write_output(
+                path.joinpath(file_name), [json.dumps(data, indent=2) + "\n"], is_html=False
+            )
+        )
+        regions.append({"area_name": area.name, "file": file_name, "bounds": data["bounds"]})
+
+    sizes.append(
+        write_output(
+            path.joinpath("regions.json"),
+            [json.dumps({"regions": regions}, indent=2) + "\n"],
+            is_html=False,
+        )
+    )
+    logger.debug(f"Wrote nearby places of {len(areas)} areas to {path}")
+    return total_sizes(sizes)
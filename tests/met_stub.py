@@ -0,0 +1,177 @@
+"""A local stand-in for the MET Norway locationforecast API."""
+
+import datetime as dt
+import json
+import math
+import ssl
+import threading
+import time
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+FIXTURE_FILE = "./tests/test_data/lat53.271lon-6.107altitude95_compact.json"
+
+
+def shift_to_now(fixture: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns a copy of a saved forecast moved forward so that it starts at the current hour.
+
+    The copy is already expired so clients request it again every time they update.
+    """
+    now = dt.datetime.now(dt.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    timeseries = fixture["data"]["properties"]["timeseries"]
+    offset = now - dt.datetime.fromisoformat(timeseries[0]["time"].replace("Z", "+00:00"))
+
+    def shift(time_string: str) -> str:
+        time = dt.datetime.fromisoformat(time_string.replace("Z", "+00:00")) + offset
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    shifted = json.loads(json.dumps(fixture))
+    meta = shifted["data"]["properties"]["meta"]
+    meta["updated_at"] = shift(meta["updated_at"])
+    for interval in shifted["data"]["properties"]["timeseries"]:
+        interval["time"] = shift(interval["time"])
+    shifted["headers"]["Last-Modified"] = format_datetime(now, usegmt=True)
+    shifted["headers"]["Expires"] = format_datetime(now, usegmt=True)
+    return shifted
+
+
+class StubMetServer:
+    """Serves a recorded forecast payload for every request after an artificial delay.
+
+    Keeps track of the requests it receives so that tests can check how they were made. Connections
+    are kept alive between requests, as they are by the real API.
+
+    Attributes:
+        latency: Seconds to wait before responding to each request.
+        not_modified_ratio: Fraction of requests with an If-Modified-Since header that are answered
+            with 304 Not Modified, spread evenly over the requests.
+        base_url: URL to pass to `Forecast` objects as their base_url.
+        request_times: Monotonic times at which each request was received.
+        status_counts: Number of responses sent indexed by status code.
+        max_in_flight: The largest number of requests being handled at once.
+        connection_count: Number of connections opened to the server, each costs a TLS handshake
+            if the server uses TLS.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        fixture_file: str = FIXTURE_FILE,
+        not_modified_ratio: float = 0.0,
+        current: bool = False,
+        certificate: Optional[Tuple[str, str]] = None,
+    ):
+        """Create a StubMetServer object, call `start` to begin serving.
+
+        Args:
+            latency: Seconds to wait before responding to each request.
+            fixture_file: Saved forecast, in the format written by `Forecast.save`, to serve.
+            not_modified_ratio: Fraction of conditional requests to answer with 304 Not Modified.
+            current: Move the forecast forward to start at the current hour, see `shift_to_now`.
+            certificate: Paths of a certificate and its private key to serve over TLS with, plain
+                HTTP is served if it is not given.
+        """
+        if not 0 <= not_modified_ratio <= 1:
+            raise ValueError("not_modified_ratio must be between 0 and 1")
+
+        with open(fixture_file, "r", encoding="utf8") as file:
+            fixture: Dict[str, Any] = json.load(file)
+        if current:
+            fixture = shift_to_now(fixture)
+
+        self.latency = latency
+        self.not_modified_ratio = not_modified_ratio
+        self.body = json.dumps(fixture["data"]).encode("utf8")
+        self.last_modified: str = fixture["headers"]["Last-Modified"]
+        self.expires: str = fixture["headers"]["Expires"]
+        self.request_times: List[float] = []
+        self.status_counts: Dict[int, int] = {}
+        self.max_in_flight = 0
+        self.connection_count = 0
+        self._conditional_requests = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._scheme = "http"
+        if certificate is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(*certificate)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+            self._scheme = "https"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{self._scheme}://{host}:{port}/"
+
+    @property
+    def request_count(self) -> int:
+        return len(self.request_times)
+
+    def _is_not_modified(self, headers) -> bool:
+        """Returns True if a request with the given headers should get a 304 response."""
+        if "If-Modified-Since" not in headers:
+            return False
+
+        with self._lock:
+            n = self._conditional_requests
+            self._conditional_requests += 1
+        return math.floor((n + 1) * self.not_modified_ratio) > math.floor(
+            n * self.not_modified_ratio
+        )
+
+    def start(self) -> "StubMetServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, without this the body of a response on a
+            # kept alive connection waits on the client's delayed acknowledgement of the headers
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connection_count += 1
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.request_times.append(time.monotonic())
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+
+                try:
+                    time.sleep(stub.latency)
+                    status = 304 if stub._is_not_modified(self.headers) else 200
+                    self.send_response(status)
+                    self.send_header("Last-Modified", stub.last_modified)
+                    self.send_header("Expires", stub.expires)
+                    if status == 200:
+                        self.send_header("Content-Type", "application/json")
+                        self.send_header("Content-Length", str(len(stub.body)))
+                    self.end_headers()
+                    if status == 200:
+                        self.wfile.write(stub.body)
+                    with stub._lock:
+                        stub.status_counts[status] = stub.status_counts.get(status, 0) + 1
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
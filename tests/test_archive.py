@@ -0,0 +1,160 @@
+"""Tests for the forecast history archive."""
+
+import datetime as dt
+
+import numpy as np
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock.archive import HEADER, RECORD_DTYPE, ForecastArchive
+from dryrock.fetch import update_forecasts
+
+from .met_stub import StubMetServer
+
+START = dt.datetime(2020, 8, 5, tzinfo=dt.timezone.utc)
+
+
+@pytest.fixture
+def dalkey_forecast():
+    forecast = Forecast(
+        Place("Dalkey", 53.271, -6.107, 95), "dryrock-tests", save_location="./tests/test_data/"
+    )
+    forecast.load()
+    return forecast
+
+
+def test_append_and_query(tmp_path, dalkey_forecast: Forecast):
+    archive = ForecastArchive(str(tmp_path.joinpath("archive.bin")))
+
+    assert archive.append(dalkey_forecast) == 89
+    assert len(archive) == 89
+    assert tmp_path.joinpath("archive.bin").stat().st_size == len(HEADER) + 89 * 52
+
+    place_id = archive.get_place_id(dalkey_forecast)
+    assert place_id is not None
+    records = archive.query(place_id, START.replace(hour=12), START.replace(hour=15))
+    intervals = dalkey_forecast.data.intervals_between(
+        START.replace(hour=12), START.replace(hour=15)
+    )
+    assert len(records) == len(intervals) == 3
+    for record, interval in zip(records, intervals):
+        assert record["start_time"] == interval.start_time.timestamp()
+        assert record["hours"] == 1
+        assert record["issued_at"] == int(dalkey_forecast.data.updated_at.timestamp())
+        for name in ("air_temperature", "precipitation_amount", "wind_speed"):
+            assert record[name] == pytest.approx(interval.variables[name].value)
+
+    assert len(archive.query(place_id + 1, START, START + dt.timedelta(days=10))) == 0
+
+
+def test_max_hours(tmp_path, dalkey_forecast: Forecast):
+    archive = ForecastArchive(str(tmp_path.joinpath("archive.bin")), max_hours=6)
+
+    # Issued at 08:49, the first interval starts at 11:00
+    assert archive.append(dalkey_forecast) == 4
+
+
+def test_latest(tmp_path, dalkey_forecast: Forecast):
+    archive = ForecastArchive(str(tmp_path.joinpath("archive.bin")))
+    archive.append(dalkey_forecast)
+    first_records = archive.records.copy()
+
+    for interval in dalkey_forecast.data.intervals:
+        interval.variables["air_temperature"].value += 10
+    dalkey_forecast.data.updated_at += dt.timedelta(hours=1)
+    archive.append(dalkey_forecast)
+
+    # Reopening sees the records appended by both
+    archive = ForecastArchive(str(tmp_path.joinpath("archive.bin")))
+    place_id = archive.get_place_id(dalkey_forecast)
+    assert place_id is not None
+    end = START + dt.timedelta(days=10)
+    assert len(archive.query(place_id, START, end)) == 2 * 89
+
+    latest = archive.latest(place_id, START, end)
+    assert len(latest) == 89
+    assert np.all(np.diff(latest["start_time"]) > 0)
+    assert np.allclose(latest["air_temperature"], first_records["air_temperature"] + 10)
+
+
+def test_query_reads_only_matching_records(tmp_path, dalkey_forecast: Forecast):
+    archive = ForecastArchive(str(tmp_path.joinpath("archive.bin")))
+    fair_head = Forecast(
+        Place("Fair Head", 55.225, -6.154, 150), "dryrock-tests", save_location="./tests/test_data/"
+    )
+    fair_head.json = dalkey_forecast.json
+    fair_head.data = dalkey_forecast.data
+    for _ in range(3):
+        archive.append(dalkey_forecast)
+        archive.append(fair_head)
+        dalkey_forecast.data.updated_at += dt.timedelta(hours=1)
+
+    dalkey_id = archive.get_place_id(dalkey_forecast)
+    fair_head_id = archive.get_place_id(fair_head)
+    assert {dalkey_id, fair_head_id} == {0, 1}
+
+    start, end = START.replace(hour=14), START + dt.timedelta(days=2)
+    records = archive.records
+    for place_id in (dalkey_id, fair_head_id):
+        expected = records[
+            (records["place_id"] == place_id)
+            & (records["start_time"] >= start.timestamp())
+            & (records["start_time"] < end.timestamp())
+        ]
+        assert np.array_equal(archive.query(place_id, start, end), expected)
+    assert len(archive.query(dalkey_id, START - dt.timedelta(days=1), START)) == 0
+
+
+def test_place_table_and_index_persist(tmp_path, dalkey_forecast: Forecast):
+    file_path = tmp_path.joinpath("archive.bin")
+    ForecastArchive(str(file_path)).append(dalkey_forecast)
+    end = START + dt.timedelta(days=10)
+
+    archive = ForecastArchive(str(file_path))
+    place_id = archive.get_place_id(dalkey_forecast)
+    assert place_id == 0
+    assert len(archive.query(place_id, START, end)) == 89
+
+    # A missing index is rebuilt from the records
+    tmp_path.joinpath("archive.bin.index").unlink()
+    assert len(ForecastArchive(str(file_path)).query(place_id, START, end)) == 89
+
+
+def test_partial_record_removed(tmp_path, dalkey_forecast: Forecast):
+    file_path = tmp_path.joinpath("archive.bin")
+    ForecastArchive(str(file_path)).append(dalkey_forecast)
+    with open(file_path, "ab") as file:
+        file.write(b"\x00" * (RECORD_DTYPE.itemsize // 2))
+
+    archive = ForecastArchive(str(file_path))
+
+    assert len(archive) == 89
+    assert file_path.stat().st_size == len(HEADER) + 89 * RECORD_DTYPE.itemsize
+
+
+def test_rejects_other_files(tmp_path):
+    file_path = tmp_path.joinpath("archive.bin")
+    file_path.write_bytes(b"not an archive")
+
+    with pytest.raises(ValueError):
+        ForecastArchive(str(file_path))
+
+
+def test_update_forecasts_archives_new_data(tmp_path):
+    archive = ForecastArchive(str(tmp_path.joinpath("archive.bin")))
+    server = StubMetServer(not_modified_ratio=1.0, current=True).start()
+    try:
+        forecast = Forecast(
+            Place("Dalkey", 53.271, -6.107, 95),
+            "dryrock-tests",
+            save_location=str(tmp_path),
+            base_url=server.base_url,
+        )
+        for _ in range(2):
+            update_forecasts([forecast], 1, 100, archive=archive)
+    finally:
+        server.stop()
+
+    # The second request is answered with 304 Not Modified, nothing new to archive
+    assert server.status_counts == {200: 1, 304: 1}
+    assert len(archive) == 89
@@ -0,0 +1,14 @@
+"""Smoke tests that the benchmarks still run against the rest of the code."""
+
+from benchmarks import bench_render
+
+
+def test_bench_render(tmp_path, monkeypatch):
+    # Pages are written to ./pages
+    monkeypatch.chdir(tmp_path)
+    areas, area_forecasts = bench_render.make_areas(2)
+
+    for processes in (1, 2):
+        assert bench_render.time_render(areas, area_forecasts, processes) > 0
+
+    assert len(list(tmp_path.joinpath("pages").glob("area_*.html"))) == 4
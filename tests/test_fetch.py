@@ -0,0 +1,186 @@
+"""Tests for concurrent fetching of forecast data."""
+
+import datetime as dt
+import time
+from typing import List
+
+import pytest
+import requests
+from metno_locationforecast import Forecast, Place
+
+from dryrock.fetch import (
+    RateLimiter,
+    create_session,
+    fetch_forecast,
+    update_forecast,
+    update_forecasts,
+)
+from dryrock.metrics import RunMetrics
+
+from .met_stub import StubMetServer
+
+
+@pytest.fixture
+def stub_server():
+    server = StubMetServer(latency=0.2).start()
+    yield server
+    server.stop()
+
+
+def make_forecasts(number: int, base_url: str, save_location: str) -> List[Forecast]:
+    return [
+        Forecast(
+            Place(f"Place {i}", 53.0 + i / 10, -6.0, 100),
+            user_agent="dryrock-tests",
+            save_location=save_location,
+            base_url=base_url,
+        )
+        for i in range(number)
+    ]
+
+
+def test_rate_limiter_spaces_out_calls():
+    rate_limiter = RateLimiter(max_per_second=20)
+
+    start = time.monotonic()
+    for _ in range(5):
+        rate_limiter.wait()
+
+    # First call goes straight through, the remaining four are spaced 0.05 seconds apart
+    assert time.monotonic() - start >= 0.2
+
+
+def test_rate_limiter_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        RateLimiter(max_per_second=0)
+
+
+def test_update_forecasts_runs_concurrently(stub_server: StubMetServer, tmp_path):
+    forecasts = make_forecasts(6, stub_server.base_url, str(tmp_path))
+
+    start = time.monotonic()
+    statuses = update_forecasts(forecasts, max_concurrent_requests=3, max_requests_per_second=100)
+    duration = time.monotonic() - start
+
+    assert statuses == ["Data-Modified"] * 6
+    assert stub_server.request_count == 6
+    assert stub_server.max_in_flight <= 3
+    # Two rounds of three requests, sequentially this would take 1.2 seconds
+    assert duration < 1.0
+    for forecast in forecasts:
+        assert len(forecast.data.intervals) == 89
+
+
+def test_update_forecasts_respects_rate_limit(stub_server: StubMetServer, tmp_path):
+    forecasts = make_forecasts(4, stub_server.base_url, str(tmp_path))
+
+    update_forecasts(forecasts, max_concurrent_requests=4, max_requests_per_second=10)
+
+    # Requests start 0.1 seconds apart, individual gaps jitter with thread scheduling so check the
+    # span of all four
+    request_times = stub_server.request_times
+    assert request_times[-1] - request_times[0] >= 0.25
+
+
+def test_update_forecasts_records_metrics(stub_server: StubMetServer, tmp_path):
+    forecasts = make_forecasts(2, stub_server.base_url, str(tmp_path))
+    metrics = RunMetrics()
+
+    update_forecasts(
+        forecasts, max_concurrent_requests=2, max_requests_per_second=100, metrics=metrics
+    )
+
+    assert metrics.response_counts == {"200": 2}
+    assert metrics.bytes_downloaded == 2 * len(stub_server.body)
+    assert set(metrics.fetch_seconds) == {"Place 0", "Place 1"}
+    assert all(seconds >= 0.2 for seconds in metrics.fetch_seconds.values())
+
+
+def test_update_forecasts_skips_unexpired_data(stub_server: StubMetServer, tmp_path):
+    forecasts = make_forecasts(2, stub_server.base_url, str(tmp_path))
+    update_forecasts(forecasts, max_concurrent_requests=2, max_requests_per_second=100)
+    for forecast in forecasts:
+        forecast.data.expires = forecast.data.expires.replace(year=9999)
+
+    statuses = update_forecasts(forecasts, max_concurrent_requests=2, max_requests_per_second=100)
+
+    assert statuses == ["Data-Not-Expired"] * 2
+    assert stub_server.request_count == 2
+
+
+def test_update_forecasts_handles_not_modified(tmp_path):
+    server = StubMetServer(not_modified_ratio=0.5, current=True).start()
+    try:
+        forecasts = make_forecasts(4, server.base_url, str(tmp_path))
+        update_forecasts(forecasts, max_concurrent_requests=1, max_requests_per_second=100)
+
+        statuses = update_forecasts(
+            forecasts, max_concurrent_requests=1, max_requests_per_second=100
+        )
+    finally:
+        server.stop()
+
+    # Only the second round of requests is conditional, half of those are not modified
+    assert sorted(statuses) == ["Data-Modified"] * 2 + ["Data-Not-Modified"] * 2
+    assert server.status_counts == {200: 6, 304: 2}
+    for forecast in forecasts:
+        assert len(forecast.data.intervals) == 89
+        assert (
+            forecast.data.intervals[0].start_time.date() == dt.datetime.now(dt.timezone.utc).date()
+        )
+
+
+def test_session_reuses_connections(tmp_path):
+    server = StubMetServer(not_modified_ratio=1.0, current=True).start()
+    try:
+        forecasts = make_forecasts(6, server.base_url, str(tmp_path))
+        with create_session(max_connections=2) as session:
+            first = update_forecasts(forecasts, 2, 100, session=session)
+            second = update_forecasts(forecasts, 2, 100, session=session)
+    finally:
+        server.stop()
+
+    assert first == ["Data-Modified"] * 6
+    # The second round of requests carries If-Modified-Since from the saved data
+    assert second == ["Data-Not-Modified"] * 6
+    assert server.request_count == 12
+    assert server.connection_count <= 2
+    for forecast in forecasts:
+        assert len(forecast.data.intervals) == 89
+
+
+def test_fetch_forecast_times_out(tmp_path):
+    server = StubMetServer(latency=0.5).start()
+    try:
+        forecast = make_forecasts(1, server.base_url, str(tmp_path))[0]
+        with create_session(max_connections=1) as session:
+            with pytest.raises(requests.Timeout):
+                fetch_forecast(forecast, session, timeout=(1, 0.1))
+            assert fetch_forecast(forecast, session, timeout=(1, 2)) == "Data-Modified"
+    finally:
+        server.stop()
+
+
+class ErrorSession(requests.Session):
+    """Answers every request with the given status code without making it."""
+
+    def __init__(self, status_code: int):
+        super().__init__()
+        self.status_code = status_code
+
+    def get(self, url, **kwargs):
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.url = url
+        return response
+
+
+def test_update_forecast_logs_error_responses(tmp_path, caplog):
+    forecast = make_forecasts(1, "http://localhost/", str(tmp_path))[0]
+    metrics = RunMetrics()
+
+    with pytest.raises(requests.HTTPError):
+        update_forecast(forecast, RateLimiter(100), metrics, session=ErrorSession(503))
+
+    assert "Received 503 response for request to update Place 0 data" in caplog.text
+    assert metrics.response_counts == {"503": 1}
@@ -0,0 +1,152 @@
+"""Tests for the SQLite forecast cache."""
+
+import shutil
+
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock.forecast_cache import (
+    CachedForecast,
+    ForecastCache,
+    load_forecasts,
+    remove_legacy_files,
+)
+from dryrock.grid import group_into_cells
+
+from .met_stub import StubMetServer
+
+FIXTURE_FILE_NAME = "lat53.271lon-6.107altitude95_compact.json"
+
+
+def make_forecast(cache: ForecastCache, save_location: str, base_url: str = "http://localhost/"):
+    return CachedForecast(
+        Place("Dalkey", 53.271, -6.107, 95),
+        cache,
+        user_agent="dryrock-tests",
+        save_location=save_location,
+        base_url=base_url,
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ForecastCache(str(tmp_path.joinpath("cache.sqlite3")))
+    yield cache
+    cache.close()
+
+
+def test_save_and_load(cache: ForecastCache, tmp_path):
+    legacy = Forecast(
+        Place("Dalkey", 53.271, -6.107, 95), "dryrock-tests", save_location="./tests/test_data/"
+    )
+    legacy.load()
+    saved = make_forecast(cache, str(tmp_path))
+    saved.json = legacy.json
+
+    saved.save()
+    assert len(cache) == 1
+    assert not tmp_path.joinpath(FIXTURE_FILE_NAME).exists()
+
+    loaded = make_forecast(cache, str(tmp_path))
+    loaded.load()
+
+    assert loaded.json["data"] == legacy.json["data"]
+    assert loaded.data.last_modified == legacy.data.last_modified
+    assert loaded.data.expires == legacy.data.expires
+    assert loaded.data.updated_at == legacy.data.updated_at
+    assert [str(interval) for interval in loaded.data.intervals] == [
+        str(interval) for interval in legacy.data.intervals
+    ]
+    # Compressed data takes a fraction of the space of the JSON file
+    entry = cache.get(loaded.file_name)
+    assert entry is not None
+    assert len(entry.data) < len(legacy.json_string) / 5
+
+
+def test_load_without_saved_data(cache: ForecastCache, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        make_forecast(cache, str(tmp_path)).load()
+
+    # Files saved by earlier versions are not read
+    with pytest.raises(FileNotFoundError):
+        make_forecast(cache, "./tests/test_data/").load()
+
+
+def test_remove_legacy_files(tmp_path):
+    shutil.copy(f"./tests/test_data/{FIXTURE_FILE_NAME}", tmp_path)
+    tmp_path.joinpath("areas.json").write_text("{}")
+
+    assert remove_legacy_files(str(tmp_path)) == 1
+    assert [path.name for path in tmp_path.iterdir()] == ["areas.json"]
+    assert remove_legacy_files(str(tmp_path.joinpath("missing"))) == 0
+
+
+def test_load_forecasts(cache: ForecastCache, tmp_path):
+    uncached = Forecast(
+        Place("Dalkey", 53.271, -6.107, 95), "dryrock-tests", save_location="./tests/test_data/"
+    )
+    uncached.load()
+    saved = make_forecast(cache, str(tmp_path))
+    saved.json = uncached.json
+    saved.save()
+
+    forecasts = [make_forecast(cache, str(tmp_path)), uncached]
+    load_forecasts(forecasts, cache)
+
+    for forecast in forecasts:
+        assert len(forecast.data.intervals) == 89
+
+
+def test_update_saves_to_cache(cache: ForecastCache, tmp_path):
+    server = StubMetServer(not_modified_ratio=1.0, current=True).start()
+    try:
+        forecast = make_forecast(cache, str(tmp_path), server.base_url)
+        assert forecast.update() == "Data-Modified"
+
+        # A new forecast picks up the cached data and makes a conditional request
+        forecast = make_forecast(cache, str(tmp_path), server.base_url)
+        assert forecast.update() == "Data-Not-Modified"
+    finally:
+        server.stop()
+
+    assert server.status_counts == {200: 1, 304: 1}
+    assert list(tmp_path.glob("*.json")) == []
+    assert len(cache) == 1
+    assert len(forecast.data.intervals) == 89
+
+
+def test_group_into_cells_keeps_cache(cache: ForecastCache, tmp_path):
+    cells = group_into_cells([[make_forecast(cache, str(tmp_path))]], 0.01, 10)
+
+    assert isinstance(cells[0].forecast, CachedForecast)
+    assert cells[0].forecast.cache is cache
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_load_forecasts_in_parallel(cache: ForecastCache, tmp_path, processes: bool):
+    saved = Forecast(
+        Place("Dalkey", 53.271, -6.107, 95), "dryrock-tests", save_location="./tests/test_data/"
+    )
+    saved.load()
+    places = [Place(f"Crag {i}", 53.0 + i / 100, -6.107, 95) for i in range(4)]
+    for place in places:
+        forecast = CachedForecast(place, cache, user_agent="dryrock-tests")
+        forecast.json = saved.json
+        forecast.save()
+
+    forecasts = [
+        CachedForecast(place, cache, user_agent="dryrock-tests", save_location=str(tmp_path))
+        for place in places
+    ]
+    load_forecasts(forecasts, cache, workers=2, processes=processes)
+
+    for forecast in forecasts:
+        assert forecast.json["data"] == saved.json["data"]
+        assert [str(interval) for interval in forecast.data.intervals] == [
+            str(interval) for interval in saved.data.intervals
+        ]
+
+
+def test_load_forecasts_rejects_no_workers(cache: ForecastCache):
+    with pytest.raises(ValueError):
+        load_forecasts([], cache, workers=0)
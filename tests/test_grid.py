@@ -0,0 +1,64 @@
+"""Tests for grouping places into forecast grid cells."""
+
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock.grid import get_dedup_ratio, group_into_cells, snap
+
+
+def make_forecast(name: str, latitude: float, longitude: float, altitude: int) -> Forecast:
+    return Forecast(
+        Place(name, latitude, longitude, altitude),
+        user_agent="dryrock-tests",
+        save_location="./tests/test_data/",
+    )
+
+
+def test_snap():
+    assert snap(53.271, 0.01) == 53.27
+    assert snap(53.276, 0.01) == 53.28
+    assert snap(-6.107, 0.01) == -6.11
+    assert snap(53.2712, 0.0001) == 53.2712
+    assert snap(95, 10) == 100
+
+
+def test_group_into_cells():
+    dalkey = make_forecast("Dalkey Quarry", 53.271, -6.107, 95)
+    dalkey_east = make_forecast("Dalkey East Face", 53.2705, -6.1065, 98)
+    glendalough = make_forecast("Glendalough", 53.009, -6.387, 450)
+    dalkey_other_area = make_forecast("Dalkey Again", 53.2712, -6.1068, 102)
+
+    cells = group_into_cells([[dalkey, dalkey_east, glendalough], [dalkey_other_area]], 0.01, 10)
+
+    assert len(cells) == 2
+    assert cells[0].place_forecasts == [dalkey, dalkey_east, dalkey_other_area]
+    assert cells[0].area_indices == {0, 1}
+    assert cells[0].forecast.place.coordinates == {
+        "latitude": 53.27,
+        "longitude": -6.11,
+        "altitude": 100,
+    }
+    assert cells[0].forecast.place.name == "Dalkey Quarry / Dalkey East Face / Dalkey Again"
+    assert cells[1].place_forecasts == [glendalough]
+    assert cells[1].area_indices == {0}
+    assert get_dedup_ratio(cells) == 2.0
+
+
+def test_group_into_cells_rejects_zero_resolution():
+    with pytest.raises(ValueError):
+        group_into_cells([[make_forecast("Dalkey Quarry", 53.271, -6.107, 95)]], 0, 10)
+
+
+def test_share_data():
+    dalkey = make_forecast("Dalkey Quarry", 53.271, -6.107, 95)
+    dalkey_east = make_forecast("Dalkey East Face", 53.2705, -6.1065, 98)
+    # Resolution fine enough to keep the fixture's coordinates so the cell can load it
+    cell = group_into_cells([[dalkey]], 0.0001, 1)[0]
+    cell.place_forecasts.append(dalkey_east)
+
+    cell.forecast.load()
+    cell.share_data()
+
+    assert dalkey.data is cell.forecast.data
+    assert dalkey_east.data is cell.forecast.data
+    assert dalkey_east.place.name == "Dalkey East Face"
@@ -0,0 +1,85 @@
+"""Tests for collecting and reporting run metrics."""
+
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dryrock.metrics import RunMetrics
+
+
+def test_phase_records_times():
+    metrics = RunMetrics()
+
+    with metrics.phase("fetch"):
+        time.sleep(0.05)
+
+    assert metrics.phases["fetch"]["wall_seconds"] >= 0.05
+    assert metrics.phases["fetch"]["cpu_seconds"] < metrics.phases["fetch"]["wall_seconds"]
+
+
+def test_record_fetch_and_pages():
+    metrics = RunMetrics()
+
+    metrics.record_fetch("Dalkey Quarry", 0.2, 200, 1000)
+    metrics.record_fetch("Glendalough", 0.5, 304, 0)
+    metrics.record_fetch("Fair Head", 0.1, None, 0)
+    metrics.record_pages(rendered=3, skipped=5, bytes_written=300, bytes_rendered=400)
+
+    report = metrics.to_dict()
+    assert report["fetch"]["requests"] == 3
+    assert report["fetch"]["responses"] == {"200": 1, "304": 1, "error": 1}
+    assert report["fetch"]["bytes_downloaded"] == 1000
+    assert report["fetch"]["slowest"][0] == {"place": "Glendalough", "seconds": 0.5}
+    assert report["pages"] == {
+        "rendered": 3,
+        "skipped": 5,
+        "bytes_rendered": 400,
+        "bytes_written": 300,
+        "bytes_gzip": 0,
+        "bytes_brotli": 0,
+        "files_written": 0,
+        "files_skipped": 0,
+    }
+
+
+def test_record_pages_from_threads():
+    metrics = RunMetrics()
+    switch_interval = sys.getswitchinterval()
+    # Switching threads as often as possible makes lost updates likely without the lock
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(4000):
+                executor.submit(metrics.record_pages, 1, 1, 10)
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert (metrics.pages_rendered, metrics.pages_skipped) == (4000, 4000)
+    assert metrics.bytes_written == 40000
+
+
+def test_write_report(tmp_path):
+    metrics = RunMetrics()
+    with metrics.phase("render"):
+        metrics.record_pages(rendered=2, skipped=0, bytes_written=10)
+    file_path = tmp_path.joinpath("run_report.json")
+
+    metrics.write_report(str(file_path))
+
+    assert json.loads(file_path.read_text(encoding="utf8")) == metrics.to_dict()
+
+
+def test_to_prometheus():
+    metrics = RunMetrics()
+    with metrics.phase("render"):
+        pass
+    metrics.record_fetch('Crag "A"', 0.25, 200, 1000)
+
+    lines = metrics.to_prometheus().splitlines()
+
+    assert "# TYPE dryrock_phase_wall_seconds gauge" in lines
+    assert 'dryrock_fetch_seconds{place="Crag \\"A\\""} 0.25' in lines
+    assert 'dryrock_fetch_responses{status="200"} 1' in lines
+    assert "dryrock_fetch_downloaded_bytes 1000" in lines
+    assert "dryrock_pages_rendered 0" in lines
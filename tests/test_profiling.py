@@ -0,0 +1,89 @@
+"""Tests for profiling the phases of a run."""
+
+import json
+import pstats
+import time
+import tracemalloc
+
+import pytest
+
+from dryrock.metrics import RunMetrics
+from dryrock.profiling import (
+    COLLAPSED_STACKS_FILE,
+    MEMORY_REPORT_FILE,
+    MemoryProfiler,
+    PhaseProfiler,
+    Profiler,
+)
+
+
+def busy_wait(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_phase_profiler(tmp_path):
+    profiler = PhaseProfiler(str(tmp_path.joinpath("profiles")), sample_interval=0.001)
+    metrics = RunMetrics([profiler])
+
+    profiler.start()
+    with metrics.phase("aggregate"):
+        busy_wait(0.1)
+    with metrics.phase("render"):
+        pass
+    profiler.stop()
+
+    stats = pstats.Stats(str(profiler.output_path.joinpath("aggregate.pstats")))
+    assert any(function == "busy_wait" for _, _, function in stats.stats)  # type: ignore
+    assert profiler.output_path.joinpath("render.pstats").is_file()
+    assert "aggregate" in metrics.phases
+
+    stacks = profiler.output_path.joinpath(COLLAPSED_STACKS_FILE).read_text().splitlines()
+    busy_stacks = [line for line in stacks if "test_profiling.py:busy_wait" in line]
+    assert busy_stacks
+    for line in busy_stacks:
+        stack, count = line.rsplit(" ", 1)
+        assert stack.startswith("aggregate;")
+        assert int(count) > 0
+
+
+def allocate(size: int) -> bytearray:
+    return bytearray(size)
+
+
+def test_memory_profiler(tmp_path):
+    profiler = MemoryProfiler(str(tmp_path.joinpath("profiles")), top=5)
+    metrics = RunMetrics([profiler])
+
+    profiler.start()
+    with metrics.phase("aggregate"):
+        kept = allocate(4_000_000)
+    with metrics.phase("render"):
+        allocate(8_000_000)
+    profiler.stop()
+
+    assert len(kept) == 4_000_000
+    assert not tracemalloc.is_tracing()
+
+    report = json.loads(profiler.output_path.joinpath(MEMORY_REPORT_FILE).read_text())
+    aggregate, render = report["phases"]["aggregate"], report["phases"]["render"]
+    assert aggregate["current_bytes"] >= 4_000_000
+    assert "test_profiling.py" in aggregate["largest"][0]["site"]
+    assert aggregate["growth"][0]["bytes"] >= 4_000_000
+    # Freed by the end of the phase but still counted in its peak
+    assert render["current_bytes"] < 8_000_000
+    assert render["peak_bytes"] >= 12_000_000
+    assert report["peak_bytes"] == render["peak_bytes"]
+
+    snapshot = tracemalloc.Snapshot.load(str(profiler.output_path.joinpath("render.tracemalloc")))
+    assert snapshot.statistics("lineno")
+
+
+def test_profiler_requires_every_method():
+    class StartOnly(Profiler):
+        def start(self):
+            pass
+
+    with pytest.raises(TypeError):
+        StartOnly()
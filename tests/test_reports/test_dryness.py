@@ -0,0 +1,114 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock.reports.dryness import (
+    WETNESS_MAX,
+    DrynessModel,
+    WetnessState,
+    get_drying_rates,
+    get_dryness_scores,
+    get_wetness,
+)
+from dryrock.reports.forecast_store import ForecastStore
+
+
+@pytest.fixture
+def dalkey_store():
+    d_forecast = Forecast(
+        Place("Dalkey Quarry", 53.271, -6.107, 95), save_location="./tests/test_data/"
+    )
+    d_forecast.load()
+
+    return ForecastStore(d_forecast.data)
+
+
+def test_drying_rates():
+    rates = get_drying_rates(
+        np.array([100.0, 50.0, 50.0, 50.0, np.nan]),
+        np.array([0.0, 0.0, 5.0, 0.0, 0.0]),
+        np.array([0.0, 0.0, 0.0, 100.0, 0.0]),
+    )
+
+    assert rates[0] == 0
+    assert rates[2] > rates[1] > rates[3] > 0
+    assert rates[4] == 0
+
+
+def test_wetness():
+    rain = np.array([[5.0, 0.0, 0.0, 0.0, 0.5], [0.0, 0.0, 0.0, 0.0, 0.0]])
+    drying_rates = np.full(rain.shape, 0.5)
+    hours = np.ones(5)
+
+    wetness = get_wetness(np.array([0.0, 1.0]), rain, drying_rates, hours, np.array([0, 2]))
+
+    # Rain beyond what the rock holds runs off, it then dries steadily
+    assert wetness[0].tolist() == [WETNESS_MAX, 1.5, 1.0, 0.5, 1.0]
+    # The second place starts from its initial wetness at its start index
+    assert np.isnan(wetness[1, :2]).all()
+    assert wetness[1, 2:].tolist() == [0.5, 0.0, 0.0]
+    assert get_dryness_scores(wetness[0]).tolist() == [0, 25, 50, 75, 50]
+
+
+def test_update_is_incremental(dalkey_store: ForecastStore):
+    start_times = dalkey_store.start_times
+    now = dt.datetime.fromtimestamp(start_times[10], dt.timezone.utc)
+    later = dt.datetime.fromtimestamp(start_times[20], dt.timezone.utc)
+
+    model = DrynessModel()
+    model.states["dalkey"] = WetnessState(WETNESS_MAX, int(start_times[0]))
+    scores = model.update(["dalkey"], [dalkey_store], now)[0]
+    assert model.states["dalkey"].as_of == dalkey_store.end_times[10]
+
+    advanced_scores = model.update(["dalkey"], [dalkey_store], later)[0]
+
+    # Intervals already added to the state are not scored again, later ones are unchanged
+    assert np.isnan(advanced_scores[:11]).all()
+    assert np.array_equal(advanced_scores[11:], scores[11:])
+    assert model.states["dalkey"].as_of == dalkey_store.end_times[20]
+
+
+def test_update_dries_gap_before_forecast(dalkey_store: ForecastStore):
+    start_times = dalkey_store.start_times
+    now = dt.datetime.fromtimestamp(start_times[0], dt.timezone.utc)
+    model = DrynessModel()
+    model.states["current"] = WetnessState(WETNESS_MAX, int(start_times[0]))
+    model.states["paused"] = WetnessState(WETNESS_MAX, int(start_times[0]) - 3600)
+    model.states["stale"] = WetnessState(WETNESS_MAX, int(start_times[0]) - 30 * 24 * 3600)
+
+    current, paused, stale = model.update(["current", "paused", "stale"], [dalkey_store] * 3, now)
+
+    # Wetness is not carried across the gap as it was, the rock dries while no runs are made
+    assert current[0] < paused[0] < stale[0]
+    assert model.states["stale"].wetness < model.states["paused"].wetness
+
+
+def test_update_groups_places(dalkey_store: ForecastStore):
+    now = dt.datetime.fromtimestamp(dalkey_store.start_times[0], dt.timezone.utc)
+    model = DrynessModel()
+    model.states["wet"] = WetnessState(WETNESS_MAX, int(dalkey_store.start_times[0]))
+
+    dry_scores, wet_scores = model.update(["dry", "wet"], [dalkey_store, dalkey_store], now)
+
+    assert dry_scores[0] >= wet_scores[0]
+    assert not np.isnan(dry_scores).any()
+    with pytest.raises(ValueError):
+        model.update(["dry"], [], now)
+
+
+def test_save_and_load(tmp_path):
+    file_path = str(tmp_path.joinpath("output", "dryness_state.json"))
+    model = DrynessModel(file_path)
+    model.states["dalkey"] = WetnessState(1.25, 1596621600)
+    model.save()
+
+    loaded = DrynessModel(file_path)
+    loaded.load()
+    assert loaded.states == model.states
+
+    tmp_path.joinpath("output", "dryness_state.json").write_text("[1, 2]")
+    invalid = DrynessModel(file_path)
+    invalid.load()
+    assert invalid.states == {}
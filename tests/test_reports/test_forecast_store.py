@@ -0,0 +1,167 @@
+import datetime as dt
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock.places import Area
+from dryrock.reports.forecast_store import ForecastStore
+from dryrock.reports.helper_functions import (
+    DayPart,
+    get_colour_variant,
+    get_colour_variants,
+    max_humid_of,
+    max_temp_of,
+    max_wind_speed_of,
+    min_humid_of,
+    min_temp_of,
+    sum_rain,
+)
+from dryrock.reports.render_html import get_area_forecast_context
+
+DUBLIN = ZoneInfo("Europe/Dublin")
+DAYS = [dt.date(2020, 8, 5) + dt.timedelta(days=i) for i in range(11)]
+
+
+@pytest.fixture
+def dalkey_forecast():
+    dalkey = Place("Dalkey Quarry", 53.271, -6.107, 95)
+    d_forecast = Forecast(dalkey, save_location="./tests/test_data/")
+    d_forecast.load()
+
+    return d_forecast
+
+
+def test_index_matches_intervals_for(dalkey_forecast: Forecast):
+    store = ForecastStore(dalkey_forecast.data)
+
+    assert len(store) == len(dalkey_forecast.data.intervals)
+    for day in DAYS:
+        for tzinfo in (dt.timezone.utc, DUBLIN):
+            index = store.index_for(day, tzinfo)
+            assert dalkey_forecast.data.intervals[index] == dalkey_forecast.data.intervals_for(
+                day, tzinfo
+            )
+
+
+def test_aggregates_match_helper_functions(dalkey_forecast: Forecast):
+    store = ForecastStore(dalkey_forecast.data)
+
+    for day in DAYS:
+        intervals = dalkey_forecast.data.intervals_for(day, DUBLIN)
+        index = store.index_for(day, DUBLIN)
+        if len(intervals) == 0:
+            with pytest.raises(ValueError):
+                store.sum_rain(index)
+            continue
+
+        if all("precipitation_amount" in interval.variables for interval in intervals):
+            # Exact equality, not approximate, values must be added in the same order
+            assert store.sum_rain(index).value == sum_rain(intervals).value
+        assert store.max_temp_of(index) == max_temp_of(intervals)
+        assert store.min_temp_of(index) == min_temp_of(intervals)
+        assert store.max_wind_speed_of(index) == max_wind_speed_of(intervals)
+        assert store.max_humid_of(index) == max_humid_of(intervals)
+        assert store.min_humid_of(index) == min_humid_of(intervals)
+
+
+def test_rain_between_matches_sum_rain(dalkey_forecast: Forecast):
+    store = ForecastStore(dalkey_forecast.data)
+    start = dt.datetime(2020, 8, 5, 11, tzinfo=dt.timezone.utc)
+
+    for start_hour in range(0, 72, 5):
+        for hours in (1, 4, 6, 24, 30):
+            window_start = start + dt.timedelta(hours=start_hour)
+            window_end = window_start + dt.timedelta(hours=hours)
+            intervals = dalkey_forecast.data.intervals_between(window_start, window_end)
+            rain = store.rain_between(window_start, window_end)
+            if len(intervals) == 0:
+                assert rain is None
+            else:
+                assert rain.value == pytest.approx(sum_rain(intervals).value, abs=1e-9)
+
+
+def test_rain_between_without_rain_values(dalkey_forecast: Forecast):
+    store = ForecastStore(dalkey_forecast.data)
+
+    # Before the forecast starts
+    assert store.rain_between(dt.datetime(2020, 8, 4), dt.datetime(2020, 8, 5)) is None
+    # Includes the last interval which has no precipitation forecast
+    assert store.rain_between(dt.datetime(2020, 8, 14), dt.datetime(2020, 8, 15)) is None
+
+
+def test_day_part():
+    day_part = DayPart("Evening", 18, 24)
+
+    assert day_part.label == "18-24"
+    assert day_part.time_delta == dt.timedelta(hours=6)
+    assert day_part.window_for(dt.date(2020, 8, 5), DUBLIN) == (
+        dt.datetime(2020, 8, 5, 18, tzinfo=DUBLIN),
+        dt.datetime(2020, 8, 6, 0, tzinfo=DUBLIN),
+    )
+    with pytest.raises(ValueError):
+        DayPart("Backwards", 12, 6)
+
+
+def test_missing_variables_are_nan(dalkey_forecast: Forecast):
+    store = ForecastStore(dalkey_forecast.data)
+
+    # The last interval has no precipitation forecast
+    assert "precipitation_amount" not in dalkey_forecast.data.intervals[-1].variables
+    assert np.isnan(store.values["precipitation_amount"][-1])
+
+
+def test_get_colour_variants_matches_get_colour_variant(dalkey_forecast: Forecast):
+    intervals = [
+        interval
+        for interval in dalkey_forecast.data.intervals
+        if "precipitation_amount" in interval.variables
+    ]
+
+    for name in ("air_temperature", "wind_speed", "relative_humidity"):
+        values = np.array([interval.variables[name].value for interval in intervals])
+        expected = [get_colour_variant(interval.variables[name]) for interval in intervals]
+        assert get_colour_variants(name, values) == expected
+
+    values = np.array([interval.variables["precipitation_amount"].value for interval in intervals])
+    hours = np.array([interval.duration.total_seconds() / 3600 for interval in intervals])
+    expected = [
+        get_colour_variant(interval.variables["precipitation_amount"], interval.duration)
+        for interval in intervals
+    ]
+    assert get_colour_variants("precipitation_amount", values, hours) == expected
+
+
+def test_area_forecast_context_matches_helper_functions(dalkey_forecast: Forecast):
+    area = Area("Ireland", "Europe/Dublin", [dalkey_forecast.place])
+    days = DAYS[1:8]
+    day_parts = [DayPart("Morning", 6, 12), DayPart("Climbing hours", 9, 18)]
+
+    context = get_area_forecast_context(
+        area,
+        [dalkey_forecast],
+        [ForecastStore(dalkey_forecast.data)],
+        days,
+        day_parts,
+    )
+
+    for day in days:
+        intervals = dalkey_forecast.data.intervals_for(day, DUBLIN)
+        forecast = context["forecasts"]["Dalkey Quarry"][day]
+        assert forecast["total_rain"].value == sum_rain(intervals).value
+        assert forecast["max_temp"] == max_temp_of(intervals)
+        assert forecast["min_temp"] == min_temp_of(intervals)
+        assert forecast["min_humid"] == min_humid_of(intervals)
+        for day_part, day_part_context in zip(day_parts, forecast["day_parts"]):
+            expected = sum_rain(
+                dalkey_forecast.data.intervals_between(*day_part.window_for(day, DUBLIN))
+            )
+            assert day_part_context["rain"].value == pytest.approx(expected.value)
+        assert len(forecast["intervals"]) == len(intervals)
+        for interval_context, interval in zip(forecast["intervals"], intervals):
+            assert interval_context["start_time"] == interval.start_time
+            assert interval_context["temp"] == interval.variables["air_temperature"]
+            assert interval_context["rain_colour_variant"] == get_colour_variant(
+                interval.variables["precipitation_amount"], interval.duration
+            )
@@ -7,7 +7,11 @@ from metno_locationforecast.data_containers import Interval, Variable
 
 from dryrock.reports.helper_functions import (
     ColourVariant,
+    DisplayValue,
+    UnitSystem,
     cardinal_name_of,
+    change_units,
+    convert_units_of,
     _get_precipitation_colour_variant,  # type: ignore (use of private function outside of module)
     get_time_delta,
     get_time_delta_hours,
@@ -73,6 +77,61 @@ def test_max_wind_speed_of(dalkey_intervals_for_day: List[Interval]):
     assert max_wind_speed_of(dalkey_intervals_for_day) == expected
 
 
+def test_change_units_matches_convert_to(dalkey_intervals_for_day: List[Interval]):
+    expected_units = {
+        UnitSystem.METRIC: {"air_temperature": "celsius", "wind_speed": "km/h"},
+        UnitSystem.IMPERIAL: {"air_temperature": "fahrenheit", "wind_speed": "mph"},
+    }
+
+    for unit_system, units_by_name in expected_units.items():
+        for interval in dalkey_intervals_for_day:
+            for name, units in units_by_name.items():
+                variable = interval.variables[name]
+                expected = Variable(variable.name, variable.value, variable.units)
+                expected.convert_to(units)
+
+                assert change_units(variable, unit_system) == (name, expected.value, units)
+            humid = interval.variables["relative_humidity"]
+            assert change_units(humid, unit_system) == (humid.name, humid.value, humid.units)
+
+
+def test_change_units_rejects_unexpected_units():
+    with pytest.raises(ValueError):
+        change_units(Variable("air_temperature", 68.0, "kelvin"), UnitSystem.IMPERIAL)
+
+
+def test_convert_units_of():
+    day = dt.date(2020, 8, 7)
+    rain = Variable("precipitation_amount", 2.54, "mm")
+    context = {
+        day: {
+            "total_rain": rain,
+            "total_rain_colour_variant": "warning",
+            "intervals": [
+                {"temp": Variable("air_temperature", 20.0, "celsius")},
+                {"wind_speed": Variable("wind_speed", 10.0, "m/s")},
+            ],
+            "humid": Variable("relative_humidity", 80.0, "%"),
+        }
+    }
+
+    metric = convert_units_of(context, UnitSystem.METRIC)
+    imperial = convert_units_of(context, UnitSystem.IMPERIAL)
+
+    assert metric[day]["total_rain"] == DisplayValue("precipitation_amount", 2.54, "mm")
+    assert metric[day]["intervals"][1]["wind_speed"] == DisplayValue("wind_speed", 36.0, "km/h")
+    assert imperial[day]["total_rain"] == DisplayValue("precipitation_amount", 0.1, "inches")
+    assert imperial[day]["intervals"][0]["temp"] == DisplayValue(
+        "air_temperature", 68.0, "fahrenheit"
+    )
+    assert imperial[day]["intervals"][1]["wind_speed"] == DisplayValue("wind_speed", 22.37, "mph")
+    assert imperial[day]["humid"] == DisplayValue("relative_humidity", 80.0, "%")
+    assert imperial[day]["total_rain_colour_variant"] == "warning"
+    # The original is left unchanged
+    assert context[day]["total_rain"] is rain
+    assert rain == Variable("precipitation_amount", 2.54, "mm")
+
+
 def test_sanitize_name():
     name_1 = "easy"
     expected_1 = "easy"
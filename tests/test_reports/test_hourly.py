@@ -0,0 +1,98 @@
+import datetime as dt
+import json
+
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock.places import Area
+from dryrock.reports.forecast_store import ForecastStore
+from dryrock.reports.helper_functions import DayPart, UnitSystem
+from dryrock.reports.hourly import COLUMNS, get_fragment, write_fragments
+from dryrock.reports.render_html import (
+    PageJob,
+    get_area_forecast_context,
+    get_unit_system_context,
+    render_pages,
+)
+
+DAYS = [dt.date(2020, 8, 5) + dt.timedelta(days=i) for i in range(7)]
+
+
+@pytest.fixture
+def dalkey_context():
+    dalkey = Place("Dalkey Quarry", 53.271, -6.107, 95)
+    d_forecast = Forecast(dalkey, save_location="./tests/test_data/")
+    d_forecast.load()
+
+    area = Area("Ireland", "Europe/Dublin", [dalkey])
+    context = get_area_forecast_context(
+        area,
+        [d_forecast],
+        [ForecastStore(d_forecast.data)],
+        DAYS,
+        [DayPart("Day", 0, 24)],
+    )
+    context["unit_system"] = None
+    return context
+
+
+@pytest.mark.parametrize(
+    "unit_system, rain, temp", [(UnitSystem.METRIC, "mm", "°C"), (UnitSystem.IMPERIAL, "in", "°F")]
+)
+def test_fragment(dalkey_context, unit_system: UnitSystem, rain: str, temp: str):
+    context = get_unit_system_context(dalkey_context, unit_system)
+
+    fragment = get_fragment(context["forecasts"]["Dalkey Quarry"])
+
+    assert fragment["columns"] == COLUMNS
+    assert list(fragment["days"]) == [day.isoformat() for day in DAYS]
+    first_day = fragment["days"]["2020-08-05"]
+    assert len(first_day) == len(context["forecasts"]["Dalkey Quarry"][DAYS[0]]["intervals"])
+    for row in first_day:
+        assert len(row) == len(COLUMNS)
+    # Times are local, the first interval starts at 11:00 UTC
+    assert first_day[0][0] == ("12 - 13", None)
+    assert first_day[0][1][0].endswith(rain)
+    assert first_day[0][2][0].endswith(temp)
+
+
+def test_page_fetches_fragments(dalkey_context, tmp_path):
+    fragments_path = tmp_path.joinpath("hourly", "ireland")
+    page_path = tmp_path.joinpath("ireland_metric.html")
+    dalkey_context["index_nav_link"] = {"href_metric": "", "href_imperial": ""}
+    dalkey_context["nav_links"] = []
+    dalkey_context["units_nav_link"] = dalkey_context["index_nav_link"]
+
+    sizes = render_pages(
+        [
+            PageJob(
+                page_path,
+                "forecast_page.html.j2",
+                dalkey_context,
+                UnitSystem.METRIC,
+                fragments_path,
+            )
+        ]
+    )
+
+    fragment_path = fragments_path.joinpath("dalkey_quarry_metric.json")
+    assert sizes.written == page_path.stat().st_size + fragment_path.stat().st_size
+    page = page_path.read_text(encoding="utf8")
+    assert 'data-hourly="/pages/hourly/ireland/dalkey_quarry_metric.json"' in page
+    # Hourly values are only in the fragment
+    fragment = json.loads(fragment_path.read_text(encoding="utf8"))
+    assert fragment["days"]["2020-08-05"][0][2][0] not in page
+
+
+def test_fragments_require_unit_system(tmp_path):
+    with pytest.raises(ValueError):
+        PageJob(tmp_path.joinpath("page.html"), "forecast_page.html.j2", {}, None, tmp_path)
+
+
+def test_write_fragments(dalkey_context, tmp_path):
+    context = get_unit_system_context(dalkey_context, UnitSystem.IMPERIAL)
+
+    sizes = write_fragments(context, UnitSystem.IMPERIAL, tmp_path)
+
+    assert [path.name for path in tmp_path.iterdir()] == ["dalkey_quarry_imperial.json"]
+    assert sizes.written == tmp_path.joinpath("dalkey_quarry_imperial.json").stat().st_size
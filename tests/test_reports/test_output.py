@@ -0,0 +1,186 @@
+import gzip
+import os
+
+import pytest
+
+from dryrock.reports.output import (
+    OutputOptions,
+    OutputSizes,
+    copy_file,
+    hash_static_assets,
+    minify_html,
+    total_sizes,
+    write_output,
+)
+from dryrock.reports.template_environment import get_template_environment
+
+PAGE = """<!DOCTYPE html>
+<html>
+  <head>
+    <style>
+      td  { padding: 0; }
+    </style>
+  </head>
+  <body>
+    <p>Dry   rock
+       today</p>
+    <pre>  a
+    b  </pre>
+    <script>
+      const text = "two  spaces";
+    </script>
+  </body>
+</html>
+"""
+
+
+def test_minify_html():
+    html = minify_html(PAGE)
+
+    assert "<p>Dry rock\ntoday</p>" in html
+    assert "<body>\n<p>" in html
+    # Raw text elements are left as they are
+    assert "<pre>  a\n    b  </pre>" in html
+    assert 'const text = "two  spaces";' in html
+    assert "td  { padding: 0; }" in html
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_streamed_minify_matches_whole_page(tmp_path, chunk_size: int):
+    file_path = tmp_path.joinpath("page.html")
+    starts = range(0, len(PAGE), chunk_size)
+    chunks = [PAGE[start:][:chunk_size] for start in starts]
+
+    sizes = write_output(file_path, chunks, OutputOptions(minify=True))
+
+    assert file_path.read_text(encoding="utf8") == minify_html(PAGE)
+    assert sizes.rendered == len(PAGE.encode("utf8"))
+    assert sizes.written == file_path.stat().st_size < sizes.rendered
+
+
+def test_write_output_replaces_file_atomically(tmp_path):
+    file_path = tmp_path.joinpath("page.html")
+    file_path.write_text("<p>Old</p>", encoding="utf8")
+
+    def failing_chunks():
+        yield "<p>New"
+        raise RuntimeError("Render failed")
+
+    with pytest.raises(RuntimeError):
+        write_output(file_path, failing_chunks())
+
+    # The old page is left as it was and the partly written one is removed
+    assert file_path.read_text(encoding="utf8") == "<p>Old</p>"
+    assert [path.name for path in tmp_path.iterdir()] == ["page.html"]
+
+    write_output(file_path, ["<p>New", "</p>"])
+    assert file_path.read_text(encoding="utf8") == "<p>New</p>"
+    assert [path.name for path in tmp_path.iterdir()] == ["page.html"]
+
+
+def test_write_output_skips_unchanged_files(tmp_path):
+    file_path = tmp_path.joinpath("page.html")
+    assert write_output(file_path, ["<p>Dry</p>"]).files_written == 1
+    os.utime(file_path, (0, 0))
+
+    sizes = write_output(file_path, ["<p>", "Dry</p>"])
+
+    assert (sizes.files_written, sizes.files_skipped) == (0, 1)
+    assert sizes.written == file_path.stat().st_size
+    assert file_path.stat().st_mtime == 0
+    assert [path.name for path in tmp_path.iterdir()] == ["page.html"]
+
+    sizes = write_output(file_path, ["<p>Wet</p>"])
+
+    assert (sizes.files_written, sizes.files_skipped) == (1, 0)
+    assert file_path.read_text(encoding="utf8") == "<p>Wet</p>"
+
+
+def test_copy_file(tmp_path):
+    source_path = tmp_path.joinpath("index.html")
+    source_path.write_text("<p>Dry</p>")
+    file_path = tmp_path.joinpath("copy.html")
+
+    assert copy_file(source_path, file_path)
+    assert file_path.read_text() == "<p>Dry</p>"
+    assert not copy_file(source_path, file_path)
+
+
+def test_write_output_compressed(tmp_path):
+    file_path = tmp_path.joinpath("data.json")
+
+    sizes = write_output(file_path, ['{"a":  1}'], OutputOptions(minify=True, compress=True), False)
+
+    # Only HTML is minified
+    assert file_path.read_text(encoding="utf8") == '{"a":  1}'
+    gzip_path = tmp_path.joinpath("data.json.gz")
+    assert gzip.decompress(gzip_path.read_bytes()) == file_path.read_bytes()
+    assert sizes.gzip == gzip_path.stat().st_size
+    # Compressing the same content again gives the same bytes
+    first = gzip_path.read_bytes()
+    write_output(file_path, ['{"a":  1}'], OutputOptions(compress=True), False)
+    assert gzip_path.read_bytes() == first
+
+
+def test_total_sizes():
+    assert total_sizes([]) == (0, 0, 0, 0, 0, 0)
+    sizes = [OutputSizes(1, 2, 3, 4, 1, 0), OutputSizes(10, 20, 30, 40, 0, 1)]
+    assert total_sizes(sizes) == (11, 22, 33, 44, 1, 1)
+
+
+def test_hash_static_assets(tmp_path):
+    tmp_path.joinpath("favicons").mkdir()
+    tmp_path.joinpath("style.css").write_text("body {}")
+    tmp_path.joinpath("favicons", "icon.png").write_bytes(b"png")
+
+    urls = hash_static_assets(tmp_path)
+
+    assert sorted(urls) == ["/static/favicons/icon.png", "/static/style.css"]
+    hashed_url = urls["/static/style.css"]
+    assert hashed_url.startswith("/static/style.") and hashed_url.endswith(".css")
+    assert tmp_path.joinpath(hashed_url.replace("/static/", "", 1)).read_text() == "body {}"
+    # Hashed copies are not hashed again and keep their names while the content is the same
+    assert hash_static_assets(tmp_path) == urls
+
+    tmp_path.joinpath("style.css").write_text("body { margin: 0; }")
+    assert hash_static_assets(tmp_path)["/static/style.css"] != hashed_url
+    # Copies of earlier versions are deleted
+    assert not tmp_path.joinpath(hashed_url.replace("/static/", "", 1)).exists()
+
+
+def test_hash_static_assets_compressed(tmp_path):
+    tmp_path.joinpath("style.css").write_text("body {}")
+
+    hashed_url = hash_static_assets(tmp_path, compress=True)["/static/style.css"]
+
+    hashed_path = tmp_path.joinpath(hashed_url.replace("/static/", "", 1))
+    gzip_path = hashed_path.with_name(hashed_path.name + ".gz")
+    assert gzip.decompress(gzip_path.read_bytes()) == b"body {}"
+
+    # Compressed copies of earlier versions go with them, copies of removed assets are deleted
+    tmp_path.joinpath("style.css").write_text("body { margin: 0; }")
+    tmp_path.joinpath("old.js").write_text("")
+    hash_static_assets(tmp_path, compress=True)
+    tmp_path.joinpath("old.js").unlink()
+    new_url = hash_static_assets(tmp_path, compress=True)["/static/style.css"]
+    new_name = new_url.replace("/static/", "", 1)
+    names = sorted(path.name for path in tmp_path.iterdir() if not path.name.endswith(".br"))
+    assert names == sorted(["style.css", new_name, new_name + ".gz"])
+
+
+def test_templates_use_hashed_assets():
+    env = get_template_environment(
+        static_urls={"/static/style.css": "/static/style.0123456789.css"}
+    )
+
+    html = env.get_template("news.html.j2").render(
+        {
+            "unit_system": "Metric",
+            "index_nav_link": {"href_metric": "", "href_imperial": ""},
+            "nav_links": [],
+            "units_nav_link": {"href_metric": "", "href_imperial": ""},
+        }
+    )
+
+    assert 'href="/static/style.0123456789.css"' in html
+    assert 'href="/static/style.css"' not in html
@@ -0,0 +1,148 @@
+import copy
+import datetime as dt
+from zoneinfo import ZoneInfo
+
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock.places import Area
+from dryrock.reports.forecast_store import ForecastStore
+from dryrock.reports.helper_functions import DayPart
+from dryrock.reports.ranking import (
+    get_area_stores,
+    get_place_score,
+    get_ranking_context,
+    get_window_days,
+    rank_places,
+)
+
+DUBLIN = ZoneInfo("Europe/Dublin")
+NOW = dt.datetime(2020, 8, 5, 12, tzinfo=dt.timezone.utc)  # A Wednesday
+HOURS = DayPart("Ranking", 8, 20)
+
+
+@pytest.fixture
+def dalkey_forecast():
+    dalkey = Place("Dalkey Quarry", 53.271, -6.107, 95)
+    d_forecast = Forecast(dalkey, save_location="./tests/test_data/")
+    d_forecast.load()
+
+    return d_forecast
+
+
+def make_forecasts(forecast: Forecast, rain_scales):
+    """Returns copies of the forecast with rain scaled by each of rain_scales."""
+    forecasts = []
+    for scale in rain_scales:
+        scaled = copy.deepcopy(forecast)
+        for interval in scaled.data.intervals:
+            rain = interval.variables.get("precipitation_amount")
+            if rain is not None:
+                rain.value = round(rain.value * scale, 1)
+        forecasts.append(scaled)
+    return forecasts
+
+
+@pytest.mark.parametrize(
+    "today, weekend",
+    [
+        (dt.date(2020, 8, 5), [dt.date(2020, 8, 8), dt.date(2020, 8, 9)]),
+        (dt.date(2020, 8, 8), [dt.date(2020, 8, 8), dt.date(2020, 8, 9)]),
+        (dt.date(2020, 8, 9), [dt.date(2020, 8, 9)]),
+    ],
+)
+def test_window_days(today, weekend):
+    assert get_window_days("today", today) == [today]
+    assert get_window_days("tomorrow", today) == [today + dt.timedelta(days=1)]
+    assert get_window_days("weekend", today) == weekend
+    with pytest.raises(ValueError):
+        get_window_days("fortnight", today)
+
+
+def test_place_score(dalkey_forecast: Forecast):
+    store = ForecastStore(dalkey_forecast.data)
+    days = [dt.date(2020, 8, 6), dt.date(2020, 8, 7)]
+    spans = [HOURS.window_for(day, DUBLIN) for day in days]
+
+    score = get_place_score(store, spans)
+
+    assert score is not None
+    assert score.time_delta == dt.timedelta(hours=24)
+    day_scores = [get_place_score(store, [span]) for span in spans]
+    assert score.rain.value == pytest.approx(sum(s.rain.value for s in day_scores if s))
+    assert score.max_wind_speed.value == max(s.max_wind_speed.value for s in day_scores if s)
+    assert score.min_humid.value == min(s.min_humid.value for s in day_scores if s)
+
+    # Beyond the end of the forecast
+    assert get_place_score(store, [HOURS.window_for(dt.date(2020, 8, 20), DUBLIN)]) is None
+    assert get_place_score(store, []) is None
+
+
+def test_place_score_needs_whole_span(dalkey_forecast: Forecast):
+    store = ForecastStore(dalkey_forecast.data)
+
+    # The forecast starts at 11:00 and ends at 18:00 UTC, part way through these spans
+    assert get_place_score(store, [HOURS.window_for(dt.date(2020, 8, 5), DUBLIN)]) is None
+    assert get_place_score(store, [HOURS.window_for(dt.date(2020, 8, 14), DUBLIN)]) is None
+    start = dt.datetime(2020, 8, 5, 11, tzinfo=dt.timezone.utc)
+    score = get_place_score(store, [(start, start + dt.timedelta(hours=6))])
+    assert score is not None and score.time_delta == dt.timedelta(hours=6)
+
+
+def test_rank_places(dalkey_forecast: Forecast):
+    rain_scales = [3, 0, 2, 1, 4]
+    forecasts = make_forecasts(dalkey_forecast, rain_scales)
+    places = [Place(f"Crag {i}", 53.271, -6.107, 95) for i in range(len(forecasts))]
+    areas = [Area("North", "Europe/Dublin", places[:2]), Area("South", "Europe/Dublin", places[2:])]
+    area_forecasts = [forecasts[:2], forecasts[2:]]
+
+    ranked = rank_places(areas, area_forecasts, "today", 3, HOURS, now=NOW)
+
+    assert [(place.area_index, place.place_index) for place in ranked] == [(0, 1), (1, 1), (1, 0)]
+    keys = [place.score.key() for place in ranked]
+    assert keys == sorted(keys)
+
+    context = get_ranking_context(areas, "today", ranked)
+    assert context["label"] == "Today"
+    assert [place["name"] for place in context["places"]] == ["Crag 1", "Crag 3", "Crag 2"]
+    assert context["places"][0]["href_metric"] == "/pages/north_metric.html"
+
+
+def test_rank_places_from_current_hour(dalkey_forecast: Forecast):
+    places = [Place("Crag", 53.271, -6.107, 95)]
+    areas = [Area("North", "Europe/Dublin", places)]
+    now = NOW + dt.timedelta(minutes=34)
+
+    today = rank_places(areas, [[dalkey_forecast]], "today", 5, HOURS, now=now)
+
+    # Only the rest of today is ranked, from 12:00 to 19:00 UTC
+    assert len(today) == 1
+    assert today[0].score.time_delta == dt.timedelta(hours=7)
+    # Once the hours of today have passed there is nothing left to rank
+    evening = NOW.replace(hour=19)
+    assert rank_places(areas, [[dalkey_forecast]], "today", 5, HOURS, now=evening) == []
+
+
+def test_rank_places_shares_stores(dalkey_forecast: Forecast):
+    places = [Place(f"Crag {i}", 53.271, -6.107, 95) for i in range(3)]
+    areas = [Area("North", "Europe/Dublin", places)]
+    area_forecasts = [[dalkey_forecast] * 3]
+    area_stores = get_area_stores(area_forecasts)
+
+    ranked = rank_places(areas, area_forecasts, "weekend", 5, HOURS, area_stores, NOW)
+
+    # Places sharing data are ranked in order, their data is only aggregated once
+    assert [place.place_index for place in ranked] == [0, 1, 2]
+    assert area_stores[0][0] is area_stores[0][1] is area_stores[0][2]
+    assert ranked == rank_places(areas, area_forecasts, "weekend", 5, HOURS, now=NOW)
+
+
+def test_rank_places_needs_only_data(dalkey_forecast: Forecast):
+    place = Place("Crag", 53.271, -6.107, 95)
+    forecast = Forecast(place)
+    forecast.data = dalkey_forecast.data
+    areas = [Area("North", "Europe/Dublin", [place])]
+
+    ranked = rank_places(areas, [[forecast]], "weekend", 5, HOURS, now=NOW)
+
+    assert len(ranked) == 1
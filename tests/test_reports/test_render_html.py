@@ -0,0 +1,101 @@
+from metno_locationforecast import Forecast, Place
+
+from dryrock.forecast_cache import CachedForecast, ForecastCache
+from dryrock.places import Area
+from dryrock.reports.forecast_store import ForecastStore
+from dryrock.reports.helper_functions import UnitSystem
+from dryrock.reports.render_html import (
+    PageJob,
+    get_forecast_page_context,
+    get_forecast_page_contexts,
+    get_navbar_context,
+    render_html_pages,
+    render_pages,
+)
+
+
+def make_jobs(output_path, number_of_areas: int):
+    dalkey = Place("Dalkey Quarry", 53.271, -6.107, 95)
+    d_forecast = Forecast(dalkey, save_location="./tests/test_data/")
+    d_forecast.load()
+
+    areas = [Area(f"Area {i}", "Europe/Dublin", [dalkey]) for i in range(number_of_areas)]
+    area_forecasts = [[d_forecast] for _ in areas]
+    area_stores = [[ForecastStore(d_forecast.data)] for _ in areas]
+    nav_bar_context = get_navbar_context(areas)
+
+    # Jobs are made as they are rendered, as render_html_pages makes them
+    for i, area in enumerate(areas):
+        context = get_forecast_page_context(
+            area, i, area_forecasts[i], area_stores[i], nav_bar_context
+        )
+        for unit_system in UnitSystem:
+            yield PageJob(
+                output_path.joinpath(f"area_{i}_{unit_system.name}.html"),
+                "forecast_page.html.j2",
+                context,
+                unit_system,
+            )
+
+
+def test_forecast_page_context_matches_all_contexts():
+    dalkey = Place("Dalkey Quarry", 53.271, -6.107, 95)
+    d_forecast = Forecast(dalkey, save_location="./tests/test_data/")
+    d_forecast.load()
+    areas = [Area(f"Area {i}", "Europe/Dublin", [dalkey]) for i in range(2)]
+    area_stores = [[ForecastStore(d_forecast.data)] for _ in areas]
+
+    contexts = get_forecast_page_contexts(areas, [[d_forecast]] * 2, area_stores)
+    context = get_forecast_page_context(
+        areas[1], 1, [d_forecast], area_stores[1], get_navbar_context(areas)
+    )
+
+    assert context.keys() == contexts[1].keys()
+    assert context["nav_links"] == contexts[1]["nav_links"]
+    assert context["nav_links"][1]["is_active"]
+
+
+def test_render_html_pages_in_parallel_with_cached_forecasts(tmp_path, monkeypatch):
+    cache = ForecastCache(str(tmp_path.joinpath("cache.sqlite3")))
+    saved = Forecast(Place("Dalkey Quarry", 53.271, -6.107, 95), save_location="./tests/test_data/")
+    saved.load()
+    places = [Place(f"Crag {i}", 53.271, -6.107, 95) for i in range(3)]
+    areas = [Area(f"Area {i}", "Europe/Dublin", [place]) for i, place in enumerate(places)]
+    area_forecasts = []
+    for place in places:
+        forecast = CachedForecast(place, cache)
+        forecast.json = saved.json
+        forecast.data = saved.data
+        area_forecasts.append([forecast])
+    pages = {}
+    for processes in (1, 2):
+        # Pages are written to ./pages
+        output_path = tmp_path.joinpath(str(processes))
+        output_path.mkdir()
+        monkeypatch.chdir(output_path)
+        render_html_pages(areas, area_forecasts, processes=processes)
+        pages[processes] = {
+            path.name: path.read_bytes() for path in output_path.joinpath("pages").glob("*.html")
+        }
+    cache.close()
+
+    # Forecasts, and the cache they hold, are never sent to the workers
+    assert len(pages[2]) == 2 * len(areas) + 6
+    assert pages[2] == pages[1]
+
+
+def test_render_pages_in_parallel_matches_serial(tmp_path):
+    serial_path = tmp_path.joinpath("serial")
+    parallel_path = tmp_path.joinpath("parallel")
+    serial_path.mkdir()
+    parallel_path.mkdir()
+
+    render_pages(make_jobs(serial_path, 3), processes=1)
+    render_pages(make_jobs(parallel_path, 3), processes=2)
+
+    serial_pages = sorted(serial_path.iterdir())
+    assert len(serial_pages) == 6
+    for serial_page in serial_pages:
+        parallel_page = parallel_path.joinpath(serial_page.name)
+        assert parallel_page.read_bytes() == serial_page.read_bytes()
+    assert "Dalkey Quarry" in serial_pages[0].read_text(encoding="utf8")
@@ -0,0 +1,84 @@
+import copy
+import datetime as dt
+
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock.reports.render_manifest import (
+    RenderManifest,
+    get_forecast_hash,
+    get_render_sources_hash,
+    hash_of,
+)
+
+
+@pytest.fixture
+def dalkey_forecast():
+    dalkey = Place("Dalkey Quarry", 53.271, -6.107, 95)
+    d_forecast = Forecast(dalkey, save_location="./tests/test_data/")
+    d_forecast.load()
+
+    return d_forecast
+
+
+def test_manifest_round_trip(tmp_path):
+    page_path = tmp_path.joinpath("ireland_metric.html")
+    page_path.write_text("<html></html>")
+    manifest = RenderManifest(str(tmp_path.joinpath("output", "render_manifest.json")))
+    manifest.load()
+
+    assert not manifest.is_current(page_path, "abc")
+    manifest.record(page_path, "abc")
+    manifest.save()
+
+    loaded = RenderManifest(str(manifest.file_path))
+    loaded.load()
+    assert loaded.is_current(page_path, "abc")
+    assert not loaded.is_current(page_path, "def")
+    # A missing page is never current
+    page_path.unlink()
+    assert not loaded.is_current(page_path, "abc")
+
+
+def test_manifest_ignores_invalid_file(tmp_path):
+    file_path = tmp_path.joinpath("render_manifest.json")
+    file_path.write_text("not json")
+    manifest = RenderManifest(str(file_path))
+
+    manifest.load()
+
+    assert manifest.hashes == {}
+
+
+def test_hash_of():
+    day = dt.date(2020, 8, 5)
+
+    assert hash_of("a", [1, 2], day) == hash_of("a", [1, 2], day)
+    assert hash_of("a", [1, 2], day) != hash_of("a", [1, 2], day + dt.timedelta(days=1))
+    assert hash_of("a", [1, 2]) != hash_of("a", [2, 1])
+
+
+def test_forecast_hash_ignores_headers(dalkey_forecast: Forecast):
+    expected = get_forecast_hash(dalkey_forecast)
+
+    dalkey_forecast.json["headers"]["Expires"] = "Thu, 06 Aug 2020 12:00:00 GMT"
+    dalkey_forecast.json["status_code"] = 304
+    assert get_forecast_hash(dalkey_forecast) == expected
+
+    dalkey_forecast.json = copy.deepcopy(dalkey_forecast.json)
+    dalkey_forecast.json["data"]["properties"]["meta"]["updated_at"] = "2020-08-05T12:00:00Z"
+    assert get_forecast_hash(dalkey_forecast) != expected
+
+
+def test_render_sources_hash(tmp_path):
+    tmp_path.joinpath("templates").mkdir()
+    template_path = tmp_path.joinpath("templates", "page.html.j2")
+    template_path.write_text("{{ area_name }}")
+    tmp_path.joinpath("notes.txt").write_text("Not a source")
+    expected = get_render_sources_hash(tmp_path)
+
+    tmp_path.joinpath("notes.txt").write_text("Still not a source")
+    assert get_render_sources_hash(tmp_path) == expected
+
+    template_path.write_text("<h1>{{ area_name }}</h1>")
+    assert get_render_sources_hash(tmp_path) != expected
@@ -0,0 +1,43 @@
+import jinja2 as jinja
+from metno_locationforecast import Place
+
+from dryrock.places import Area
+from dryrock.reports.render_html import get_index_page_context, get_news_page_context
+from dryrock.reports.template_environment import (
+    SOURCES_HASH_FILE,
+    compile_templates,
+    get_template_environment,
+    is_bundle_current,
+)
+
+
+def test_compiled_templates_match_source(tmp_path):
+    compiled_path = tmp_path.joinpath("compiled_templates")
+    areas = [Area("Ireland", "Europe/Dublin", [Place("Dalkey Quarry", 53.271, -6.107, 95)])]
+    source_env = get_template_environment(compiled_path)
+    assert isinstance(source_env.loader, jinja.FileSystemLoader)
+
+    compile_templates(compiled_path)
+
+    assert is_bundle_current(compiled_path)
+    compiled_env = get_template_environment(compiled_path)
+    assert isinstance(compiled_env.loader, jinja.ModuleLoader)
+    for template_name, (context, _) in (
+        ("index.html.j2", get_index_page_context(areas)),
+        ("news.html.j2", get_news_page_context(areas)),
+    ):
+        assert compiled_env.get_template(template_name).render(context) == (
+            source_env.get_template(template_name).render(context)
+        )
+
+
+def test_out_of_date_bundle_is_not_used(tmp_path):
+    compiled_path = tmp_path.joinpath("compiled_templates")
+    compile_templates(compiled_path)
+
+    compiled_path.joinpath(SOURCES_HASH_FILE).write_text("hash of older templates\n")
+
+    assert not is_bundle_current(compiled_path)
+    assert isinstance(get_template_environment(compiled_path).loader, jinja.FileSystemLoader)
+    compile_templates(compiled_path)
+    assert is_bundle_current(compiled_path)
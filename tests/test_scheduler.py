@@ -0,0 +1,140 @@
+"""Tests for scheduling forecast refreshes."""
+
+import datetime as dt
+
+import pytest
+from metno_locationforecast import Forecast, Place
+
+from dryrock import scheduler as scheduler_module
+from dryrock.grid import GridCell
+from dryrock.scheduler import RefreshScheduler, next_refresh_time, refresh_due, run_daemon
+
+from .met_stub import StubMetServer
+
+NOW = dt.datetime(2020, 8, 5, 12, tzinfo=dt.timezone.utc)
+
+
+@pytest.fixture
+def stub_server():
+    server = StubMetServer().start()
+    yield server
+    server.stop()
+
+
+def make_forecast(name: str, base_url: str = "http://localhost/", save_location: str = "."):
+    return Forecast(
+        Place(name, 53.271, -6.107, 95),
+        user_agent="dryrock-tests",
+        save_location=save_location,
+        base_url=base_url,
+    )
+
+
+def make_cell(forecast: Forecast, area_index: int) -> GridCell:
+    place_forecast = Forecast(forecast.place, user_agent="dryrock-tests")
+    return GridCell(forecast, [place_forecast], {area_index})
+
+
+def test_pop_due_returns_cells_in_expiry_order():
+    scheduler = RefreshScheduler()
+    late = make_cell(make_forecast("Late"), 0)
+    early = make_cell(make_forecast("Early"), 1)
+    not_due = make_cell(make_forecast("Not due"), 1)
+    scheduler.schedule(late, NOW - dt.timedelta(minutes=1))
+    scheduler.schedule(not_due, NOW + dt.timedelta(minutes=1))
+    scheduler.schedule(early, NOW - dt.timedelta(minutes=5))
+
+    due = scheduler.pop_due(NOW)
+
+    assert due == [early, late]
+    assert len(scheduler) == 1
+    assert scheduler.next_refresh_at() == NOW + dt.timedelta(minutes=1)
+    assert scheduler.metrics.refreshes == 2
+    assert scheduler.metrics.queue_depth == 1
+    assert scheduler.metrics.max_lag == 300
+    assert scheduler.metrics.mean_lag == 180
+
+
+def test_next_refresh_time():
+    forecast = make_forecast("Dalkey", save_location="./tests/test_data/")
+    retry_delay = dt.timedelta(minutes=5)
+
+    # No data yet
+    assert next_refresh_time(forecast, NOW, retry_delay) == NOW + retry_delay
+
+    forecast.load()
+    # Data already expired
+    assert next_refresh_time(forecast, NOW, retry_delay) == NOW + retry_delay
+
+    forecast.data.expires = NOW + dt.timedelta(hours=1)
+    assert next_refresh_time(forecast, NOW, retry_delay) == NOW + dt.timedelta(hours=1)
+
+    # Data expiring sooner than the retry delay is refreshed when it expires
+    forecast.data.expires = NOW + dt.timedelta(minutes=1)
+    assert next_refresh_time(forecast, NOW, retry_delay) == NOW + dt.timedelta(minutes=1)
+
+    # Failed refreshes are retried after the delay
+    assert next_refresh_time(forecast, NOW, retry_delay, failed=True) == NOW + retry_delay
+
+
+def test_refresh_due_only_refreshes_expired_cells(stub_server: StubMetServer, tmp_path):
+    scheduler = RefreshScheduler()
+    due_cell = make_cell(make_forecast("Due", stub_server.base_url, str(tmp_path)), 1)
+    later_cell = make_cell(make_forecast("Later", stub_server.base_url, str(tmp_path)), 0)
+    scheduler.schedule(due_cell, NOW - dt.timedelta(minutes=1))
+    scheduler.schedule(later_cell, dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=1))
+
+    modified_area_indices = refresh_due(
+        scheduler, dt.datetime.now(dt.timezone.utc), 2, 100, dt.timedelta(minutes=5)
+    )
+
+    assert modified_area_indices == {1}
+    assert stub_server.request_count == 1
+    # Data is shared with the places in the cell
+    assert due_cell.place_forecasts[0].data is due_cell.forecast.data
+    assert not hasattr(later_cell.forecast, "data")
+    # Both cells are back in the queue
+    assert len(scheduler) == 2
+
+
+def test_refresh_due_records_failures_per_cell(stub_server: StubMetServer, tmp_path, monkeypatch):
+    scheduler = RefreshScheduler()
+    good_cell = make_cell(make_forecast("Good", stub_server.base_url, str(tmp_path)), 0)
+    # Nothing listens on port 1 so requests for this cell are refused
+    bad_cell = make_cell(make_forecast("Bad", "http://127.0.0.1:1/", str(tmp_path)), 1)
+    scheduler.schedule(good_cell, NOW)
+    scheduler.schedule(bad_cell, NOW)
+    failed_names = []
+
+    def next_refresh_time(forecast, now, retry_delay, failed=False):
+        if failed:
+            failed_names.append(forecast.place.name)
+        return now + retry_delay
+
+    monkeypatch.setattr(scheduler_module, "next_refresh_time", next_refresh_time)
+
+    modified_area_indices = refresh_due(
+        scheduler, dt.datetime.now(dt.timezone.utc), 2, 100, dt.timedelta(minutes=5)
+    )
+
+    # Only the cell that failed is retried as a failure, the other is refreshed as normal
+    assert failed_names == ["Bad"]
+    assert modified_area_indices == {0}
+    assert len(scheduler) == 2
+
+
+def test_run_daemon_survives_failed_renders(stub_server: StubMetServer, tmp_path):
+    cell = make_cell(make_forecast("Dalkey", stub_server.base_url, str(tmp_path)), 0)
+    rendered = []
+
+    def render_areas(area_indices):
+        rendered.append(area_indices)
+        if len(rendered) == 1:
+            raise RuntimeError("Render failed")
+        raise KeyboardInterrupt
+
+    # The served data has already expired so the cell is refreshed again after each retry delay
+    with pytest.raises(KeyboardInterrupt):
+        run_daemon([cell], render_areas, 1, 100, dt.timedelta(seconds=0.01))
+
+    assert rendered == [{0}, {0}]
@@ -0,0 +1,85 @@
+"""Tests for the spatial index of places."""
+
+import json
+import math
+import random
+
+import pytest
+from metno_locationforecast import Place
+
+from dryrock.places import get_areas
+from dryrock.spatial import EARTH_RADIUS_KM, PlaceIndex, write_region_files
+
+
+def haversine(place: Place, latitude: float, longitude: float) -> float:
+    latitude_1 = math.radians(place.coordinates["latitude"])
+    latitude_2 = math.radians(latitude)
+    h = (
+        math.sin((latitude_2 - latitude_1) / 2) ** 2
+        + math.cos(latitude_1)
+        * math.cos(latitude_2)
+        * math.sin(math.radians(longitude - place.coordinates["longitude"]) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+@pytest.fixture
+def places():
+    random.seed(1)
+    return [
+        Place(f"Crag {i}", random.uniform(-89, 89), random.uniform(-180, 180), 0)
+        for i in range(2000)
+    ]
+
+
+@pytest.mark.parametrize(
+    "latitude, longitude", [(53.271, -6.107), (47.5, -121.7), (-33.9, 179.9), (89.9, 0.0)]
+)
+def test_nearest_matches_brute_force(places, latitude: float, longitude: float):
+    index = PlaceIndex(places, leaf_size=8)
+
+    nearest = index.nearest(latitude, longitude, 5)
+
+    distances = sorted((haversine(place, latitude, longitude), i) for i, place in enumerate(places))
+    assert [neighbour.place_index for neighbour in nearest] == [i for _, i in distances[:5]]
+    for neighbour, (distance, _) in zip(nearest, distances):
+        assert neighbour.distance == pytest.approx(distance)
+
+
+def test_within_matches_brute_force(places):
+    index = PlaceIndex(places)
+
+    within = index.within(53.271, -6.107, 1500)
+
+    expected = [i for i, place in enumerate(places) if haversine(place, 53.271, -6.107) <= 1500]
+    assert sorted(neighbour.place_index for neighbour in within) == sorted(expected)
+    assert [neighbour.distance for neighbour in within] == sorted(
+        neighbour.distance for neighbour in within
+    )
+    assert index.within(53.271, -6.107, 0.001) == []
+
+
+def test_small_indexes():
+    assert PlaceIndex([]).nearest(0, 0, 3) == []
+    assert PlaceIndex([]).within(0, 0, 100) == []
+
+    index = PlaceIndex([Place("Dalkey Quarry", 53.271, -6.107, 95)])
+    assert [neighbour.place_index for neighbour in index.nearest(53.0, -6.0, 3)] == [0]
+    with pytest.raises(ValueError):
+        index.nearest(53.0, -6.0, 0)
+
+
+def test_write_region_files(tmp_path):
+    areas = get_areas("./tests/test_data/simple_areas.json")
+    index = PlaceIndex([place for area in areas for place in area.places])
+
+    write_region_files(areas, index, str(tmp_path), 2)
+
+    regions = json.loads(tmp_path.joinpath("regions.json").read_text())["regions"]
+    assert [region["area_name"] for region in regions] == [area.name for area in areas]
+    for area, region in zip(areas, regions):
+        data = json.loads(tmp_path.joinpath(region["file"]).read_text())
+        assert [place["name"] for place in data["places"]] == [place.name for place in area.places]
+        for place in data["places"]:
+            assert place["name"] not in [nearby["name"] for nearby in place["nearby"]]
+            assert len(place["nearby"]) == min(2, len(index) - 1)